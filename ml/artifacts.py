@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+# Directory layout for serving artifacts: one uncompressed .npy file per array
+# plus meta.json. np.load(mmap_mode="r") maps the .npy files read-only, so every
+# worker process on the host shares the same page-cache pages instead of
+# holding a private copy of the model.
+
+META_FILE = "meta.json"
+
+
+def save_arrays(directory, arrays, meta=None):
+    """Writes ``{name: ndarray}`` as ``<name>.npy`` files and ``meta`` as JSON."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(directory / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+    (directory / META_FILE).write_text(json.dumps({"arrays": sorted(arrays), **(meta or {})}, indent=2))
+    return directory
+
+
+def load_arrays(directory, mmap=True, retries=5):
+    """Returns ``(arrays, meta)``; arrays are read-only memory maps unless ``mmap`` is False.
+
+    A directory replaced by :func:`atomic_path` is briefly missing between
+    its two renames, so a missing file is retried a few times before the
+    error is raised.
+    """
+    directory = Path(directory)
+    for attempt in range(retries + 1):
+        try:
+            meta = json.loads((directory / META_FILE).read_text())
+            mode = "r" if mmap else None
+            arrays = {
+                name: np.load(directory / f"{name}.npy", mmap_mode=mode, allow_pickle=False)
+                for name in meta["arrays"]
+            }
+            return arrays, meta
+        except FileNotFoundError:
+            if attempt == retries:
+                raise
+            time.sleep(0.01 * 2 ** attempt)
+
+
+@contextmanager
+def atomic_path(path):
+    """Yields a scratch path next to ``path``; on success it replaces ``path`` in one rename.
+
+    Works for files and for artifact directories. The scratch name keeps the
+    suffix, so writers that pick a format from it (``.h5``, ``.npz``) behave
+    the same. A replaced file is never seen partially written: readers open
+    the old or the new one. A directory can't be renamed over another, so it
+    is swapped with two renames and ``path`` is briefly missing in between;
+    :func:`load_arrays` retries through that gap. Processes that mapped the
+    old files keep reading them.
+    """
+    path = Path(path)
+    scratch = path.with_name(f".{path.stem}.tmp-{os.getpid()}{path.suffix}")
+    _remove(scratch)
+    try:
+        yield scratch
+    except BaseException:
+        _remove(scratch)
+        raise
+    if scratch.is_dir() and path.is_dir():
+        # A directory can't be renamed over a non-empty one; move the old one aside first
+        stale = path.with_name(f".{path.name}.old-{os.getpid()}")
+        _remove(stale)
+        path.rename(stale)
+        scratch.rename(path)
+        _remove(stale)
+    else:
+        os.replace(scratch, path)
+
+
+def _remove(path):
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    elif path.exists():
+        path.unlink()
@@ -0,0 +1,66 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from ml.artifacts import save_arrays
+from ml.crop.numpy_engine import DEFAULT_WEIGHTS_PATH
+
+MODELS_DIR = Path(__file__).resolve().parent / "saved_models"
+
+
+def export_weights(models_dir=MODELS_DIR, out_path=DEFAULT_WEIGHTS_PATH):
+    """Writes the Keras crop model, scaler and label encoder into one .npz file.
+
+    An ``out_path`` without the .npz suffix is written as a directory of .npy
+    files instead, which workers memory-map and share.
+    """
+    from ml.crop.main import CropRecommendationLSTM
+
+    crop = CropRecommendationLSTM.from_artifacts(models_dir)
+
+    layers, arrays = [], {}
+    for layer in crop.model.layers:
+        kind = type(layer).__name__
+        if kind == "Dropout":
+            continue  # no-op at inference
+        config = layer.get_config()
+        if kind == "LSTM":
+            spec = {
+                "type": "lstm",
+                "activation": config["activation"],
+                "recurrent_activation": config["recurrent_activation"],
+                "return_sequences": config["return_sequences"],
+            }
+        elif kind == "Dense":
+            spec = {"type": "dense", "activation": config["activation"]}
+        else:
+            raise ValueError(f"Cannot export layer type {kind}")
+
+        weights = layer.get_weights()
+        spec["n_weights"] = len(weights)
+        for j, w in enumerate(weights):
+            arrays[f"layer{len(layers)}_w{j}"] = w.astype(np.float32)
+        layers.append(spec)
+
+    arrays.update(
+        scaler_mean=crop.scaler.mean_,
+        scaler_scale=crop.scaler.scale_,
+        classes=np.asarray(crop.label_encoder.classes_).astype(str),
+    )
+    if Path(out_path).suffix != ".npz":
+        return save_arrays(out_path, arrays, {"layers": layers})
+
+    np.savez(out_path, layers=np.array(json.dumps(layers)), **arrays)
+    return Path(out_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the crop LSTM for the NumPy engine")
+    parser.add_argument("--models-dir", default=str(MODELS_DIR))
+    parser.add_argument("--out", default=str(DEFAULT_WEIGHTS_PATH))
+    args = parser.parse_args()
+
+    path = export_weights(args.models_dir, args.out)
+    print(f"Exported crop model weights to {path}")
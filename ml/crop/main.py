@@ -1,8 +1,7 @@
 import numpy as np
-import pandas as pd
 import tensorflow as tf
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import StandardScaler
 from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import LSTM, Dense, Dropout
 from tensorflow.keras.optimizers import Adam
@@ -10,6 +9,9 @@ from tensorflow.keras.utils import to_categorical
 from pathlib import Path
 import joblib
 
+from ml.crop.sequences import csv_to_memmap, lstm_windows, window_dataset
+from ml.datasets import load_dataset
+
 
 class CropRecommendationLSTM:
     def __init__(self, data_path: str):
@@ -19,14 +21,16 @@ class CropRecommendationLSTM:
         self.MODELS_DIR.mkdir(exist_ok=True)
 
         # ---------- LOAD DATA ----------
-        self.df = pd.read_csv(data_path)
+        # Columnar cache of the CSV (ml/datasets.py); labels arrive encoded
+        dataset = load_dataset(data_path, categorical=["label"], drop=[])
+        self.df = dataset.to_frame(decode=True)
 
         self.X = self.df.drop("label", axis=1)
         self.y = self.df["label"]
 
         # ---------- ENCODER ----------
-        self.label_encoder = LabelEncoder()
-        self.y_encoded = self.label_encoder.fit_transform(self.y)
+        self.label_encoder = dataset.encoder("label")
+        self.y_encoded = np.asarray(dataset["label"], dtype=np.int64)
 
         # ---------- SCALER ----------
         self.scaler = StandardScaler()
@@ -34,16 +38,51 @@ class CropRecommendationLSTM:
 
         self.model = None
 
+    # ---------- LARGE-DATASET CONSTRUCTOR ----------
+    @classmethod
+    def from_large_csv(cls, data_path: str, cache_dir=None, chunksize=200_000):
+        """Like ``__init__`` for CSVs larger than memory.
+
+        The scaled features and encoded labels are written to memory maps in
+        ``cache_dir`` (default ``saved_models/sequences``) and read back from
+        disk during training; no DataFrame of the whole file is kept.
+        """
+        self = cls.__new__(cls)
+        self.BASE_DIR = Path(__file__).resolve().parent
+        self.MODELS_DIR = self.BASE_DIR / "saved_models"
+        self.MODELS_DIR.mkdir(exist_ok=True)
+
+        self.df = self.X = self.y = None
+        self.X_scaled, self.y_encoded, self.scaler, self.label_encoder = csv_to_memmap(
+            data_path, cache_dir or self.MODELS_DIR / "sequences", chunksize=chunksize
+        )
+        self.model = None
+        return self
+
+    # ---------- SERVING-ONLY CONSTRUCTOR ----------
+    @classmethod
+    def from_artifacts(cls, models_dir=None):
+        """Loads model, scaler and encoder from ``models_dir`` without reading the training CSV."""
+        self = cls.__new__(cls)
+        self.BASE_DIR = Path(__file__).resolve().parent
+        self.MODELS_DIR = Path(models_dir) if models_dir else self.BASE_DIR / "saved_models"
+
+        # No training data is kept in serving processes
+        self.df = self.X = self.y = None
+        self.y_encoded = self.X_scaled = None
+        self.model = None
+
+        # Optimizer state is only needed for training
+        self.load_model(self.MODELS_DIR / "crop_recommendation_model.h5", compile=False)
+        return self
+
     # ---------- LSTM DATA ----------
     def prepare_lstm_data(self, time_steps=3):
-        X_seq, y_seq = [], []
+        # The windows are a strided view of X_scaled, not a copy per window
+        X_seq, y_seq = lstm_windows(self.X_scaled, self.y_encoded, time_steps)
 
-        for i in range(len(self.X_scaled) - time_steps):
-            X_seq.append(self.X_scaled[i:i + time_steps])
-            y_seq.append(self.y_encoded[i + time_steps])
-
-        return np.array(X_seq), to_categorical(
-            y_seq, num_classes=len(np.unique(self.y_encoded))
+        return X_seq, to_categorical(
+            y_seq, num_classes=len(self.label_encoder.classes_)
         )
 
     # ---------- MODEL ----------
@@ -67,24 +106,32 @@ class CropRecommendationLSTM:
         return model
 
     # ---------- TRAIN & SAVE ----------
-    def train_model(self, epochs=50, batch_size=32):
-        X_lstm, y_lstm = self.prepare_lstm_data()
-
-        X_train, X_test, y_train, y_test = train_test_split(
-            X_lstm, y_lstm, test_size=0.2, random_state=42
+    def train_model(self, epochs=50, batch_size=32, time_steps=3):
+        # Windows stay a view of X_scaled (possibly memory-mapped); batches are
+        # gathered and one-hot encoded on the fly, so memory does not grow
+        # with the dataset.
+        X_lstm, y_lstm = lstm_windows(self.X_scaled, self.y_encoded, time_steps)
+        num_classes = len(self.label_encoder.classes_)
+
+        # Same rows as splitting the materialised arrays with these arguments
+        train_idx, test_idx = train_test_split(
+            np.arange(len(X_lstm)), test_size=0.2, random_state=42
         )
+        # validation_split=0.2 semantics: the last 20% of the training rows
+        split_at = int(np.floor(len(train_idx) * 0.8))
+        train_idx, val_idx = train_idx[:split_at], train_idx[split_at:]
 
         self.model = self.create_lstm_model(
-            input_shape=(X_train.shape[1], X_train.shape[2]),
-            num_classes=y_lstm.shape[1]
+            input_shape=(X_lstm.shape[1], X_lstm.shape[2]),
+            num_classes=num_classes
         )
 
         self.model.fit(
-            X_train,
-            y_train,
+            window_dataset(X_lstm, y_lstm, train_idx, batch_size, num_classes, shuffle=True),
+            validation_data=window_dataset(X_lstm, y_lstm, val_idx, batch_size, num_classes),
             epochs=epochs,
-            batch_size=batch_size,
-            validation_split=0.2,
+            # window_dataset reshuffles the training rows every epoch itself
+            shuffle=False,
             callbacks=[
                 tf.keras.callbacks.EarlyStopping(
                     patience=10, restore_best_weights=True
@@ -102,7 +149,7 @@ class CropRecommendationLSTM:
         joblib.dump(self.label_encoder, self.MODELS_DIR / "label_encoder.pkl")
 
     # ---------- LOAD EVERYTHING (USED IN PRODUCTION) ----------
-    def load_model(self, model_path: str):
+    def load_model(self, model_path: str, compile: bool = True):
         model_path = Path(model_path)
         scaler_path = model_path.parent / "scaler.pkl"
         encoder_path = model_path.parent / "label_encoder.pkl"
@@ -114,7 +161,7 @@ class CropRecommendationLSTM:
         if not encoder_path.exists():
             raise FileNotFoundError(f"Encoder missing: {encoder_path}")
 
-        self.model = load_model(model_path)
+        self.model = load_model(model_path, compile=compile)
         self.scaler = joblib.load(scaler_path)
         self.label_encoder = joblib.load(encoder_path)
 
@@ -134,3 +181,18 @@ class CropRecommendationLSTM:
         idx = np.argmax(pred)
 
         return self.label_encoder.inverse_transform([idx])[0]
+
+    # ---------- PREDICT (BATCH) ----------
+    def predict_crops(self, rows: np.ndarray):
+        """Predicts one crop per row with a single forward pass."""
+        if self.model is None:
+            raise RuntimeError("Model not loaded")
+
+        rows_scaled = self.scaler.transform(np.asarray(rows, dtype=float))
+        # Each row is its own length-1 sequence, same as predict_crop for one row
+        rows_scaled = rows_scaled.reshape(rows_scaled.shape[0], 1, rows_scaled.shape[1])
+
+        pred = self.model.predict_on_batch(rows_scaled)
+        idx = np.argmax(pred, axis=-1)
+
+        return list(self.label_encoder.inverse_transform(idx))
@@ -0,0 +1,108 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+# "Similar fields": the k known samples closest to an input in the crop
+# model's scaled feature space, returned as evidence next to the LSTM
+# prediction. The KD-tree is built offline and saved with joblib; its arrays
+# are memory-mapped on load, so workers share them like the other artifacts.
+
+CROP_DIR = Path(__file__).resolve().parent
+MODELS_DIR = CROP_DIR / "saved_models"
+DEFAULT_INDEX_PATH = MODELS_DIR / "similar_fields.joblib"
+FEATURE_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+
+class SimilarFieldsIndex:
+    """KD-tree over StandardScaler-scaled crop samples.
+
+    ``rows`` keeps the unscaled samples for the response; ``scaler_mean`` /
+    ``scaler_scale`` are copied from the crop model's scaler.pkl, so queries
+    are scaled exactly like the LSTM's inputs without unpickling the scaler.
+    """
+
+    def __init__(self, tree, rows, labels, scaler_mean, scaler_scale):
+        self.tree = tree
+        self.rows = rows
+        self.labels = labels
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+
+    def __len__(self):
+        return len(self.labels)
+
+    # ---------- BUILD ----------
+    @classmethod
+    def build(cls, data_paths=(CROP_DIR / "crop_data.csv",), models_dir=MODELS_DIR, leaf_size=40):
+        """Indexes every row of ``data_paths`` (crop_data.csv plus any regional CSVs of the same layout)."""
+        import joblib
+        import pandas as pd
+        from sklearn.neighbors import KDTree
+
+        df = pd.concat([pd.read_csv(p) for p in data_paths], ignore_index=True)
+        rows = df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        labels = df["label"].to_numpy().astype(str)
+
+        scaler = joblib.load(Path(models_dir) / "scaler.pkl")
+        mean, scale = scaler.mean_.astype(np.float64), scaler.scale_.astype(np.float64)
+        tree = KDTree((rows - mean) / scale, leaf_size=leaf_size)
+        return cls(tree, rows, labels, mean, scale)
+
+    # ---------- PERSISTENCE ----------
+    def save(self, path=DEFAULT_INDEX_PATH):
+        import joblib
+
+        joblib.dump({
+            "tree": self.tree, "rows": self.rows, "labels": self.labels,
+            "scaler_mean": self.scaler_mean, "scaler_scale": self.scaler_scale,
+        }, path)
+        return Path(path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH, mmap=True):
+        import joblib
+
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"Similar-fields index missing at {path} (run python -m ml.crop.neighbors)")
+        state = joblib.load(path, mmap_mode="r" if mmap else None)
+        return cls(state["tree"], state["rows"], state["labels"], state["scaler_mean"], state["scaler_scale"])
+
+    # ---------- QUERY ----------
+    def query(self, rows, k=5):
+        """``(distances, indices)`` of the ``k`` nearest samples for every row, shape (n_rows, k)."""
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        k = min(int(k), len(self))
+        return self.tree.query((rows - self.scaler_mean) / self.scaler_scale, k=k)
+
+    def similar(self, rows, k=5):
+        """One list of ``{"crop", "distance", "sample"}`` neighbours per row, nearest first."""
+        distances, indices = self.query(rows, k)
+        return [
+            [
+                {
+                    "crop": str(self.labels[i]),
+                    "distance": round(float(d), 4),
+                    "sample": dict(zip(FEATURE_COLUMNS, map(float, self.rows[i]))),
+                }
+                for d, i in zip(row_d, row_i)
+            ]
+            for row_d, row_i in zip(distances, indices)
+        ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the similar-fields KD-tree over the crop samples")
+    parser.add_argument("--data", nargs="+", default=[str(CROP_DIR / "crop_data.csv")],
+                        help="crop_data.csv and any regional CSVs with the same columns")
+    parser.add_argument("--models-dir", default=str(MODELS_DIR))
+    parser.add_argument("--out", default=str(DEFAULT_INDEX_PATH))
+    parser.add_argument("--leaf-size", type=int, default=40)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = SimilarFieldsIndex.build(args.data, args.models_dir, args.leaf_size)
+    print(f"Indexed {len(index)} samples in {time.perf_counter() - start:.2f}s")
+    print(f"Saved similar-fields index to {index.save(args.out)}")
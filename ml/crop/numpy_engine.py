@@ -0,0 +1,147 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from ml.artifacts import load_arrays
+from ml.fertilizer.predictor import NonFiniteValueError
+
+# Kept free of TensorFlow / scikit-learn imports so serving workers stay light.
+# The weights file is produced by ml/crop/export_numpy.py.
+
+DEFAULT_WEIGHTS_PATH = Path(__file__).resolve().parent / "saved_models" / "crop_model_weights.npz"
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _relu(x):
+    return np.maximum(x, 0.0)
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": _relu,
+    "sigmoid": _sigmoid,
+    "tanh": np.tanh,
+    "softmax": _softmax,
+}
+
+
+def lstm_forward(x, kernel, recurrent_kernel, bias, activation, recurrent_activation, return_sequences):
+    """Runs a Keras-compatible LSTM layer over ``x`` of shape (batch, time, features).
+
+    Gate order in the fused weight matrices is input, forget, cell, output,
+    matching ``tf.keras.layers.LSTM``.
+    """
+    act = ACTIVATIONS[activation]
+    rec_act = ACTIVATIONS[recurrent_activation]
+    batch, steps, _ = x.shape
+    units = recurrent_kernel.shape[0]
+
+    # Input projections for every time step in one matmul
+    x_proj = x @ kernel + bias
+
+    h = np.zeros((batch, units), dtype=x.dtype)
+    c = np.zeros((batch, units), dtype=x.dtype)
+    outputs = np.empty((batch, steps, units), dtype=x.dtype) if return_sequences else None
+
+    for t in range(steps):
+        z = x_proj[:, t] + h @ recurrent_kernel
+        i = rec_act(z[:, :units])
+        f = rec_act(z[:, units:2 * units])
+        g = act(z[:, 2 * units:3 * units])
+        o = rec_act(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * act(c)
+        if return_sequences:
+            outputs[:, t] = h
+
+    return outputs if return_sequences else h
+
+
+class NumpyCropModel:
+    """Pure-NumPy replacement for the Keras crop LSTM at inference time.
+
+    Exposes the same ``predict_crop`` / ``predict_crops`` interface as
+    ``CropRecommendationLSTM`` so mlapi can use either one.
+    """
+
+    def __init__(self, layers, weights, scaler_mean, scaler_scale, classes):
+        self.layers = layers
+        self.weights = weights
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        self.classes = classes
+
+    # ---------- LOAD ----------
+    @classmethod
+    def load(cls, weights_path=DEFAULT_WEIGHTS_PATH):
+        """Loads an exported .npz, or a directory export whose arrays are memory-mapped."""
+        weights_path = Path(weights_path)
+        if not weights_path.exists():
+            raise FileNotFoundError(f"NumPy crop weights missing: {weights_path}")
+
+        if weights_path.is_dir():
+            arrays, meta = load_arrays(weights_path)
+            layers = meta["layers"]
+            weights = [
+                [arrays[f"layer{i}_w{j}"] for j in range(layer["n_weights"])]
+                for i, layer in enumerate(layers)
+            ]
+            return cls(layers, weights, arrays["scaler_mean"].astype(np.float32),
+                       arrays["scaler_scale"].astype(np.float32), arrays["classes"])
+
+        with np.load(weights_path, allow_pickle=False) as data:
+            layers = json.loads(str(data["layers"]))
+            weights = [
+                [data[f"layer{i}_w{j}"].astype(np.float32) for j in range(layer["n_weights"])]
+                for i, layer in enumerate(layers)
+            ]
+            return cls(
+                layers,
+                weights,
+                data["scaler_mean"].astype(np.float32),
+                data["scaler_scale"].astype(np.float32),
+                data["classes"],
+            )
+
+    # ---------- FORWARD ----------
+    def predict_proba(self, x):
+        """Class probabilities for scaled input of shape (batch, time, features)."""
+        out = np.asarray(x, dtype=np.float32)
+        for layer, w in zip(self.layers, self.weights):
+            if layer["type"] == "lstm":
+                out = lstm_forward(out, *w, layer["activation"], layer["recurrent_activation"],
+                                   layer["return_sequences"])
+            elif layer["type"] == "dense":
+                out = ACTIVATIONS[layer["activation"]](out @ w[0] + w[1])
+            else:
+                raise ValueError(f"Unsupported layer type: {layer['type']}")
+        return out
+
+    def scale(self, rows):
+        rows = np.asarray(rows, dtype=np.float32)
+        # NaN would propagate through every gate and argmax would answer classes[0]
+        if not np.isfinite(rows).all():
+            raise NonFiniteValueError("non-finite numeric value")
+        return (rows - self.scaler_mean) / self.scaler_scale
+
+    # ---------- PREDICT ----------
+    def predict_crop(self, new_data: np.ndarray):
+        # Same semantics as CropRecommendationLSTM.predict_crop: the rows form one sequence
+        scaled = self.scale(new_data)
+        pred = self.predict_proba(scaled.reshape(1, scaled.shape[0], scaled.shape[1]))
+        return self.classes[np.argmax(pred)]
+
+    def predict_crops(self, rows: np.ndarray):
+        """Predicts one crop per row with a single vectorized forward pass."""
+        scaled = self.scale(rows)
+        pred = self.predict_proba(scaled.reshape(scaled.shape[0], 1, scaled.shape[1]))
+        return list(self.classes[np.argmax(pred, axis=-1)])
@@ -0,0 +1,101 @@
+from pathlib import Path
+
+import numpy as np
+
+# Sequence data for the crop LSTM without materialising the windows.
+#
+# Window i is rows [i, i + time_steps) of the scaled features, labelled with
+# row i + time_steps, exactly as the original prepare_lstm_data loop built it.
+# sliding_window_view exposes all windows as one strided view, so building
+# them copies nothing; only a batch's windows are ever gathered into memory.
+# The features may be a read-only memory map (see csv_to_memmap), in which
+# case training streams them from disk through the page cache.
+
+
+def lstm_windows(X, y, time_steps=3):
+    """Zero-copy ``(windows, labels)``: windows is a view of shape (n - time_steps, time_steps, features)."""
+    n = len(X) - time_steps
+    if n <= 0:
+        raise ValueError(f"Need more than {time_steps} rows to build windows")
+    # (n + 1, features, time_steps) -> (n + 1, time_steps, features); both are views of X
+    windows = np.lib.stride_tricks.sliding_window_view(X, time_steps, axis=0).transpose(0, 2, 1)
+    return windows[:n], y[time_steps:]
+
+
+def window_batches(windows, labels, indices, batch_size, num_classes, shuffle=False, seed=None):
+    """Yields ``(X_batch, one_hot_batch)`` for ``indices``; memory use is one batch.
+
+    Indices are sorted within each batch so memory-mapped reads stay as
+    sequential as a shuffle allows.
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(indices) if shuffle else np.asarray(indices)
+    eye = np.eye(num_classes, dtype=np.float32)
+    for start in range(0, len(order), batch_size):
+        batch = np.sort(order[start:start + batch_size])
+        yield windows[batch].astype(np.float32), eye[labels[batch]]
+
+
+def window_dataset(windows, labels, indices, batch_size, num_classes, shuffle=False, seed=42):
+    """``tf.data`` pipeline over :func:`window_batches`, reshuffled every epoch and prefetched.
+
+    The generator fills the next batches on a background thread while the
+    model trains on the current one.
+    """
+    import tensorflow as tf
+
+    time_steps, n_features = windows.shape[1:]
+    epoch = iter(range(1 << 30))
+
+    def generate():
+        # A different shuffle each epoch, reproducible from ``seed``
+        yield from window_batches(windows, labels, indices, batch_size, num_classes,
+                                  shuffle, None if seed is None else seed + next(epoch))
+
+    signature = (
+        tf.TensorSpec(shape=(None, time_steps, n_features), dtype=tf.float32),
+        tf.TensorSpec(shape=(None, num_classes), dtype=tf.float32),
+    )
+    n_batches = -(-len(indices) // batch_size)
+    return (tf.data.Dataset.from_generator(generate, output_signature=signature)
+            .apply(tf.data.experimental.assert_cardinality(n_batches))
+            .prefetch(tf.data.AUTOTUNE))
+
+
+def csv_to_memmap(data_path, out_dir, label_column="label", chunksize=200_000):
+    """Scales a CSV too large for memory into ``features.npy`` / ``labels.npy`` memory maps.
+
+    Two passes over the file in ``chunksize`` rows: the first fits the
+    StandardScaler (``partial_fit``) and collects the labels, the second
+    writes scaled float32 features and encoded labels. Returns
+    ``(features, labels, scaler, label_encoder)`` with read-only maps.
+    """
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    scaler, classes, n_rows, columns = StandardScaler(), set(), 0, None
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        features = chunk.drop(columns=label_column)
+        columns = list(features.columns)
+        scaler.partial_fit(features)
+        classes.update(chunk[label_column].unique())
+        n_rows += len(chunk)
+    label_encoder = LabelEncoder().fit(sorted(classes))
+
+    features_path, labels_path = out_dir / "features.npy", out_dir / "labels.npy"
+    features_out = np.lib.format.open_memmap(features_path, mode="w+", dtype=np.float32, shape=(n_rows, len(columns)))
+    labels_out = np.lib.format.open_memmap(labels_path, mode="w+", dtype=np.int32, shape=(n_rows,))
+    start = 0
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        stop = start + len(chunk)
+        features_out[start:stop] = scaler.transform(chunk[columns])
+        labels_out[start:stop] = label_encoder.transform(chunk[label_column])
+        start = stop
+    features_out.flush()
+    labels_out.flush()
+    del features_out, labels_out
+
+    return (np.load(features_path, mmap_mode="r"), np.load(labels_path, mmap_mode="r"), scaler, label_encoder)
@@ -0,0 +1,186 @@
+import argparse
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ml.artifacts import atomic_path, load_arrays, save_arrays
+
+# Typed columnar cache of the training CSVs.
+#
+# A source CSV is parsed once into one .npy file per column (see
+# ml/artifacts.py): categorical columns are stored as integer codes in
+# LabelEncoder order (sorted classes), unused columns are dropped, and the
+# source's size, mtime and SHA-256 are kept in meta.json. Loading memory-maps
+# the columns; the cache is rebuilt when the source's contents change.
+
+ML_DIR = Path(__file__).resolve().parent
+CACHE_DIR = ML_DIR / ".dataset_cache"
+
+SOURCES = {
+    "crop": {"path": ML_DIR / "crop" / "crop_data.csv", "categorical": ["label"], "drop": []},
+    "fertilizer": {
+        "path": ML_DIR / "fertilizer" / "data.csv",
+        "categorical": ["District_Name", "Soil_color", "Crop", "Fertilizer"],
+        # YouTube link per row; nothing trains on it
+        "drop": ["Link"],
+    },
+}
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _code_dtype(n_classes):
+    return np.int8 if n_classes <= 127 else np.int16 if n_classes <= 32767 else np.int32
+
+
+class Dataset:
+    """Columns of one cached CSV; ``columns[name]`` is a (memory-mapped) array.
+
+    Categorical columns hold integer codes into ``categories[name]``.
+    """
+
+    def __init__(self, columns, categories, meta, directory=None):
+        self.columns = columns
+        self.categories = categories
+        self.meta = meta
+        self.directory = directory
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def names(self):
+        return list(self.meta["columns"])
+
+    def decode(self, name):
+        """String values of a categorical column."""
+        return np.asarray(self.categories[name], dtype=object)[self.columns[name]]
+
+    def encoder(self, name):
+        """A fitted LabelEncoder for ``name``, equal to fitting one on the source column."""
+        from sklearn.preprocessing import LabelEncoder
+
+        encoder = LabelEncoder()
+        encoder.classes_ = np.asarray(self.categories[name], dtype=object)
+        return encoder
+
+    def encoders(self):
+        return {name: self.encoder(name) for name in self.categories}
+
+    def to_frame(self, decode=False):
+        """DataFrame in source column order; categories stay encoded unless ``decode``."""
+        import pandas as pd
+
+        return pd.DataFrame({
+            name: self.decode(name) if decode and name in self.categories else np.asarray(self.columns[name])
+            for name in self.names
+        })
+
+    # ---------- BUILD ----------
+    @classmethod
+    def from_csv(cls, path, categorical=(), drop=()):
+        import pandas as pd
+
+        path = Path(path)
+        df = pd.read_csv(path).drop(columns=list(drop))
+        columns, categories = {}, {}
+        for name in df.columns:
+            if name in categorical:
+                classes, codes = np.unique(df[name].to_numpy().astype(str), return_inverse=True)
+                categories[name] = classes.tolist()
+                columns[name] = codes.astype(_code_dtype(len(classes)))
+            else:
+                columns[name] = df[name].to_numpy()
+        meta = {
+            "source": str(path), "sha256": _file_hash(path), **_signature(path),
+            "dropped": sorted(drop), "rows": len(df), "columns": list(df.columns), "categories": categories,
+            "dtypes": {name: str(array.dtype) for name, array in columns.items()},
+        }
+        return cls(columns, categories, meta)
+
+    # ---------- PERSISTENCE ----------
+    def save(self, directory):
+        """Writes to a scratch directory renamed into place, so readers never see a partial cache."""
+        directory = Path(directory)
+        with atomic_path(directory) as scratch:
+            save_arrays(scratch, self.columns, {k: v for k, v in self.meta.items() if k != "arrays"})
+        self.directory = directory
+        return directory
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        columns, meta = load_arrays(directory, mmap)
+        return cls(columns, meta["categories"], meta, Path(directory))
+
+    def is_fresh(self):
+        """True while the source CSV still has the contents this cache was built from."""
+        source = Path(self.meta["source"])
+        if not source.exists():
+            return True  # nothing to rebuild from; keep serving the cache
+        if _signature(source) == {"size": self.meta["size"], "mtime_ns": self.meta["mtime_ns"]}:
+            return True
+        # Touched (e.g. by a checkout) but possibly unchanged
+        return _file_hash(source) == self.meta["sha256"]
+
+
+def load_dataset(source, categorical=None, drop=None, cache_dir=CACHE_DIR, mmap=True):
+    """Cached columns of ``source`` (a name in SOURCES or a CSV path), rebuilding them if stale.
+
+    For a path, ``categorical`` / ``drop`` default to those of the SOURCES
+    entry with the same file name, so regional CSVs in the crop or fertilizer
+    layout are encoded the same way.
+    """
+    if source in SOURCES:
+        name, spec = source, SOURCES[source]
+        path = Path(spec["path"])
+    else:
+        path = Path(source).resolve()
+        name = next((n for n, s in SOURCES.items() if Path(s["path"]) == path), None)
+        spec = SOURCES[name] if name else next(
+            (s for s in SOURCES.values() if Path(s["path"]).name == path.name), {})
+        name = name or f"{path.stem}-{hashlib.sha1(str(path).encode()).hexdigest()[:8]}"
+    categorical = spec.get("categorical", []) if categorical is None else categorical
+    drop = spec.get("drop", []) if drop is None else drop
+
+    directory = Path(cache_dir) / name
+    if (directory / "meta.json").exists():
+        dataset = Dataset.load(directory, mmap)
+        layout = (dataset.meta["dropped"], sorted(dataset.categories))
+        if Path(dataset.meta["source"]) == path and layout == (sorted(drop), sorted(categorical)) and dataset.is_fresh():
+            return dataset
+
+    Dataset.from_csv(path, categorical, drop).save(directory)
+    return Dataset.load(directory, mmap)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar cache of the training CSVs")
+    parser.add_argument("sources", nargs="*", default=list(SOURCES), help="names in SOURCES or CSV paths")
+    parser.add_argument("--cache-dir", default=str(CACHE_DIR))
+    args = parser.parse_args()
+
+    for source in args.sources:
+        start = time.perf_counter()
+        dataset = load_dataset(source, cache_dir=args.cache_dir)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        load_dataset(source, cache_dir=args.cache_dir)
+        print(f"{source}: {len(dataset)} rows x {len(dataset.names)} columns in {dataset.directory} "
+              f"(first load {first:.3f}s, cached load {(time.perf_counter() - start) * 1e3:.2f} ms)")
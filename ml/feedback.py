@@ -0,0 +1,328 @@
+import argparse
+import fcntl
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ml.artifacts import atomic_path
+
+# Field feedback -> incremental model updates.
+#
+# Confirmed outcomes (the crop actually planted, whether a recommended
+# fertilizer worked) are appended to one JSONL log per model. An update
+# (python -m ml.feedback, or the periodic task in mlapi) reads only the
+# records added since the last update, using a byte offset kept next to the
+# log, and then:
+#   * fertilizer: warm-starts a few extra random-forest trees on those rows
+#   * crop:       fine-tunes the LSTM for a few epochs on those rows
+# so its cost follows the new data, not the full history. Scaler and label
+# encoders are left untouched; rows with unknown categories or non-finite
+# numbers are skipped.
+# Every refreshed artifact is written to a scratch path and renamed into place.
+
+ML_DIR = Path(__file__).resolve().parent
+DEFAULT_FEEDBACK_DIR = ML_DIR / ".feedback"
+FERT_DIR = ML_DIR / "fertilizer"
+CROP_MODELS_DIR = ML_DIR / "crop" / "saved_models"
+MODELS = ("crop", "fertilizer")
+
+CROP_FIELDS = ["nitrogen", "phosphorus", "potassium", "temperature", "humidity", "ph", "rainfall"]
+FERT_NUMERIC_FIELDS = ["nitrogen", "phosphorus", "potassium", "ph", "rainfall", "temperature"]
+
+
+# ===================== LOG =====================
+class FeedbackLog:
+    """Append-only JSONL log of one model's feedback, safe across processes."""
+
+    def __init__(self, directory, model):
+        self.directory = Path(directory)
+        self.path = self.directory / f"{model}.jsonl"
+        self.state_path = self.directory / f"{model}.state.json"
+
+    def append(self, records):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data = "".join(json.dumps({"ts": time.time(), **r}) + "\n" for r in records).encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # One locked write per call, so lines from different workers never interleave
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        return len(records)
+
+    def state(self):
+        if not self.state_path.exists():
+            return {"offset": 0, "records_used": 0, "updates": 0}
+        return json.loads(self.state_path.read_text())
+
+    def save_state(self, state):
+        with atomic_path(self.state_path) as scratch:
+            scratch.write_text(json.dumps(state, indent=2))
+
+    def read_new(self, offset=None):
+        """``(records, end_offset)`` of the complete lines after ``offset`` (default: the saved one)."""
+        offset = self.state()["offset"] if offset is None else offset
+        if not self.path.exists():
+            return [], offset
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        # A line still being written is left for the next update
+        data = data[:data.rfind(b"\n") + 1]
+        records = []
+        for line in data.splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records, offset + len(data)
+
+    def pending(self):
+        return len(self.read_new()[0])
+
+
+# ===================== FERTILIZER =====================
+def _finite(record, fields):
+    try:
+        return all(math.isfinite(float(record[f])) for f in fields)
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def _fertilizer_rows(records, encoders, district="Kolhapur"):
+    """Encoded feature rows and labels of the records whose fertilizer worked."""
+    from ml.fertilizer.predictor import FEATURE_COLUMNS
+
+    codes = {column: {c: i for i, c in enumerate(encoders[column].classes_)}
+             for column in ("District_Name", "Soil_color", "Crop", "Fertilizer")}
+    rows, labels, skipped = [], [], 0
+    for r in records:
+        if not r.get("worked", True):
+            continue  # tells us what not to recommend, but not what to recommend instead
+        keys = {"District_Name": r.get("district", district), "Soil_color": r["soil_color"],
+                "Crop": r["crop"], "Fertilizer": r["fertilizer"]}
+        if (any(value not in codes[column] for column, value in keys.items())
+                or not _finite(r, FERT_NUMERIC_FIELDS)):
+            skipped += 1
+            continue
+        numeric = dict(zip(FERT_NUMERIC_FIELDS, (float(r[f]) for f in FERT_NUMERIC_FIELDS)))
+        values = {
+            "District_Name": codes["District_Name"][keys["District_Name"]],
+            "Soil_color": codes["Soil_color"][keys["Soil_color"]],
+            "Nitrogen": numeric["nitrogen"], "Phosphorus": numeric["phosphorus"],
+            "Potassium": numeric["potassium"], "pH": numeric["ph"],
+            "Rainfall": numeric["rainfall"], "Temperature": numeric["temperature"],
+            "Crop": codes["Crop"][keys["Crop"]],
+        }
+        rows.append([values[c] for c in FEATURE_COLUMNS])
+        labels.append(codes["Fertilizer"][keys["Fertilizer"]])
+    return np.array(rows, dtype=float).reshape(-1, len(FEATURE_COLUMNS)), np.array(labels, dtype=np.int64), skipped
+
+
+def warm_start_forest(model, X, y, new_trees=10, max_trees=None):
+    """Adds ``new_trees`` trees fitted on ``X``/``y`` only; the existing trees are kept as they are.
+
+    Every known class gets one zero-weight anchor row so ``classes_`` stays
+    the same even when the new rows cover only a few fertilizers. With
+    ``max_trees`` the oldest trees are dropped beyond that count.
+    """
+    import pandas as pd
+    from ml.fertilizer.predictor import FEATURE_COLUMNS
+
+    classes = np.asarray(model.classes_)
+    X_fit = np.vstack([X, np.zeros((len(classes), X.shape[1]))])
+    y_fit = np.concatenate([y, classes])
+    weights = np.concatenate([np.ones(len(y)), np.zeros(len(classes))])
+
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + new_trees)
+    model.fit(pd.DataFrame(X_fit, columns=FEATURE_COLUMNS), y_fit, sample_weight=weights)
+    model.set_params(warm_start=False)
+    if not np.array_equal(model.classes_, classes):
+        raise RuntimeError("warm start changed the forest's classes")
+    if max_trees and len(model.estimators_) > max_trees:
+        model.estimators_ = model.estimators_[-max_trees:]
+        model.set_params(n_estimators=max_trees)
+    return model
+
+
+def update_fertilizer(feedback_dir=DEFAULT_FEEDBACK_DIR, model_path=FERT_DIR / "fertilizer_predictor.pkl",
+                      compiled_path=FERT_DIR / "fertilizer_forest", new_trees=10, max_trees=None, min_records=1):
+    """Warm-starts the pickled forest on the new confirmed fertilizer outcomes.
+
+    The compiled forest (forest_compiler) is rebuilt too when ``compiled_path``
+    exists, so FERT_ENGINE=compiled serves the refreshed model as well.
+    """
+    import joblib
+
+    log = FeedbackLog(feedback_dir, "fertilizer")
+    state = log.state()
+    records, offset = log.read_new(state["offset"])
+    if not records:
+        return {"model": "fertilizer", "updated": False, "new_records": 0}
+
+    model_path = Path(model_path)
+    encoders = joblib.load(model_path.parent / "label_encoders.pkl")
+    X, y, skipped = _fertilizer_rows(records, encoders)
+    if len(y) < min_records:
+        # Not enough yet; keep the offset so these records are used by a later update
+        return {"model": "fertilizer", "updated": False, "new_records": len(records), "usable": len(y)}
+
+    start = time.perf_counter()
+    model = warm_start_forest(joblib.load(model_path), X, y, new_trees, max_trees)
+    with atomic_path(model_path) as scratch:
+        joblib.dump(model, scratch)
+    if compiled_path and Path(compiled_path).exists():
+        from ml.fertilizer.forest_compiler import compile_forest
+
+        compiled = compile_forest(model)
+        compiled.encoder_classes = {column: [str(c) for c in enc.classes_] for column, enc in encoders.items()}
+        with atomic_path(compiled_path) as scratch:
+            compiled.save(scratch)
+
+    log.save_state({"offset": offset, "records_used": state["records_used"] + len(y),
+                    "updates": state["updates"] + 1, "updated_at": time.time()})
+    return {"model": "fertilizer", "updated": True, "new_records": len(records), "used": len(y),
+            "skipped": skipped, "trees": len(model.estimators_), "seconds": round(time.perf_counter() - start, 3)}
+
+
+# ===================== CROP =====================
+def update_crop(feedback_dir=DEFAULT_FEEDBACK_DIR, models_dir=CROP_MODELS_DIR,
+                numpy_path=CROP_MODELS_DIR / "crop_model_weights.npz",
+                epochs=3, batch_size=32, learning_rate=1e-4, min_records=1):
+    """Fine-tunes the crop LSTM for ``epochs`` on the new planted-crop records only.
+
+    Rows are length-1 sequences, the shape the model is served with. A low
+    learning rate keeps the update from overwriting what the full training
+    learned. The NumPy-engine export is refreshed when ``numpy_path`` exists.
+    """
+    log = FeedbackLog(feedback_dir, "crop")
+    state = log.state()
+    records, offset = log.read_new(state["offset"])
+    if not records:
+        return {"model": "crop", "updated": False, "new_records": 0}
+
+    # Imports TensorFlow
+    from tensorflow.keras.optimizers import Adam
+    from tensorflow.keras.utils import to_categorical
+    from ml.crop.main import CropRecommendationLSTM
+
+    models_dir = Path(models_dir)
+    crop = CropRecommendationLSTM.from_artifacts(models_dir)
+    known = {c: i for i, c in enumerate(crop.label_encoder.classes_)}
+    usable = [r for r in records if r.get("crop") in known and _finite(r, CROP_FIELDS)]
+    if len(usable) < min_records:
+        return {"model": "crop", "updated": False, "new_records": len(records), "usable": len(usable)}
+
+    start = time.perf_counter()
+    rows = crop.scaler.transform(np.array([[r[f] for f in CROP_FIELDS] for r in usable], dtype=float))
+    X = rows.reshape(len(rows), 1, rows.shape[1])
+    y = to_categorical([known[r["crop"]] for r in usable], num_classes=len(known))
+
+    crop.model.compile(optimizer=Adam(learning_rate=learning_rate), loss="categorical_crossentropy",
+                       metrics=["accuracy"])
+    history = crop.model.fit(X, y, epochs=epochs, batch_size=batch_size, shuffle=True, verbose=0)
+
+    with atomic_path(models_dir / "crop_recommendation_model.h5") as scratch:
+        crop.model.save(scratch)
+    if numpy_path and Path(numpy_path).exists():
+        from ml.crop.export_numpy import export_weights
+
+        with atomic_path(numpy_path) as scratch:
+            export_weights(models_dir, scratch)
+
+    log.save_state({"offset": offset, "records_used": state["records_used"] + len(usable),
+                    "updates": state["updates"] + 1, "updated_at": time.time()})
+    return {"model": "crop", "updated": True, "new_records": len(records), "used": len(usable),
+            "skipped": len(records) - len(usable), "loss": round(float(history.history["loss"][-1]), 4),
+            "seconds": round(time.perf_counter() - start, 3)}
+
+
+# ===================== UPDATE =====================
+def _update(model, feedback_dir, directory, options):
+    """Runs one model's update on the artifacts in ``directory`` (default: their usual paths)."""
+    if model == "fertilizer":
+        keys, paths = ("new_trees", "max_trees", "min_records"), {}
+        if directory is not None:
+            paths = {"model_path": directory / "fertilizer_predictor.pkl",
+                     "compiled_path": directory / "fertilizer_forest"}
+        return update_fertilizer(feedback_dir, **paths, **{k: options[k] for k in keys if k in options})
+    if model == "crop":
+        keys, paths = ("epochs", "min_records"), {}
+        if directory is not None:
+            paths = {"models_dir": directory, "numpy_path": directory / "crop_model_weights.npz"}
+        return update_crop(feedback_dir, **paths, **{k: options[k] for k in keys if k in options})
+    raise ValueError(f"Unknown model: {model}")
+
+
+def _update_published(model, feedback_dir, registry, options):
+    """Updates a copy of the registry's current version and publishes the result as the next version."""
+    import shutil
+    import tempfile
+
+    version, directory = registry.current(model)
+    if version is None:
+        # Nothing published yet: update the usual artifacts and publish those
+        report = _update(model, feedback_dir, None, options)
+        if report["updated"]:
+            report["published"] = registry.publish(model, note="feedback update")
+        return report
+
+    registry.verify(model, version)
+    registry.root.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=registry.root) as work:
+        work = Path(work)
+        shutil.copytree(directory, work, dirs_exist_ok=True)
+        report = _update(model, feedback_dir, work, options)
+        if report["updated"]:
+            report["published"] = registry.publish(model, sorted(work.iterdir()), note=f"feedback update of {version}")
+    return report
+
+
+def update_models(models=MODELS, feedback_dir=DEFAULT_FEEDBACK_DIR, registry=None, **options):
+    """Runs the updates of ``models``; returns None if another process is already updating.
+
+    ``options`` are passed on by name (``new_trees``, ``max_trees``,
+    ``epochs``, ``min_records``) to the updates that take them. With a
+    ``registry`` (ml/registry.py), the update starts from its current
+    version and is published as a new one instead of overwriting files.
+    """
+    feedback_dir = Path(feedback_dir)
+    feedback_dir.mkdir(parents=True, exist_ok=True)
+    if registry is not None and not hasattr(registry, "publish"):
+        from ml.registry import ModelRegistry
+
+        registry = ModelRegistry(registry)
+    with open(feedback_dir / "update.lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        if registry is None:
+            return [_update(model, feedback_dir, None, options) for model in models]
+        return [_update_published(model, feedback_dir, registry, options) for model in models]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the models incrementally from recorded field feedback")
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=MODELS)
+    parser.add_argument("--feedback-dir", default=str(DEFAULT_FEEDBACK_DIR))
+    parser.add_argument("--new-trees", type=int, default=10, help="trees added to the forest per update")
+    parser.add_argument("--max-trees", type=int, default=None, help="drop the oldest trees beyond this count")
+    parser.add_argument("--epochs", type=int, default=3, help="LSTM fine-tuning epochs per update")
+    # Same default as the API's periodic update, so a manual run never warm-starts on a handful of rows
+    parser.add_argument("--min-records", type=int, default=int(os.getenv("FEEDBACK_MIN_RECORDS", "50")),
+                        help="wait until this many usable records (default: FEEDBACK_MIN_RECORDS or 50)")
+    parser.add_argument("--registry", default=None, help="publish to this model registry instead of overwriting")
+    args = parser.parse_args()
+
+    reports = update_models(args.models, args.feedback_dir, args.registry, new_trees=args.new_trees,
+                            max_trees=args.max_trees, epochs=args.epochs, min_records=args.min_records)
+    if reports is None:
+        print("Another update is running; nothing done")
+    for report in reports or []:
+        print(json.dumps(report))
@@ -0,0 +1,67 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ml.fertilizer.predictor import FEATURE_COLUMNS, FertilizerPredictor
+
+FERT_DIR = Path(__file__).resolve().parent
+
+
+def _legacy_predict(district, soil_color, nitrogen, phosphorus, potassium, pH, rainfall, temperature, crop,
+                    model, encoders):
+    """The original per-request path: LabelEncoder.transform x3 and a one-row DataFrame."""
+    import pandas as pd
+
+    input_df = pd.DataFrame([[
+        encoders["District_Name"].transform([district])[0],
+        encoders["Soil_color"].transform([soil_color])[0],
+        nitrogen, phosphorus, potassium, pH, rainfall, temperature,
+        encoders["Crop"].transform([crop])[0],
+    ]], columns=FEATURE_COLUMNS)
+    return encoders["Fertilizer"].inverse_transform([model.predict(input_df)[0]])[0]
+
+
+def _per_row_us(fn, rows, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for row in rows:
+            fn(row)
+    return (time.perf_counter() - start) / (repeat * len(rows)) * 1e6
+
+
+def main(n_rows=200, repeat=3, batch=1024):
+    import joblib
+    import pandas as pd
+
+    model = joblib.load(FERT_DIR / "fertilizer_predictor.pkl")
+    encoders = joblib.load(FERT_DIR / "label_encoders.pkl")
+    df = pd.read_csv(FERT_DIR / "data.csv").sample(n_rows, replace=True, random_state=0)
+    rows = list(df[["Soil_color", "Nitrogen", "Phosphorus", "Potassium", "pH", "Rainfall",
+                    "Temperature", "Crop"]].itertuples(index=False, name=None))
+
+    predictor = FertilizerPredictor(model, encoders)
+    legacy = _per_row_us(lambda r: _legacy_predict("Kolhapur", *r, model, encoders), rows, repeat)
+    single = _per_row_us(lambda r: predictor.predict_one(*r), rows, repeat)
+
+    records = [dict(zip(["soil_color", "nitrogen", "phosphorus", "potassium", "ph", "rainfall",
+                         "temperature", "crop"], r)) for r in rows] * (batch // n_rows + 1)
+    records = records[:batch]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        predictor.predict_records(records)
+    batched = (time.perf_counter() - start) / (repeat * batch) * 1e6
+
+    print(f"legacy (DataFrame + transform){legacy:9.1f} us/row")
+    print(f"FertilizerPredictor (1 row) {single:9.1f} us/row  ({legacy / single:.1f}x)")
+    print(f"FertilizerPredictor (N={batch}) {batched:7.1f} us/row  ({legacy / batched:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-row latency of the fertilizer predictor")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=1024)
+    args = parser.parse_args()
+    main(args.rows, args.repeat, args.batch)
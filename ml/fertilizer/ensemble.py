@@ -0,0 +1,126 @@
+from pathlib import Path
+
+import numpy as np
+
+# Serving side of the LSTM + GradientBoosting ensemble trained by
+# ml/fertilizer/main.py. TensorFlow is imported when the LSTM is loaded,
+# not when this module is imported.
+
+ENSEMBLE_DIR = Path(__file__).resolve().parent / "ensemble"
+
+# Column order of the 9 base inputs, as in predictor.FEATURE_COLUMNS
+N, P, K, PH, RAIN, TEMP = 2, 3, 4, 5, 6, 7
+
+
+def engineer_features(X):
+    """NumPy version of the engineered columns built by the original ``predict_fertilizer``.
+
+    ``X`` is (n, 9) in ``FEATURE_COLUMNS`` order; returns (n, 18) in the
+    training ``FEATURE_COLUMNS`` order of main.py. Like the original serving
+    path, outliers are not clipped here.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    out = np.empty((len(X), 18))
+    out[:, :9] = X
+    out[:, 9] = X[:, N] / (X[:, P] + 1)
+    out[:, 10] = X[:, N] / (X[:, K] + 1)
+    out[:, 11] = X[:, P] / (X[:, K] + 1)
+    out[:, 12] = X[:, N] + X[:, P] + X[:, K]
+    out[:, 13] = X[:, PH] ** 2
+    out[:, 14] = X[:, N] * X[:, PH]
+    out[:, 15] = X[:, P] * X[:, PH]
+    out[:, 16] = X[:, K] * X[:, PH]
+    out[:, 17] = X[:, TEMP] / (X[:, RAIN] + 1)
+    return out
+
+
+class FertilizerEnsemble:
+    """Loads the scaler, polynomial features, selector, GB model and LSTM once.
+
+    Scaling, the interaction features and feature selection are collapsed
+    into NumPy index operations: only the selected polynomial columns are
+    ever computed. Each model then runs a single forward pass per batch, and
+    the more confident of the two predictions wins, as in main.py.
+
+    Exposes ``classes_``/``predict_index`` so it can be served through
+    ``FertilizerPredictor`` (see :meth:`predictor`).
+    """
+
+    # Engineered features are computed in float64, like the pandas original
+    input_dtype = np.float64
+
+    def __init__(self, scaler, poly, selector, gb_model, lstm_model, encoders):
+        self.gb_model = gb_model
+        self.lstm_model = lstm_model
+        self.encoders = encoders
+        self.classes_ = np.arange(len(encoders["Fertilizer"].classes_))
+
+        # RobustScaler.transform is (X - center_) / scale_, StandardScaler's (X - mean_) / scale_
+        centering = getattr(scaler, "with_centering", getattr(scaler, "with_mean", True))
+        self._center = getattr(scaler, "center_", getattr(scaler, "mean_", None)) if centering else None
+        self._scale = getattr(scaler, "scale_", None)
+
+        # Every selected polynomial column is x_i * x_j; linear terms pair with a column of ones
+        n_in = poly.n_features_in_
+        selected = poly.powers_[selector.get_support(indices=True)]
+        if selected.max() > 1 or selected.sum(axis=1).max() > 2:
+            raise ValueError("Only degree-2 interaction-only polynomial features are supported")
+        self._left = np.empty(len(selected), dtype=np.intp)
+        self._right = np.empty(len(selected), dtype=np.intp)
+        for c, powers in enumerate(selected):
+            terms = np.flatnonzero(powers)
+            self._left[c] = terms[0]
+            self._right[c] = terms[1] if len(terms) == 2 else n_in
+
+    # ---------- LOAD ----------
+    @classmethod
+    def load(cls, directory=ENSEMBLE_DIR):
+        import joblib
+
+        directory = Path(directory)
+        lstm_path = directory / "best_lstm_model.h5"
+        if not lstm_path.exists():
+            raise FileNotFoundError(f"Fertilizer ensemble missing at {directory} (run python -m ml.fertilizer.main)")
+
+        import tensorflow as tf
+        return cls(
+            joblib.load(directory / "scaler.pkl"),
+            joblib.load(directory / "poly_features.pkl"),
+            joblib.load(directory / "selector.pkl"),
+            joblib.load(directory / "gb_model.pkl"),
+            tf.keras.models.load_model(str(lstm_path), compile=False),
+            joblib.load(directory / "label_encoders.pkl"),
+        )
+
+    def predictor(self, district="Kolhapur"):
+        from ml.fertilizer.predictor import FertilizerPredictor
+        return FertilizerPredictor(self, self.encoders, district)
+
+    # ---------- FEATURES ----------
+    def transform(self, X):
+        """Base inputs (n, 9) -> the selected model features (n, k)."""
+        Xs = engineer_features(X)
+        if self._center is not None:
+            Xs -= self._center
+        if self._scale is not None:
+            Xs /= self._scale
+        Xs = np.hstack([Xs, np.ones((len(Xs), 1))])
+        return Xs[:, self._left] * Xs[:, self._right]
+
+    # ---------- PREDICT ----------
+    def predict_proba(self, X):
+        """``(lstm_proba, gb_proba)`` for base inputs, one forward pass each."""
+        features = self.transform(X)
+        lstm_proba = np.asarray(self.lstm_model.predict_on_batch(features.reshape(len(features), 1, -1)))
+        gb_proba = self.gb_model.predict_proba(features)
+        return lstm_proba, gb_proba
+
+    def predict_index(self, X):
+        lstm_proba, gb_proba = self.predict_proba(X)
+        lstm_pred = lstm_proba.argmax(axis=-1)
+        gb_pred = self.gb_model.classes_[gb_proba.argmax(axis=-1)]
+        # Ensemble prediction (using the most confident prediction)
+        return np.where(lstm_proba.max(axis=-1) >= gb_proba.max(axis=-1), lstm_pred, gb_pred)
+
+    def predict(self, X):
+        return self.encoders["Fertilizer"].classes_[self.predict_index(X)]
@@ -0,0 +1,149 @@
+import hashlib
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ml.artifacts import load_arrays, save_arrays
+
+# None of the CV preparation in main.py depends on a trial's hyperparameters:
+# the StratifiedKFold splits, SMOTE resampling and class weights are the same
+# for every trial. They are computed once here, saved as .npy files keyed by
+# a hash of the inputs, and memory-mapped by every trial and tuning worker.
+
+FOLD_CACHE_DIR = Path(__file__).resolve().parent / "fold_cache"
+N_SPLITS = 5
+SEED = 42
+TEST_SIZE = 0.2
+
+
+def _resample(X_train, y_train, min_count):
+    """SMOTE with k_neighbors capped by the rarest class (as main.py does)."""
+    from imblearn.over_sampling import SMOTE
+
+    smote = SMOTE(random_state=SEED, k_neighbors=min(5, min_count - 1))
+    return smote.fit_resample(X_train, y_train)
+
+
+def _class_weights(y_train):
+    from sklearn.utils.class_weight import compute_class_weight
+
+    return compute_class_weight(class_weight='balanced', classes=np.unique(y_train), y=y_train)
+
+
+def cache_key(X, y, n_splits=N_SPLITS):
+    digest = hashlib.sha256()
+    for array in (np.ascontiguousarray(X), np.ascontiguousarray(y)):
+        digest.update(str((array.dtype, array.shape)).encode())
+        digest.update(array.tobytes())
+    digest.update(f"{n_splits}:{SEED}:{TEST_SIZE}".encode())
+    return digest.hexdigest()[:16]
+
+
+class FoldCache:
+    """Prepared CV folds plus the final train/test split of ``train_ensemble``.
+
+    Training sets are already SMOTE-resampled and shaped (rows, 1, features)
+    for the LSTM; ``class_weight`` dicts are rebuilt from stored arrays.
+    """
+
+    def __init__(self, arrays, meta, directory=None):
+        self.arrays = arrays
+        self.meta = meta
+        # Set when loaded from disk; tuning workers re-open it from here
+        self.directory = directory
+
+    @property
+    def n_features(self):
+        return self.meta["n_features"]
+
+    @property
+    def n_classes(self):
+        return self.meta["n_classes"]
+
+    @property
+    def prepare_seconds(self):
+        return self.meta["prepare_seconds"]
+
+    def _split(self, name):
+        a = self.arrays
+        weights = a[f"{name}_class_weight"]
+        return (a[f"{name}_X_train"], a[f"{name}_y_train"], a[f"{name}_X_val"], a[f"{name}_y_val"],
+                {i: float(w) for i, w in enumerate(weights)})
+
+    def folds(self):
+        """Yields ``(fold, split)``; ``split`` is None when preparing that fold failed."""
+        for fold in range(self.meta["n_splits"]):
+            error = self.meta["errors"].get(str(fold))
+            yield fold, (None if error else self._split(f"fold{fold}"))
+
+    def final_split(self):
+        """``(X_train, y_train, X_test, y_test, class_weight)`` of the final training run."""
+        return self._split("final")
+
+    # ---------- PERSISTENCE ----------
+    def save(self, directory):
+        save_arrays(directory, self.arrays, {k: v for k, v in self.meta.items() if k != "arrays"})
+        return Path(directory)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        return cls(*load_arrays(directory, mmap), directory=str(directory))
+
+
+def prepare_folds(X_selected, y, n_splits=N_SPLITS, cache_dir=FOLD_CACHE_DIR):
+    """Builds (or loads from ``cache_dir``) the folds for ``X_selected``/``y``.
+
+    ``cache_dir=None`` keeps everything in memory.
+    """
+    from sklearn.model_selection import StratifiedKFold, train_test_split
+
+    X_selected, y = np.asarray(X_selected), np.asarray(y)
+    directory = Path(cache_dir) / cache_key(X_selected, y, n_splits) if cache_dir else None
+    if directory is not None and (directory / "meta.json").exists():
+        return FoldCache.load(directory)
+
+    start = time.perf_counter()
+    n_features = X_selected.shape[1]
+    lstm_shape = lambda X: X.reshape(X.shape[0], 1, n_features)
+    arrays, errors = {}, {}
+
+    cv = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=SEED)
+    for fold, (train_idx, val_idx) in enumerate(cv.split(X_selected, y)):
+        X_train, y_train = X_selected[train_idx], y[train_idx]
+        try:
+            # Only apply SMOTE if every class has enough samples
+            class_counts = np.unique(y_train, return_counts=True)[1]
+            if (class_counts > 5).all():
+                X_train, y_train = _resample(X_train, y_train, class_counts.min())
+            weights = _class_weights(y_train)
+        except Exception as e:
+            errors[str(fold)] = str(e)
+            continue
+        arrays.update({
+            f"fold{fold}_X_train": lstm_shape(X_train), f"fold{fold}_y_train": y_train,
+            f"fold{fold}_X_val": lstm_shape(X_selected[val_idx]), f"fold{fold}_y_val": y[val_idx],
+            f"fold{fold}_class_weight": weights,
+        })
+
+    # The final run's split; the rarest fertilizers only have a few training rows
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_selected, y, test_size=TEST_SIZE, random_state=SEED, stratify=y)
+    counts = np.bincount(y_train)
+    X_train, y_train = _resample(X_train, y_train, counts[counts > 0].min())
+    arrays.update({
+        "final_X_train": lstm_shape(X_train), "final_y_train": y_train,
+        "final_X_val": lstm_shape(X_test), "final_y_val": y_test,
+        "final_class_weight": _class_weights(y_train),
+    })
+
+    meta = {
+        "n_splits": n_splits, "n_features": n_features, "n_classes": int(len(np.unique(y))),
+        "errors": errors, "prepare_seconds": round(time.perf_counter() - start, 3),
+    }
+    folds = FoldCache(arrays, meta)
+    if directory is not None:
+        folds.save(directory)
+        # Serve the memory-mapped copy so tuning workers share its pages
+        folds = FoldCache.load(directory)
+    return folds
@@ -0,0 +1,218 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ml.artifacts import load_arrays, save_arrays
+
+FERT_DIR = Path(__file__).resolve().parent
+# A directory of .npy files (memory-mappable, shared between workers); a path
+# ending in .npz is written as a single compressed-free archive instead
+DEFAULT_COMPILED_PATH = FERT_DIR / "fertilizer_forest"
+_ARRAYS = ("feature", "threshold", "children", "leaf_index", "leaf_proba", "roots", "classes")
+
+
+class CompiledForest:
+    """A RandomForestClassifier flattened into contiguous node arrays.
+
+    Every tree's nodes live in the same ``feature``/``threshold`` arrays, and
+    ``children[2 * node]``/``children[2 * node + 1]`` are a node's left and
+    right child; ``roots`` holds each tree's first node. Leaves point at
+    themselves, so a batch walks all trees at once for up to ``depth`` steps.
+    ``leaf_proba`` holds the normalised class distribution of every leaf,
+    addressed through ``leaf_index``.
+
+    In lossless mode the evaluator reproduces ``model.predict`` exactly:
+    inputs are rounded to float32 and compared against float64 thresholds
+    (as sklearn does), and tree probabilities are summed in tree order.
+    """
+
+    # Rows per evaluation chunk; keeps the (rows, trees, classes) gather cache-sized
+    CHUNK_ROWS = 256
+
+    def __init__(self, feature, threshold, children, leaf_index, leaf_proba, roots, depth, classes, n_features,
+                 encoder_classes=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.leaf_index = leaf_index
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.depth = int(depth)
+        self.classes_ = classes
+        self.n_features = int(n_features)
+        # {column: [class, ...]} of the label encoders, so serving needs no pickles
+        self.encoder_classes = encoder_classes
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children,
+                                       self.leaf_index, self.leaf_proba, self.roots))
+
+    # ---------- EVALUATION ----------
+    def leaves(self, X):
+        """Leaf node index reached in every tree, shape (n_rows, n_trees)."""
+        X = np.ascontiguousarray(X, dtype=np.float32).astype(self.threshold.dtype, copy=False)
+        flat = X.ravel()
+        row_base = (np.arange(len(X)) * X.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for step in range(self.depth):
+            go_left = flat.take(row_base + self.feature.take(node)) <= self.threshold.take(node)
+            node = self.children.take(2 * node + 1 - go_left)
+            # Most paths are far shorter than the deepest one
+            if step % 4 == 3 and (self.children.take(2 * node) == node).all():
+                break
+        return node
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty((len(X), len(self.classes_)))
+        for start in range(0, len(X), self.CHUNK_ROWS):
+            leaves = self.leaf_index[self.leaves(X[start:start + self.CHUNK_ROWS])]
+            # cumsum adds trees strictly in order, matching sklearn's accumulation bit for bit
+            proba = self.leaf_proba[leaves].astype(np.float64, copy=False).cumsum(axis=1)[:, -1]
+            out[start:start + self.CHUNK_ROWS] = proba / self.n_trees
+        return out
+
+    def predict_index(self, X):
+        return self.predict_proba(X).argmax(axis=1)
+
+    def predict(self, X):
+        return self.classes_[self.predict_index(X)]
+
+    # ---------- PERSISTENCE ----------
+    def _arrays(self):
+        return {name: getattr(self, "classes_" if name == "classes" else name) for name in _ARRAYS}
+
+    def save(self, path=DEFAULT_COMPILED_PATH):
+        path = Path(path)
+        if path.suffix == ".npz":
+            np.savez(path, depth=self.depth, n_features=self.n_features, **self._arrays())
+            return path
+        meta = {"depth": self.depth, "n_features": self.n_features, "encoder_classes": self.encoder_classes}
+        return save_arrays(path, self._arrays(), meta)
+
+    @classmethod
+    def load(cls, path=DEFAULT_COMPILED_PATH, mmap=True):
+        """Loads a saved forest; directory layouts are memory-mapped read-only by default."""
+        path = Path(path)
+        if path.suffix == ".npz":
+            with np.load(path) as data:
+                return cls(*(data[name] for name in _ARRAYS[:-1]), data["depth"], data["classes"],
+                           data["n_features"])
+        arrays, meta = load_arrays(path, mmap)
+        return cls(*(arrays[name] for name in _ARRAYS[:-1]), meta["depth"], arrays["classes"],
+                   meta["n_features"], meta.get("encoder_classes"))
+
+
+def compile_forest(model, n_trees=None, quantize=False):
+    """Flattens a fitted RandomForestClassifier.
+
+    ``n_trees`` keeps only the first trees; ``quantize`` stores thresholds as
+    float32 and leaf distributions as float16. Both are lossy: check
+    :func:`accuracy_delta` before serving them.
+    """
+    trees = [est.tree_ for est in model.estimators_[:n_trees]]
+    n_classes = int(model.n_classes_)
+
+    offsets = np.cumsum([0] + [t.node_count for t in trees])
+    total = int(offsets[-1])
+    feature = np.zeros(total, dtype=np.int32)
+    threshold = np.full(total, np.inf)
+    children = np.empty((total, 2), dtype=np.int32)
+    leaf_index = np.full(total, -1, dtype=np.int32)
+    leaf_blocks = []
+
+    for t, offset in zip(trees, offsets):
+        span = slice(offset, offset + t.node_count)
+        is_leaf = t.children_left == -1
+        own = np.arange(offset, offset + t.node_count, dtype=np.int32)
+        feature[span] = np.where(is_leaf, 0, t.feature)
+        threshold[span] = np.where(is_leaf, np.inf, t.threshold)
+        children[span, 0] = np.where(is_leaf, own, t.children_left + offset)
+        children[span, 1] = np.where(is_leaf, own, t.children_right + offset)
+        # Same normalisation as DecisionTreeClassifier.predict_proba
+        proba = t.value[is_leaf, 0, :n_classes].astype(np.float64)
+        normalizer = proba.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        first = sum(len(b) for b in leaf_blocks)
+        leaf_index[span][is_leaf] = np.arange(first, first + len(proba))
+        leaf_blocks.append(proba / normalizer)
+
+    leaf_proba = np.concatenate(leaf_blocks)
+
+    if quantize:
+        threshold = threshold.astype(np.float32)
+        leaf_proba = leaf_proba.astype(np.float16)
+
+    return CompiledForest(
+        feature, threshold, children.ravel(), leaf_index, leaf_proba,
+        roots=offsets[:-1].astype(np.int32),
+        depth=max(t.max_depth for t in trees),
+        classes=np.asarray(model.classes_),
+        n_features=model.n_features_in_,
+    )
+
+
+def accuracy_delta(model, compiled, X, y=None):
+    """Agreement with ``model.predict`` and, given labels, the accuracy change."""
+    import pandas as pd
+
+    X = np.asarray(X, dtype=np.float32)
+    expected = model.predict(pd.DataFrame(X, columns=getattr(model, "feature_names_in_", None)))
+    actual = compiled.predict(X)
+    report = {"agreement": float((actual == expected).mean())}
+    if y is not None:
+        report["model_accuracy"] = float((expected == y).mean())
+        report["compiled_accuracy"] = float((actual == y).mean())
+        report["accuracy_delta"] = report["compiled_accuracy"] - report["model_accuracy"]
+    return report
+
+
+def _load_dataset(model_dir=FERT_DIR):
+    import joblib
+    import pandas as pd
+    from ml.fertilizer.predictor import FEATURE_COLUMNS
+
+    encoders = joblib.load(Path(model_dir) / "label_encoders.pkl")
+    df = pd.read_csv(Path(model_dir) / "data.csv")
+    for column in ("District_Name", "Soil_color", "Crop"):
+        df[column] = encoders[column].transform(df[column])
+    y = encoders["Fertilizer"].transform(df["Fertilizer"])
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float32), y
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the fertilizer random forest into flat arrays")
+    parser.add_argument("--model", default=str(FERT_DIR / "fertilizer_predictor.pkl"))
+    parser.add_argument("--out", default=str(DEFAULT_COMPILED_PATH))
+    parser.add_argument("--trees", type=int, default=None, help="keep only the first N trees")
+    parser.add_argument("--quantize", action="store_true", help="float32 thresholds, float16 leaf values")
+    args = parser.parse_args()
+
+    import joblib
+
+    model = joblib.load(args.model)
+    compiled = compile_forest(model, args.trees, args.quantize)
+    encoders = joblib.load(Path(args.model).parent / "label_encoders.pkl")
+    compiled.encoder_classes = {column: [str(c) for c in enc.classes_] for column, enc in encoders.items()}
+    X, y = _load_dataset()
+
+    start = time.perf_counter()
+    for row in X[:200]:
+        compiled.predict_index(row[None, :])
+    single_us = (time.perf_counter() - start) / 200 * 1e6
+    start = time.perf_counter()
+    compiled.predict_index(X)
+    batch_us = (time.perf_counter() - start) / len(X) * 1e6
+
+    print(f"trees={compiled.n_trees} nodes={len(compiled.feature)} depth={compiled.depth} "
+          f"size={compiled.nbytes / 1e6:.2f} MB")
+    print(f"latency: {single_us:.1f} us (1 row), {batch_us:.2f} us/row (N={len(X)})")
+    print(accuracy_delta(model, compiled, X, y))
+    print(f"Saved compiled forest to {compiled.save(args.out)}")
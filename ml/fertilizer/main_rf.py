@@ -1,30 +1,23 @@
-import pandas as pd
 import numpy as np
+from pathlib import Path
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score
 import joblib
 
-# Load dataset
-df = pd.read_csv("data.csv")
+from ml.datasets import load_dataset
 
-# Encode categorical features
-label_encoders = {}
-categorical_columns = ['District_Name', 'Soil_color', 'Crop']
-for col in categorical_columns:
-    le = LabelEncoder()
-    df[col] = le.fit_transform(df[col])
-    label_encoders[col] = le
+# Run from the repository root: python -m ml.fertilizer.main_rf
+FERT_DIR = Path(__file__).resolve().parent
+
+# Load dataset (columnar cache of data.csv, categorical columns already encoded)
+dataset = load_dataset("fertilizer")
+df = dataset.to_frame()
+label_encoders = dataset.encoders()
 
 # Define features and target
 X = df[['District_Name', 'Soil_color', 'Nitrogen', 'Phosphorus', 'Potassium', 'pH', 'Rainfall', 'Temperature', 'Crop']]
-y = df['Fertilizer']
-
-# Encode target variable
-y_le = LabelEncoder()
-y = y_le.fit_transform(y)
-label_encoders['Fertilizer'] = y_le
+y = df['Fertilizer'].to_numpy(dtype=np.int64)
 
 # Split dataset
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -39,8 +32,8 @@ accuracy = accuracy_score(y_test, y_pred)
 print(f'Model Accuracy: {accuracy * 100:.2f}%')
 
 # Save model and encoders
-joblib.dump(model, "fertilizer_predictor.pkl")
-joblib.dump(label_encoders, "label_encoders.pkl")
+joblib.dump(model, FERT_DIR / "fertilizer_predictor.pkl")
+joblib.dump(label_encoders, FERT_DIR / "label_encoders.pkl")
 
 def predict_fertilizer(district, soil_color, nitrogen, phosphorus, potassium, pH, rainfall, temperature, crop,model,label_encoders):
     """Predicts the fertilizer based on soil analysis and crop."""
@@ -1,41 +1,154 @@
-import pandas as pd
+import math
+import threading
+from types import SimpleNamespace
+
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score
-import joblib
+
+# pandas is imported inside the functions that build DataFrames so that
+# importing this module stays cheap for the API process.
+
+
+FEATURE_COLUMNS = ["District_Name", "Soil_color", "Nitrogen", "Phosphorus", "Potassium",
+                   "pH", "Rainfall", "Temperature", "Crop"]
+NUMERIC_FIELDS = ["nitrogen", "phosphorus", "potassium", "ph", "rainfall", "temperature"]
+
+
+def encoders_from_classes(classes):
+    """Stand-ins for the fitted label encoders built from ``{column: [class, ...]}``.
+
+    FertilizerPredictor only reads ``classes_``, so serving from a compiled
+    forest needs neither the encoder pickle nor scikit-learn.
+    """
+    return {column: SimpleNamespace(classes_=np.asarray(values)) for column, values in classes.items()}
+
+
+class UnknownCategoryError(ValueError):
+    """A category value the label encoders were not fitted on."""
+
+    def __init__(self, field, value):
+        super().__init__(f"unknown {field} '{value}'")
+        self.field = field
+        self.value = value
+
+
+class NonFiniteValueError(ValueError):
+    """A numeric input that is NaN or infinite."""
+
+
+class FertilizerPredictor:
+    """Precompiled fertilizer predictor.
+
+    Category lookups are plain dicts built once from the label encoders, and
+    rows are scored as float32 arrays in ``FEATURE_COLUMNS`` order, so a
+    request never builds a DataFrame or calls ``LabelEncoder.transform``.
+    Random forests are evaluated tree by tree exactly as
+    ``RandomForestClassifier.predict`` does, minus its per-call validation;
+    a ``CompiledForest`` (see ``forest_compiler``) or a ``FertilizerEnsemble``
+    can be passed as ``model``.
+    """
+
+    def __init__(self, model, encoders, district="Kolhapur"):
+        self.model = model
+        self.district = district
+        self._codes = {
+            field: {c: i for i, c in enumerate(encoders[column].classes_)}
+            for field, column in (("district", "District_Name"), ("soil_color", "Soil_color"), ("crop", "Crop"))
+        }
+        self._district_code = self.encode("district", district)
+        # model output index -> fertilizer name
+        self._labels = np.asarray(encoders["Fertilizer"].classes_)[np.asarray(model.classes_)]
+        self._trees = getattr(model, "estimators_", None)
+        # float32 matches what sklearn trees compare; models may ask for more
+        self._dtype = getattr(model, "input_dtype", np.float32)
+        self._local = threading.local()
+
+    # ---------- ENCODING ----------
+    def encode(self, field, value):
+        code = self._codes[field].get(value)
+        if code is None:
+            raise UnknownCategoryError(field, value)
+        return code
+
+    def _row_buffer(self):
+        # One preallocated row per thread; pool workers score concurrently
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = self._local.row = np.empty((1, len(FEATURE_COLUMNS)), dtype=self._dtype)
+        return row
+
+    # ---------- SCORING ----------
+    def _predict_index(self, X):
+        if hasattr(self.model, "predict_index"):
+            return self.model.predict_index(X)
+        if self._trees is None:
+            import pandas as pd
+            return np.searchsorted(self.model.classes_, self.model.predict(pd.DataFrame(X, columns=FEATURE_COLUMNS)))
+        proba = self._trees[0].predict_proba(X, check_input=False)
+        for tree in self._trees[1:]:
+            proba += tree.predict_proba(X, check_input=False)
+        proba /= len(self._trees)  # same rounding as sklearn, so ties break identically
+        return proba.argmax(axis=1)
+
+    def predict(self, X):
+        """Scores encoded features: one row of shape (9,) returns a name, (N, 9) an array of names."""
+        X = np.asarray(X, dtype=self._dtype)
+        if X.ndim == 1:
+            return self._labels[self._predict_index(np.ascontiguousarray(X.reshape(1, -1)))[0]]
+        return self._labels[self._predict_index(np.ascontiguousarray(X))]
+
+    def predict_one(self, soil_color, nitrogen, phosphorus, potassium, ph, rainfall, temperature, crop):
+        # The trees would route NaN/inf down some branch and answer anyway
+        if not all(map(math.isfinite, (nitrogen, phosphorus, potassium, ph, rainfall, temperature))):
+            raise NonFiniteValueError("non-finite numeric value")
+        row = self._row_buffer()
+        row[0] = (self._district_code, self.encode("soil_color", soil_color), nitrogen, phosphorus,
+                  potassium, ph, rainfall, temperature, self.encode("crop", crop))
+        return str(self._labels[self._predict_index(row)[0]])
+
+    def predict_records(self, records):
+        """Like ``predict_fertilizer_batch``: one result dict per record, errors per row."""
+        n = len(records)
+        if n == 0:
+            return []
+
+        errors = {}
+        X = np.empty((n, len(FEATURE_COLUMNS)), dtype=self._dtype)
+        X[:, 0] = self._district_code
+        numeric = np.array([[r[f] for f in NUMERIC_FIELDS] for r in records], dtype=float)
+        for i in np.flatnonzero(~np.isfinite(numeric).all(axis=1)):
+            errors[int(i)] = "non-finite numeric value"
+        X[:, 2:8] = numeric
+        for column, field in ((1, "soil_color"), (8, "crop")):
+            lookup = self._codes[field]
+            for i, r in enumerate(records):
+                code = lookup.get(r[field])
+                if code is None:
+                    errors.setdefault(i, f"unknown {field} '{r[field]}'")
+                else:
+                    X[i, column] = code
+
+        results = [{"error": errors[i]} if i in errors else None for i in range(n)]
+        valid = np.array([i not in errors for i in range(n)])
+        if valid.any():
+            for i, name in zip(np.flatnonzero(valid), self.predict(X[valid])):
+                results[i] = {"recommended_fertilizer": str(name)}
+        return results
 
 
 def predict_fertilizer(district, soil_color, nitrogen, phosphorus, potassium, pH, rainfall, temperature, crop,model,encoders):
-    """Predicts the fertilizer based on soil analysis and crop."""
-    #model = joblib.load("fertilizer_predictor.pkl")
-    #label_encoders = joblib.load("label_encoders.pkl")
-    
-    # Encode categorical inputs
-    district_encoded = encoders['District_Name'].transform([district])[0]
-    soil_color_encoded = encoders['Soil_color'].transform([soil_color])[0]
-    crop_encoded = encoders['Crop'].transform([crop])[0]
-
-    # Make input DataFrame to avoid sklearn warning
-    input_df = pd.DataFrame([{
-        "District_Name": district_encoded,
-        "Soil_color": soil_color_encoded,
-        "Nitrogen": nitrogen,
-        "Phosphorus": phosphorus,
-        "Potassium": potassium,
-        "pH": pH,
-        "Rainfall": rainfall,
-        "Temperature": temperature,
-        "Crop": crop_encoded
-    }])
-
-    # Predict
-    prediction = model.predict(input_df)[0]
-    print(prediction)
-    fertilizer = encoders['Fertilizer'].inverse_transform([prediction])[0]
-    print("completed")
-    return fertilizer
-    print("completed")
+    """Predicts the fertilizer based on soil analysis and crop.
+
+    Builds a throwaway predictor; long-lived callers should keep a FertilizerPredictor.
+    """
+    predictor = FertilizerPredictor(model, encoders, district)
+    return predictor.predict_one(soil_color, nitrogen, phosphorus, potassium, pH, rainfall, temperature, crop)
+
 
+def predict_fertilizer_batch(records, model, encoders, district="Kolhapur"):
+    """Predicts fertilizers for many rows with one model call.
 
+    ``records`` is a sequence of dicts with the ``FertilizerInput`` fields.
+    Returns one dict per record, in input order, holding either
+    ``recommended_fertilizer`` or an ``error`` for rows that can't be scored.
+    """
+    return FertilizerPredictor(model, encoders, district).predict_records(records)
@@ -1,82 +1,68 @@
-import re
-from google import genai
-import json
-from ml.porod.Credentials import getCredentials
-YOUR_API_KEY = getCredentials()
-client = genai.Client(api_key=YOUR_API_KEY)
-
-def clean_json_output(text):
-    cleaned = re.sub(r"```(?:json)?\n(.*?)```", r"\1", text.strip(), flags=re.DOTALL)
-    return cleaned.strip()
-
-def parse_trends(text):
-    # More robust parsing with error handling
-    result = []
-    for pair in text.split(","):
-        try:
-            parts = pair.split("-", 1)
-            if len(parts) == 2:
-                date = parts[0].strip()
-                # Handle percentage signs and other non-numeric characters
-                value_str = re.sub(r'[^\d.]', '', parts[1].strip())
-                value = int(float(value_str)) if value_str else 0
-                result.append({"date": date, "value": value})
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing trend: {pair} - {str(e)}")
-    return result
-
-def parse_seasonal(text):
-    # More robust parsing with error handling
-    result = []
-    for pair in text.split(","):
-        try:
-            parts = pair.split("-", 1)
-            if len(parts) == 2:
-                season = parts[0].strip()
-                # Handle percentage signs and other non-numeric characters
-                value_str = re.sub(r'[^\d.]', '', parts[1].strip())
-                value = int(float(value_str)) if value_str else 0
-                result.append({"season": season, "requirement": value})
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing seasonal: {pair} - {str(e)}")
-    return result
-
-def parse_distribution(text):
-    # More robust parsing with error handling
-    result = []
-    for pair in text.split(","):
-        try:
-            parts = pair.split("-", 1)
-            if len(parts) == 2:
-                name = parts[0].strip()
-                # Handle percentage signs and other non-numeric characters
-                value_str = re.sub(r'[^\d.]', '', parts[1].strip())
-                value = int(float(value_str)) if value_str else 0
-                result.append({"name": name, "value": value})
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing distribution: {pair} - {str(e)}")
-    return result
-
-def parse_imbalance(text):
-    # More robust parsing with error handling
-    result = []
-    # Clean up text by removing the explanatory part after "the imbalance should be..."
-    text = text.split("the imbalance should be")[0].strip()
-    for pair in text.split(","):
-        try:
-            parts = pair.split("-", 1)
-            if len(parts) == 2:
-                nutrient = parts[0].strip()
-                # Handle percentage signs and other non-numeric characters
-                value_str = re.sub(r'[^\d.]', '', parts[1].strip())
-                value = int(float(value_str)) if value_str else 0
-                result.append({"nutrient": nutrient, "value": value})
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing imbalance: {pair} - {str(e)}")
-    return result
-
-def get_crop_recommendation_query(crop_name: str, moisture: float, ph: float, temperature: float):
-    prompt = f""" Give a structured crop recommendation for:
+import asyncio
+import logging
+from contextlib import aclosing
+from ml.porod.llm import MODEL_NAME, generate_async, get_client
+from ml.porod.advisory_cache import ADVISORY_CACHE_ROUND, cached_advisory, cached_advisory_async
+from ml.porod.advisory_parser import Section, pairs, parse_sections, stream_advisory
+from ml.porod.nutrient_stats import crop_charts
+
+logger = logging.getLogger("uvicorn")
+
+# Bump whenever the prompt or the parsing below changes, so cached advisories are not reused
+PROMPT_VERSION = "crop-v4"
+
+CROP_SECTIONS = [
+    Section("Crop", "bestCrops"),
+    Section("Growth Tips", "growthTips"),
+    Section("Climate Suitability", "climateSuitability"),
+    Section("Warnings", "warnings"),
+    pairs("Trends", "trendsData", "date", "value"),
+]
+# Seasonal requirements, nutrient distribution and nutrient imbalance are not
+# asked from Gemini: they come from the dataset profiles in nutrient_stats and
+# are added after the (cached) text sections. N/P/K are optional and only feed
+# the imbalance chart.
+
+def get_crop_recommendation_query(crop_name: str, moisture: float, ph: float, temperature: float,
+                                  nitrogen: float = None, phosphorus: float = None, potassium: float = None):
+    # The prompt only uses rounded values, so equivalent requests share a cache entry
+    moisture, ph, temperature = (round(float(v), ADVISORY_CACHE_ROUND) for v in (moisture, ph, temperature))
+    crop_name = crop_name.strip()
+    params = {"crop": crop_name, "moisture": moisture, "ph": ph, "temperature": temperature}
+    result = cached_advisory(
+        PROMPT_VERSION, params,
+        lambda: _query_crop_recommendation(crop_name, moisture, ph, temperature),
+    )
+    return {**result, **crop_charts(crop_name, moisture, ph, temperature, nitrogen, phosphorus, potassium)}
+
+async def get_crop_recommendation_query_async(crop_name: str, moisture: float, ph: float, temperature: float,
+                                              nitrogen: float = None, phosphorus: float = None,
+                                              potassium: float = None, timeout: float = None):
+    """Async variant using the SDK's aio client; never blocks the event loop."""
+    moisture, ph, temperature = (round(float(v), ADVISORY_CACHE_ROUND) for v in (moisture, ph, temperature))
+    crop_name = crop_name.strip()
+    params = {"crop": crop_name, "moisture": moisture, "ph": ph, "temperature": temperature}
+    result = await cached_advisory_async(
+        PROMPT_VERSION, params,
+        lambda: _query_crop_recommendation_async(crop_name, moisture, ph, temperature, timeout),
+    )
+    return {**result, **crop_charts(crop_name, moisture, ph, temperature, nitrogen, phosphorus, potassium)}
+
+async def stream_crop_recommendation(crop_name: str, moisture: float, ph: float, temperature: float,
+                                     nitrogen: float = None, phosphorus: float = None, potassium: float = None):
+    """Yields ``(event, data)`` pairs: the computed charts first, then each section as Gemini writes it."""
+    moisture, ph, temperature = (round(float(v), ADVISORY_CACHE_ROUND) for v in (moisture, ph, temperature))
+    crop_name = crop_name.strip()
+    params = {"crop": crop_name, "moisture": moisture, "ph": ph, "temperature": temperature}
+    prompt = build_crop_prompt(crop_name, moisture, ph, temperature)
+    charts = crop_charts(crop_name, moisture, ph, temperature, nitrogen, phosphorus, potassium)
+    async with aclosing(stream_advisory(PROMPT_VERSION, params, prompt, CROP_SECTIONS, {"bestCrops": crop_name},
+                                        precomputed=charts)) as events:
+        async for event in events:
+            yield event
+
+def build_crop_prompt(crop_name: str, moisture: float, ph: float, temperature: float):
+    return f""" Give a structured crop recommendation for:
 
 Crop: {crop_name}
 Environmental Conditions:
@@ -91,43 +77,39 @@ Growth Tips: <Tips for better yield>
 Climate Suitability: <Details>
 Warnings: <Precautions>
 Trends: Jan-0, Feb-0, Mar-15, Apr-15, May-15
-Seasonal Requirements: Spring-33, Summer-33, Autumn-33, Winter-0
-Nutrient Distribution: Nitrogen-38, Phosphorus-23, Potassium-15
-Nutrient Imbalance: Nitrogen-50, Phosphorus-30, Potassium-20
 
-Use only numeric values (no text or % signs) for trends and nutrient data.
+Use only numeric values (no text or % signs) for trends.
 """
 
+def parse_crop_recommendation(text: str, crop_name: str):
+    return parse_sections(text, CROP_SECTIONS, {"bestCrops": crop_name})
+
+def _query_crop_recommendation(crop_name: str, moisture: float, ph: float, temperature: float):
+    prompt = build_crop_prompt(crop_name, moisture, ph, temperature)
+
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-lite",
+        response = get_client().models.generate_content(
+            model=MODEL_NAME,
             contents=prompt
         )
-        print("Raw Gemini Crop Output:\n", response.text)
-
-        text = response.text.strip()
-
-        # Parse sections using regex or keyword-based slicing as needed
-        crop_match = re.search(r'Crop:\s*(.*?)(?:\n|$)', text)
-        tips_match = re.search(r'Growth Tips:\s*(.*?)(?:\n|$)', text)
-        climate_match = re.search(r'Climate Suitability:\s*(.*?)(?:\n|$)', text)
-        warnings_match = re.search(r'Warnings:\s*(.*?)(?:\n|$)', text)
-        trends_match = re.search(r'Trends:\s*(.*?)(?:\n|$)', text)
-        seasonal_match = re.search(r'Seasonal Requirements:\s*(.*?)(?:\n|$)', text)
-        distribution_match = re.search(r'Nutrient Distribution:\s*(.*?)(?:\n|$)', text)
-        imbalance_match = re.search(r'Nutrient Imbalance:\s*(.*?)(?:\n|$)', text)
-
-        return {
-            "bestCrops": crop_match.group(1).strip() if crop_match else crop_name,
-            "growthTips": tips_match.group(1).strip() if tips_match else "",
-            "climateSuitability": climate_match.group(1).strip() if climate_match else "",
-            "warnings": warnings_match.group(1).strip() if warnings_match else "",
-            "trendsData": parse_trends(trends_match.group(1)) if trends_match else [],
-            "seasonalRequirements": parse_seasonal(seasonal_match.group(1)) if seasonal_match else [],
-            "nutrientDistribution": parse_distribution(distribution_match.group(1)) if distribution_match else [],
-            "nutrientImbalance": parse_imbalance(imbalance_match.group(1)) if imbalance_match else [],
-        }
+        logger.debug(f"Raw Gemini crop output: {response.text!r}")
+        return parse_crop_recommendation(response.text, crop_name)
+
+    except Exception as e:
+        logger.exception(f"❌ get_crop_recommendation_query failed: {e}")
+        return {"error": str(e)}
+
+async def _query_crop_recommendation_async(crop_name: str, moisture: float, ph: float, temperature: float,
+                                           timeout: float = None):
+    prompt = build_crop_prompt(crop_name, moisture, ph, temperature)
+
+    try:
+        response = await generate_async(prompt, timeout)
+        return parse_crop_recommendation(response.text, crop_name)
 
+    except asyncio.TimeoutError:
+        logger.warning("⚠️ Gemini crop advisory timed out")
+        return {"error": "Gemini request timed out"}
     except Exception as e:
-        print(f"Error in get_crop_recommendation_query: {str(e)}")
+        logger.exception(f"❌ get_crop_recommendation_query_async failed: {e}")
         return {"error": str(e)}
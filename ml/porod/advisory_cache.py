@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger("uvicorn")
+
+# Parsed Gemini advisories keyed on the prompt template version and the
+# normalised prompt parameters, so a cache hit never touches the network.
+
+DEFAULT_PATH = Path(__file__).resolve().parent / "advisory_cache.sqlite3"
+ADVISORY_CACHE_ROUND = int(os.getenv("ADVISORY_CACHE_ROUND", "1"))
+
+
+def normalise_params(params, digits=ADVISORY_CACHE_ROUND):
+    """Rounds numbers so equivalent prompts share a key.
+
+    Strings are kept verbatim: the prompt and the response defaults use the
+    name exactly as given, so "Rice" and "rice" must not share an entry.
+    Callers trim names before building both the prompt and the key.
+    """
+    out = {}
+    for name, value in params.items():
+        if isinstance(value, str):
+            out[name] = value
+        elif value is None:
+            out[name] = None
+        else:
+            out[name] = round(float(value), digits)
+    return out
+
+
+def advisory_key(template_version, params):
+    payload = json.dumps({"v": template_version, "p": normalise_params(params)}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteAdvisoryCache:
+    """On-disk advisory cache with TTL and least-recently-used size eviction."""
+
+    def __init__(self, path=DEFAULT_PATH, ttl=7 * 24 * 3600, max_entries=10000):
+        self.path = str(path)
+        self.ttl = float(ttl)
+        self.max_entries = int(max_entries)
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS advisories ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS advisories_accessed ON advisories (accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM advisories WHERE key = ? AND created > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE advisories SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO advisories (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            expired = self._conn.execute(
+                "DELETE FROM advisories WHERE created <= ?", (now - self.ttl,)
+            ).rowcount
+            overflow = self._conn.execute("SELECT COUNT(*) FROM advisories").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM advisories WHERE key IN "
+                    "(SELECT key FROM advisories ORDER BY accessed LIMIT ?)", (overflow,)
+                )
+            self._conn.commit()
+        self.evictions += expired + max(0, overflow)
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM advisories").fetchone()[0]
+        return {"backend": "sqlite", "size": size, "max_entries": self.max_entries, "ttl_s": self.ttl,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class RedisAdvisoryCache:
+    """Redis advisory cache; entries expire by TTL and the oldest are trimmed past ``max_entries``."""
+
+    def __init__(self, url, ttl=7 * 24 * 3600, max_entries=10000, prefix="advisory"):
+        import redis
+
+        self.ttl = int(ttl)
+        self.max_entries = int(max_entries)
+        self.prefix = prefix
+        self.hits = self.misses = self.evictions = 0
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._index = f"{prefix}:index"
+
+    def get(self, key):
+        raw = self._redis.get(f"{self.prefix}:{key}")
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._redis.zadd(self._index, {key: time.time()})
+        return json.loads(raw)
+
+    def set(self, key, value):
+        now = time.time()
+        pipe = self._redis.pipeline()
+        pipe.set(f"{self.prefix}:{key}", json.dumps(value), ex=self.ttl)
+        pipe.zadd(self._index, {key: now})
+        pipe.zremrangebyscore(self._index, "-inf", now - self.ttl)
+        pipe.zcard(self._index)
+        size = pipe.execute()[-1]
+        if size > self.max_entries:
+            oldest = self._redis.zrange(self._index, 0, size - self.max_entries - 1)
+            if oldest:
+                self._redis.delete(*[f"{self.prefix}:{k}" for k in oldest])
+                self._redis.zrem(self._index, *oldest)
+                self.evictions += len(oldest)
+
+    def stats(self):
+        return {"backend": "redis", "size": self._redis.zcard(self._index), "max_entries": self.max_entries,
+                "ttl_s": self.ttl, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_advisory_cache():
+    """Process-wide cache chosen by ADVISORY_CACHE_BACKEND (sqlite, redis or none)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                backend = os.getenv("ADVISORY_CACHE_BACKEND", "sqlite")
+                ttl = float(os.getenv("ADVISORY_CACHE_TTL_S", str(7 * 24 * 3600)))
+                max_entries = int(os.getenv("ADVISORY_CACHE_MAX_ENTRIES", "10000"))
+                if backend == "redis" and os.getenv("REDIS_URL"):
+                    _cache = RedisAdvisoryCache(os.environ["REDIS_URL"], ttl, max_entries)
+                elif backend == "sqlite":
+                    path = os.getenv("ADVISORY_CACHE_PATH", str(DEFAULT_PATH))
+                    _cache = SQLiteAdvisoryCache(path, ttl, max_entries)
+                else:
+                    _cache = False
+                logger.info(f"🗄️ Advisory cache backend: {backend if _cache else 'disabled'}")
+    return _cache or None
+
+
+def cached_advisory(template_version, params, produce):
+    """Returns the cached advisory for these params, or calls ``produce()`` and caches it.
+
+    Results containing an ``error`` key are never cached.
+    """
+    cache = get_advisory_cache()
+    if cache is None:
+        return produce()
+
+    key = advisory_key(template_version, params)
+    try:
+        hit = cache.get(key)
+    except Exception as e:
+        logger.warning(f"⚠️ Advisory cache read failed: {e}")
+        hit = None
+    if hit is not None:
+        return hit
+
+    result = produce()
+    if "error" not in result:
+        try:
+            cache.set(key, result)
+        except Exception as e:
+            logger.warning(f"⚠️ Advisory cache write failed: {e}")
+    return result
+
+
+async def cached_advisory_async(template_version, params, produce):
+    """Async counterpart of :func:`cached_advisory`; ``produce`` is a coroutine function.
+
+    Cache reads and writes run in a thread so a slow disk or Redis never blocks the loop.
+    """
+    cache = get_advisory_cache()
+    if cache is None:
+        return await produce()
+
+    key = advisory_key(template_version, params)
+    try:
+        hit = await asyncio.to_thread(cache.get, key)
+    except Exception as e:
+        logger.warning(f"⚠️ Advisory cache read failed: {e}")
+        hit = None
+    if hit is not None:
+        return hit
+
+    result = await produce()
+    if "error" not in result:
+        try:
+            await asyncio.to_thread(cache.set, key, result)
+        except Exception as e:
+            logger.warning(f"⚠️ Advisory cache write failed: {e}")
+    return result
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import re
+from contextlib import aclosing
+
+from ml.porod.advisory_cache import advisory_key, get_advisory_cache
+from ml.porod.llm import stream_async
+
+logger = logging.getLogger("uvicorn")
+
+# Gemini advisories are "Label: value" lines. One incremental parser serves both
+# the crop and fertilizer prompts: feed it text as it streams in and it returns
+# each section as soon as that section's line is complete.
+
+_LEADING_MARKUP = re.compile(r"^[\s*#>-]*")
+_NON_NUMERIC = re.compile(r"[^\d.]")
+
+
+def parse_pairs(text, name_key, value_key):
+    """Parses "Jan-0, Feb-15" style lists into ``[{name_key: "Jan", value_key: 0}, ...]``."""
+    # Gemini sometimes appends an explanation ("... the imbalance should be ...")
+    text = text.split("the imbalance should be")[0]
+    result = []
+    for pair in text.split(","):
+        parts = pair.split("-", 1)
+        if len(parts) != 2:
+            continue
+        value_str = _NON_NUMERIC.sub("", parts[1])
+        try:
+            value = int(float(value_str)) if value_str else 0
+        except ValueError:
+            continue
+        result.append({name_key: parts[0].strip(), value_key: value})
+    return result
+
+
+class Section:
+    """One ``Label: value`` line of an advisory, stored under ``key`` once parsed."""
+
+    def __init__(self, label, key, parse=None, default=""):
+        self.label = label
+        self.key = key
+        self.parse = parse or (lambda value: value)
+        self.default = default
+
+
+def pairs(label, key, name_key, value_key):
+    return Section(label, key, lambda value: parse_pairs(value, name_key, value_key), default=[])
+
+
+class AdvisoryParser:
+    """Incremental ``Label: value`` parser.
+
+    ``feed(chunk)`` returns the ``(key, value)`` sections completed by that
+    chunk; ``close()`` flushes a final unterminated line. The first occurrence
+    of a label wins, and ``result()`` fills missing sections with defaults.
+    """
+
+    def __init__(self, sections):
+        self.sections = list(sections)
+        self._by_label = {s.label.lower(): s for s in self.sections}
+        self._pattern = re.compile(
+            "^(" + "|".join(re.escape(s.label) for s in self.sections) + r")\**\s*:\s*(.*)$",
+            re.IGNORECASE,
+        )
+        self._buffer = ""
+        self.values = {}
+
+    def _parse_line(self, line):
+        match = self._pattern.match(_LEADING_MARKUP.sub("", line))
+        if match is None:
+            return None
+        section = self._by_label[match.group(1).lower()]
+        if section.key in self.values:
+            return None
+        value = section.parse(match.group(2).strip(" *"))
+        self.values[section.key] = value
+        return section.key, value
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        return [parsed for parsed in map(self._parse_line, lines) if parsed]
+
+    def close(self):
+        line, self._buffer = self._buffer, ""
+        parsed = self._parse_line(line)
+        return [parsed] if parsed else []
+
+    def result(self, defaults=None):
+        defaults = defaults or {}
+        return {
+            s.key: self.values.get(s.key, defaults.get(s.key, s.default))
+            for s in self.sections
+        }
+
+
+def parse_sections(text, sections, defaults=None):
+    """Parses a complete advisory text in one go."""
+    parser = AdvisoryParser(sections)
+    parser.feed(text)
+    parser.close()
+    return parser.result(defaults)
+
+
+async def stream_advisory(template_version, params, prompt, sections, defaults=None, extra=None,
+                          precomputed=None):
+    """Streams an advisory as ``(event, data)`` pairs.
+
+    Yields ``("section", {"key": ..., "value": ...})`` for each section as soon
+    as Gemini has produced its line, then ``("done", full_result)``. Cache hits
+    replay the cached sections immediately; failures end with ``("error", ...)``
+    and are not cached.
+
+    ``precomputed`` sections are computed locally and are emitted before any
+    Gemini output; they and ``extra`` are added to the result but never cached.
+    """
+    local = {**(precomputed or {}), **(extra or {})}
+    for k, v in (precomputed or {}).items():
+        yield "section", {"key": k, "value": v}
+
+    cache = get_advisory_cache()
+    key = advisory_key(template_version, params)
+    if cache is not None:
+        try:
+            hit = await asyncio.to_thread(cache.get, key)
+        except Exception as e:
+            logger.warning(f"⚠️ Advisory cache read failed: {e}")
+            hit = None
+        if hit is not None:
+            for s in sections:
+                if s.key in hit:
+                    yield "section", {"key": s.key, "value": hit[s.key]}
+            yield "done", {**hit, **local}
+            return
+
+    parser = AdvisoryParser(sections)
+    try:
+        # aclosing: if our consumer goes away mid-stream, the Gemini slot is freed right away
+        async with aclosing(stream_async(prompt)) as chunks:
+            async for chunk in chunks:
+                for k, v in parser.feed(chunk):
+                    yield "section", {"key": k, "value": v}
+        for k, v in parser.close():
+            yield "section", {"key": k, "value": v}
+    except asyncio.TimeoutError:
+        yield "error", {"error": "Gemini request timed out", **local}
+        return
+    except Exception as e:
+        yield "error", {"error": str(e), **local}
+        return
+
+    result = parser.result(defaults)
+    if cache is not None:
+        try:
+            await asyncio.to_thread(cache.set, key, result)
+        except Exception as e:
+            logger.warning(f"⚠️ Advisory cache write failed: {e}")
+    yield "done", {**result, **local}
@@ -0,0 +1,169 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger("uvicorn")
+
+
+class QueueFullError(Exception):
+    """Raised when the batching queue has reached its maximum depth."""
+
+
+class MicroBatcher:
+    """Collects concurrent single-row requests and runs them as one batch.
+
+    A batch is flushed as soon as it holds ``max_batch_size`` items or the
+    oldest item has waited ``max_wait_ms``, whichever comes first.
+    ``predict_fn`` receives the list of queued items and must return one
+    result per item, in the same order. It may be a coroutine function, in
+    which case up to ``max_concurrent_batches`` batches run at once.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, max_queue=1024,
+                 max_concurrent_batches=1, name="batcher"):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue = max(1, int(max_queue))
+        self.max_concurrent_batches = max(1, int(max_concurrent_batches))
+        self.name = name
+
+        self._pending = deque()
+        self._has_items = None
+        self._full = None
+        self._slots = None
+        self._worker = None
+        self._batch_tasks = set()
+
+        # ---------- METRICS ----------
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.errors = 0
+        self.max_batch_seen = 0
+        self.max_depth_seen = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    # ---------- LIFECYCLE ----------
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._has_items = asyncio.Event()
+            self._full = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            if self._pending:
+                self._has_items.set()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for task in list(self._batch_tasks):
+            task.cancel()
+
+    # ---------- SUBMIT ----------
+    async def submit(self, item):
+        self._ensure_started()
+        if len(self._pending) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"{self.name} queue is full ({self.max_queue})")
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        self.max_depth_seen = max(self.max_depth_seen, len(self._pending))
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    # ---------- WORKER ----------
+    async def _collect(self):
+        await self._has_items.wait()
+        if len(self._pending) < self.max_batch_size:
+            timeout = self._pending[0][2] + self.max_wait - time.perf_counter()
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+        size = min(self.max_batch_size, len(self._pending))
+        batch = [self._pending.popleft() for _ in range(size)]
+        if len(self._pending) < self.max_batch_size:
+            self._full.clear()
+        if not self._pending:
+            self._has_items.clear()
+        return batch
+
+    async def _run(self):
+        while True:
+            # Wait for a free slot first so the next batch keeps filling meanwhile
+            await self._slots.acquire()
+            batch = await self._collect()
+            # Callers that gave up (e.g. client disconnect) don't need a slot
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task):
+        self._batch_tasks.discard(task)
+        self._slots.release()
+
+    async def _run_batch(self, batch):
+        started = time.perf_counter()
+        self.total_wait += sum(started - queued_at for _, _, queued_at in batch)
+        try:
+            results = self.predict_fn([item for item, _, _ in batch])
+            if inspect.isawaitable(results):
+                results = await results
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"{self.name} returned {len(results)} results for {len(batch)} items"
+                )
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"❌ {self.name} batch failed: {e!r}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.total_run += time.perf_counter() - started
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+    # ---------- STATS ----------
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_queue": self.max_queue,
+            "max_concurrent_batches": self.max_concurrent_batches,
+            "batches_in_flight": len(self._batch_tasks),
+            "queue_depth": len(self._pending),
+            "max_queue_depth_seen": self.max_depth_seen,
+            "batches": self.batches,
+            "items": self.items,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size_seen": self.max_batch_seen,
+            "avg_wait_ms": round(1000.0 * self.total_wait / self.items, 3) if self.items else 0.0,
+            "avg_batch_run_ms": round(1000.0 * self.total_run / self.batches, 3) if self.batches else 0.0,
+        }
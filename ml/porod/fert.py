@@ -1,84 +1,68 @@
-import re
-from google import genai
-import json
-
-from ml.porod.Credentials import getCredentials
-YOUR_API_KEY = getCredentials()
-
-client = genai.Client(api_key=YOUR_API_KEY)
-
-def clean_json_output(text):
-    cleaned = re.sub(r"```(?:json)?\n(.*?)```", r"\1", text.strip(), flags=re.DOTALL)
-    return cleaned.strip()
-
-def parse_trends(text):
-    # More robust parsing with error handling
-    result = []
-    for pair in text.split(","):
-        try:
-            parts = pair.split("-", 1)
-            if len(parts) == 2:
-                date = parts[0].strip()
-                # Handle percentage signs and other non-numeric characters
-                value_str = re.sub(r'[^\d.]', '', parts[1].strip())
-                value = int(float(value_str)) if value_str else 0
-                result.append({"date": date, "value": value})
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing trend: {pair} - {str(e)}")
-    return result
-
-def parse_seasonal(text):
-    # More robust parsing with error handling
-    result = []
-    for pair in text.split(","):
-        try:
-            parts = pair.split("-", 1)
-            if len(parts) == 2:
-                season = parts[0].strip()
-                # Handle percentage signs and other non-numeric characters
-                value_str = re.sub(r'[^\d.]', '', parts[1].strip())
-                value = int(float(value_str)) if value_str else 0
-                result.append({"season": season, "requirement": value})
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing seasonal: {pair} - {str(e)}")
-    return result
-
-def parse_distribution(text):
-    # More robust parsing with error handling
-    result = []
-    for pair in text.split(","):
-        try:
-            parts = pair.split("-", 1)
-            if len(parts) == 2:
-                name = parts[0].strip()
-                # Handle percentage signs and other non-numeric characters
-                value_str = re.sub(r'[^\d.]', '', parts[1].strip())
-                value = int(float(value_str)) if value_str else 0
-                result.append({"name": name, "value": value})
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing distribution: {pair} - {str(e)}")
-    return result
-
-def parse_imbalance(text):
-    # More robust parsing with error handling
-    result = []
-    # Clean up text by removing the explanatory part after "the imbalance should be..."
-    text = text.split("the imbalance should be")[0].strip()
-    for pair in text.split(","):
-        try:
-            parts = pair.split("-", 1)
-            if len(parts) == 2:
-                nutrient = parts[0].strip()
-                # Handle percentage signs and other non-numeric characters
-                value_str = re.sub(r'[^\d.]', '', parts[1].strip())
-                value = int(float(value_str)) if value_str else 0
-                result.append({"nutrient": nutrient, "value": value})
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing imbalance: {pair} - {str(e)}")
-    return result
+import asyncio
+import logging
+from contextlib import aclosing
+
+from ml.porod.llm import MODEL_NAME, generate_async, get_client
+from ml.porod.advisory_cache import ADVISORY_CACHE_ROUND, cached_advisory, cached_advisory_async
+from ml.porod.advisory_parser import Section, pairs, parse_sections, stream_advisory
+from ml.porod.nutrient_stats import fertiliser_charts
+
+logger = logging.getLogger("uvicorn")
+
+# Bump whenever the prompt or the parsing below changes, so cached advisories are not reused
+PROMPT_VERSION = "fert-v5"
+
+FERTILISER_SECTIONS = [
+    Section("Fertilizer", "fertilizer", lambda name: {"name": name}),
+    Section("Dosage", "dosage"),
+    Section("Best Practices", "bestPractices"),
+    Section("Warnings", "warnings"),
+    pairs("Trends", "trendsData", "date", "value"),
+]
+# Seasonal requirements, nutrient distribution and nutrient imbalance come
+# from the dataset profiles in nutrient_stats, not from Gemini
 
 def get_fertiliser_query(fertilizer_name: str, nitrogen: float, phosphorus: float, potassium: float):
-    prompt = f""" Give a structured fertilizer recommendation for the following:
+    # The prompt only uses rounded values, so equivalent requests share a cache entry
+    nitrogen, phosphorus, potassium = (round(float(v), ADVISORY_CACHE_ROUND) for v in (nitrogen, phosphorus, potassium))
+    fertilizer_name = fertilizer_name.strip()
+    params = {"fertilizer": fertilizer_name, "n": nitrogen, "p": phosphorus, "k": potassium}
+    result = cached_advisory(
+        PROMPT_VERSION, params,
+        lambda: _query_fertiliser(fertilizer_name, nitrogen, phosphorus, potassium),
+    )
+    return {**result, **npk_values(nitrogen, phosphorus, potassium),
+            **fertiliser_charts(fertilizer_name, nitrogen, phosphorus, potassium)}
+
+async def get_fertiliser_query_async(fertilizer_name: str, nitrogen: float, phosphorus: float, potassium: float,
+                                     timeout: float = None):
+    """Async variant using the SDK's aio client; never blocks the event loop."""
+    nitrogen, phosphorus, potassium = (round(float(v), ADVISORY_CACHE_ROUND) for v in (nitrogen, phosphorus, potassium))
+    fertilizer_name = fertilizer_name.strip()
+    params = {"fertilizer": fertilizer_name, "n": nitrogen, "p": phosphorus, "k": potassium}
+    result = await cached_advisory_async(
+        PROMPT_VERSION, params,
+        lambda: _query_fertiliser_async(fertilizer_name, nitrogen, phosphorus, potassium, timeout),
+    )
+    return {**result, **npk_values(nitrogen, phosphorus, potassium),
+            **fertiliser_charts(fertilizer_name, nitrogen, phosphorus, potassium)}
+
+async def stream_fertiliser_query(fertilizer_name: str, nitrogen: float, phosphorus: float, potassium: float):
+    """Yields ``(event, data)`` pairs: the computed charts first, then each section as Gemini writes it."""
+    nitrogen, phosphorus, potassium = (round(float(v), ADVISORY_CACHE_ROUND) for v in (nitrogen, phosphorus, potassium))
+    fertilizer_name = fertilizer_name.strip()
+    params = {"fertilizer": fertilizer_name, "n": nitrogen, "p": phosphorus, "k": potassium}
+    prompt = build_fertiliser_prompt(fertilizer_name, nitrogen, phosphorus, potassium)
+    npk = npk_values(nitrogen, phosphorus, potassium)
+    charts = fertiliser_charts(fertilizer_name, nitrogen, phosphorus, potassium)
+    async with aclosing(stream_advisory(PROMPT_VERSION, params, prompt, FERTILISER_SECTIONS,
+                                        {"fertilizer": {"name": fertilizer_name}}, extra=npk,
+                                        precomputed=charts)) as events:
+        async for event in events:
+            yield event
+
+def build_fertiliser_prompt(fertilizer_name: str, nitrogen: float, phosphorus: float, potassium: float):
+    return f""" Give a structured fertilizer recommendation for the following:
 
 Fertilizer: {fertilizer_name}
 Nutrient Levels:
@@ -93,55 +77,50 @@ Dosage: <Application dosage and frequency>
 Best Practices: <How to apply the fertilizer>
 Warnings: <Warnings or side-effects>
 Trends: Jan-0, Feb-0, Mar-15, Apr-15, May-15
-Seasonal Requirements: Spring-33, Summer-33, Autumn-33, Winter-0
-Nutrient Distribution: Nitrogen-38, Phosphorus-23, Potassium-15
-Nutrient Imbalance: Nitrogen-50, Phosphorus-30, Potassium-20
 
-Please use only numeric values (no text or percentages) for all the data points in Trends, Seasonal Requirements, Nutrient Distribution, and Nutrient Imbalance.
+Please use only numeric values (no text or percentages) for all the data points in Trends.
 """
 
+def npk_values(nitrogen: float, phosphorus: float, potassium: float):
+    # Added to every response after the cache, so cached entries hold only the parsed sections
+    return {"npk_values": {"n": nitrogen, "p": phosphorus, "k": potassium}}
+
+def parse_fertiliser_recommendation(text: str, fertilizer_name: str):
+    return parse_sections(text, FERTILISER_SECTIONS, {"fertilizer": {"name": fertilizer_name}})
+
+def _query_fertiliser(fertilizer_name: str, nitrogen: float, phosphorus: float, potassium: float):
+    prompt = build_fertiliser_prompt(fertilizer_name, nitrogen, phosphorus, potassium)
+
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-lite",
+        response = get_client().models.generate_content(
+            model=MODEL_NAME,
             contents=prompt
         )
-        print("Raw Gemini Output:\n", response.text)
-        
-        # Extract sections more robustly
-        text = response.text.strip()
-        sections = {}
-        
-        # Extract each section
-        fertilizer_match = re.search(r'Fertilizer:\s*(.*?)(?:\n|$)', text)
-        dosage_match = re.search(r'Dosage:\s*(.*?)(?:\n|$)', text)
-        practices_match = re.search(r'Best Practices:\s*(.*?)(?:\n|$)', text)
-        warnings_match = re.search(r'Warnings:\s*(.*?)(?:\n|$)', text)
-        trends_match = re.search(r'Trends:\s*(.*?)(?:\n|$)', text)
-        seasonal_match = re.search(r'Seasonal Requirements:\s*(.*?)(?:\n|$)', text)
-        distribution_match = re.search(r'Nutrient Distribution:\s*(.*?)(?:\n|$)', text)
-        imbalance_match = re.search(r'Nutrient Imbalance:\s*(.*?)(?:\n|$)', text)
-        
-        return {
-            "fertilizer": {"name": fertilizer_match.group(1).strip() if fertilizer_match else fertilizer_name},
-            "dosage": dosage_match.group(1).strip() if dosage_match else "",
-            "bestPractices": practices_match.group(1).strip() if practices_match else "",
-            "warnings": warnings_match.group(1).strip() if warnings_match else "",
-            "trendsData": parse_trends(trends_match.group(1)) if trends_match else [],
-            "seasonalRequirements": parse_seasonal(seasonal_match.group(1)) if seasonal_match else [],
-            "nutrientDistribution": parse_distribution(distribution_match.group(1)) if distribution_match else [],
-            "nutrientImbalance": parse_imbalance(imbalance_match.group(1)) if imbalance_match else [],
-            "npk_values": {
-                "n": nitrogen,
-                "p": phosphorus,
-                "k": potassium
-            }
-        }
+        logger.debug(f"Raw Gemini output: {response.text!r}")
+        return parse_fertiliser_recommendation(response.text, fertilizer_name)
         
     except Exception as e:
-        print(f"Error in get_fertiliser_query: {str(e)}")
-        return {"error": str(e), "npk_values": {"n": nitrogen, "p": phosphorus, "k": potassium}}
+        logger.exception(f"❌ get_fertiliser_query failed: {e}")
+        return {"error": str(e)}
+
+async def _query_fertiliser_async(fertilizer_name: str, nitrogen: float, phosphorus: float, potassium: float,
+                                  timeout: float = None):
+    prompt = build_fertiliser_prompt(fertilizer_name, nitrogen, phosphorus, potassium)
+
+    try:
+        response = await generate_async(prompt, timeout)
+        return parse_fertiliser_recommendation(response.text, fertilizer_name)
+
+    except asyncio.TimeoutError:
+        logger.warning("⚠️ Gemini fertilizer advisory timed out")
+        return {"error": "Gemini request timed out"}
+    except Exception as e:
+        logger.exception(f"❌ get_fertiliser_query_async failed: {e}")
+        return {"error": str(e)}
 
 # Example test
 if __name__ == "__main__":
+    import json
+
     result = get_fertiliser_query("Urea", 80, 40, 60)
     print("Parsed Fertilizer JSON:\n", json.dumps(result, indent=2))
\ No newline at end of file
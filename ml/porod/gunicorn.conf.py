@@ -0,0 +1,19 @@
+# gunicorn -c ml/porod/gunicorn.conf.py ml.porod.mlapi:app   (run from the repository root)
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Import the app once in the master and fork workers from it, so modules and
+# preloaded models are shared copy-on-write instead of loaded per worker.
+# Memory-mapped artifacts (FERT_ENGINE=compiled, CROP_ENGINE=numpy with a
+# directory export) stay shared for the workers' whole lifetime.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+    if preload_app:
+        from ml.porod.mlapi import preload_models
+        preload_models()
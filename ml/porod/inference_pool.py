@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger("uvicorn")
+
+
+class PoolSaturatedError(Exception):
+    """Raised when every worker is busy and the pool's queue is full."""
+
+
+def _timed_call(fn, args):
+    # Runs inside the worker; the start time lets the caller measure queue wait
+    return time.time(), fn(*args)
+
+
+class InferencePool:
+    """Bounded executor for blocking model calls made from async handlers.
+
+    ``kind`` is ``"thread"`` or ``"process"``. At most ``workers`` calls run at
+    once and at most ``max_queue`` more may wait; anything beyond that fails
+    fast with :class:`PoolSaturatedError`. Each call is limited to ``timeout``
+    seconds. In process mode ``fn`` must be a module-level function and
+    ``initializer`` (if given) runs once in every worker process.
+    """
+
+    def __init__(self, kind="thread", workers=2, max_queue=64, timeout=10.0, initializer=None,
+                 name="inference_pool"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.kind = kind
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.timeout = float(timeout) if timeout else None
+        self.initializer = initializer
+        self.name = name
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        # ---------- METRICS ----------
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failed = 0
+        self.max_in_flight_seen = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    # ---------- LIFECYCLE ----------
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                # Spawned workers import the app module fresh instead of
+                # inheriting a forked TensorFlow runtime
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            logger.info(f"🧵 {self.name}: started {self.workers} {self.kind} worker(s)")
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ---------- RUN ----------
+    def _release(self, submitted_at, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.failed += 1
+                return
+            started_at, _ = future.result()
+            finished_at = time.time()
+            self.completed += 1
+            self.total_wait += max(0.0, started_at - submitted_at)
+            self.total_run += max(0.0, finished_at - started_at)
+
+    async def run(self, fn, *args, timeout=...):
+        """Runs ``fn(*args)`` in a worker; ``timeout`` overrides the pool default."""
+        timeout = self.timeout if timeout is ... else timeout
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PoolSaturatedError(f"{self.name} is saturated")
+            self._in_flight += 1
+            self.submitted += 1
+            self.max_in_flight_seen = max(self.max_in_flight_seen, self._in_flight)
+
+        submitted_at = time.time()
+        try:
+            future = self._get_executor().submit(_timed_call, fn, args)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(lambda f: self._release(submitted_at, f))
+
+        try:
+            # shield: a timed-out call keeps its slot until the worker really finishes
+            _, result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            future.cancel()  # only succeeds if the call never started
+            raise
+        return result
+
+    # ---------- STATS ----------
+    def stats(self):
+        in_flight = self._in_flight
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "timeout_s": self.timeout,
+            "active": min(in_flight, self.workers),
+            "queued": max(0, in_flight - self.workers),
+            "utilisation": round(min(in_flight, self.workers) / self.workers, 3),
+            "max_in_flight_seen": self.max_in_flight_seen,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(1000.0 * self.total_wait / self.completed, 3) if self.completed else 0.0,
+            "avg_run_ms": round(1000.0 * self.total_run / self.completed, 3) if self.completed else 0.0,
+        }
@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from ml.artifacts import load_arrays, save_arrays
+
+# Full-text search over the research PDFs in litsurvey/.
+#
+# Indexing (python -m ml.porod.litsearch) extracts page text with pdfplumber
+# in a process pool and caches it per file under its SHA-256, so re-indexing
+# only extracts new or changed PDFs. The page text is cut into passages and
+# an inverted index is written in CSR form: the postings of term t are
+# ``postings_doc[offsets[t]:offsets[t + 1]]`` with matching term frequencies.
+# A query is a few slices plus one np.bincount, ranked with BM25.
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+CORPUS_DIR = ROOT_DIR / "litsurvey"
+DEFAULT_INDEX_DIR = CORPUS_DIR / ".index"
+
+PASSAGE_WORDS = 80
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the their this to was were "
+    "which with we our these those been can not also than such into".split()
+)
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+# ===================== EXTRACTION =====================
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_pages(path):
+    """Text of every page; runs in a pool worker."""
+    import pdfplumber
+
+    pages = []
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            # The default tolerance of 3 glues words of tightly set papers together
+            pages.append(page.extract_text(x_tolerance=1.5) or "")
+            page.close()
+    return pages
+
+
+def split_passages(text, words=PASSAGE_WORDS):
+    """Cuts page text into passages of about ``words`` words, on line boundaries."""
+    # Re-join words hyphenated across line breaks
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    passages, current, count = [], [], 0
+    for line in text.splitlines():
+        n = len(line.split())
+        if not n:
+            continue
+        current.append(line.strip())
+        count += n
+        if count >= words:
+            passages.append(" ".join(current))
+            current, count = [], 0
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def extract_corpus(corpus_dir=CORPUS_DIR, cache_dir=DEFAULT_INDEX_DIR / "text", workers=None):
+    """``{file name: [page text, ...]}`` for every PDF, extracting only uncached content.
+
+    Returns the pages and the list of files that had to be extracted.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    files = sorted(p for p in Path(corpus_dir).glob("*.pdf") if not p.name.startswith("."))
+    hashes = {p: file_hash(p) for p in files}
+
+    todo = [p for p in files if not (cache_dir / f"{hashes[p]}.json").exists()]
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for path, pages in zip(todo, pool.map(extract_pages, todo)):
+                (cache_dir / f"{hashes[path]}.json").write_text(json.dumps({"file": path.name, "pages": pages}))
+
+    # Cached text of files that were removed or changed is dropped
+    live = {f"{h}.json" for h in hashes.values()}
+    for stale in cache_dir.glob("*.json"):
+        if stale.name not in live:
+            stale.unlink()
+
+    corpus = {p.name: json.loads((cache_dir / f"{hashes[p]}.json").read_text())["pages"] for p in files}
+    return corpus, [p.name for p in todo]
+
+
+# ===================== INDEX =====================
+class LiteratureIndex:
+    """BM25 over passages; ``passages[i]`` is ``{"file", "page", "text"}``."""
+
+    def __init__(self, vocab, offsets, postings_doc, postings_tf, doc_len, passages):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.postings_doc = postings_doc
+        self.postings_tf = postings_tf
+        self.doc_len = doc_len
+        self.passages = passages
+        self._avg_len = float(doc_len.mean()) if len(doc_len) else 0.0
+        # Per-passage part of the BM25 denominator, computed once
+        self._norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / (self._avg_len or 1.0))
+
+    def __len__(self):
+        return len(self.passages)
+
+    # ---------- BUILD ----------
+    @classmethod
+    def build(cls, corpus):
+        passages, postings = [], {}
+        for name, pages in corpus.items():
+            for page_number, text in enumerate(pages, start=1):
+                for passage in split_passages(text):
+                    doc = len(passages)
+                    passages.append({"file": name, "page": page_number, "text": passage})
+                    tokens = tokenize(passage)
+                    for term in tokens:
+                        counts = postings.setdefault(term, {})
+                        counts[doc] = counts.get(doc, 0) + 1
+                    passages[-1]["_len"] = len(tokens)
+
+        vocab = {term: i for i, term in enumerate(sorted(postings))}
+        lengths = [len(postings[t]) for t in vocab]
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        postings_doc = np.empty(offsets[-1], dtype=np.int32)
+        postings_tf = np.empty(offsets[-1], dtype=np.float32)
+        for term, i in vocab.items():
+            docs = postings[term]
+            postings_doc[offsets[i]:offsets[i + 1]] = list(docs)
+            postings_tf[offsets[i]:offsets[i + 1]] = list(docs.values())
+
+        doc_len = np.array([p.pop("_len") for p in passages], dtype=np.float32)
+        return cls(vocab, offsets, postings_doc, postings_tf, doc_len, passages)
+
+    # ---------- PERSISTENCE ----------
+    def save(self, directory=DEFAULT_INDEX_DIR):
+        directory = Path(directory)
+        save_arrays(directory, {
+            "offsets": self.offsets, "postings_doc": self.postings_doc,
+            "postings_tf": self.postings_tf, "doc_len": self.doc_len,
+        })
+        terms = sorted(self.vocab, key=self.vocab.get)
+        (directory / "passages.json").write_text(json.dumps({"terms": terms, "passages": self.passages}))
+        return directory
+
+    @classmethod
+    def load(cls, directory=DEFAULT_INDEX_DIR):
+        directory = Path(directory)
+        if not (directory / "passages.json").exists():
+            raise FileNotFoundError(f"Literature index missing at {directory} (run python -m ml.porod.litsearch)")
+        arrays, _ = load_arrays(directory)
+        data = json.loads((directory / "passages.json").read_text())
+        vocab = {term: i for i, term in enumerate(data["terms"])}
+        return cls(vocab, arrays["offsets"], arrays["postings_doc"], arrays["postings_tf"],
+                   np.asarray(arrays["doc_len"]), data["passages"])
+
+    # ---------- SEARCH ----------
+    def scores(self, query):
+        n = len(self.passages)
+        scores = np.zeros(n)
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            docs = self.postings_doc[self.offsets[t]:self.offsets[t + 1]]
+            tf = self.postings_tf[self.offsets[t]:self.offsets[t + 1]]
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            weights = idf * tf * (BM25_K1 + 1) / (tf + self._norm[docs])
+            scores += np.bincount(docs, weights=weights, minlength=n)
+        return scores
+
+    def search(self, query, k=10):
+        """Top ``k`` passages as ``{"file", "page", "score", "text"}``, best first."""
+        scores = self.scores(query)
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [{**self.passages[i], "score": round(float(scores[i]), 4)} for i in hits]
+
+
+def build_index(corpus_dir=CORPUS_DIR, index_dir=DEFAULT_INDEX_DIR, workers=None):
+    """Extracts (incrementally) and indexes the corpus; returns the index and timings."""
+    timings = {}
+    start = time.perf_counter()
+    corpus, extracted = extract_corpus(corpus_dir, Path(index_dir) / "text", workers)
+    timings["extract_s"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    index = LiteratureIndex.build(corpus)
+    index.save(index_dir)
+    timings["index_s"] = round(time.perf_counter() - start, 3)
+    return index, {"files": len(corpus), "extracted": extracted, **timings}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index the litsurvey PDFs for BM25 search")
+    parser.add_argument("--corpus", default=str(CORPUS_DIR))
+    parser.add_argument("--out", default=str(DEFAULT_INDEX_DIR))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--query", action="append", default=[], help="print the top hits (repeatable)")
+    args = parser.parse_args()
+
+    index, report = build_index(args.corpus, args.out, args.workers)
+    print(f"{report['files']} files ({len(report['extracted'])} extracted), {len(index)} passages, "
+          f"{len(index.vocab)} terms: extraction {report['extract_s']}s, indexing {report['index_s']}s")
+
+    queries = args.query or ["crop recommendation lstm", "soil nitrogen phosphorus potassium",
+                             "fertilizer prediction random forest accuracy"]
+    index = LiteratureIndex.load(args.out)
+    start = time.perf_counter()
+    for _ in range(100):
+        for q in queries:
+            index.search(q)
+    print(f"query latency: {(time.perf_counter() - start) / (100 * len(queries)) * 1e3:.3f} ms")
+    for q in args.query:
+        print(f"\n{q}")
+        for hit in index.search(q, 5):
+            print(f"  {hit['score']:7.3f}  {hit['file']} p.{hit['page']}: {hit['text'][:100]}")
@@ -0,0 +1,114 @@
+import asyncio
+import os
+import threading
+
+from ml.porod.startup_report import lazy_import, timed
+
+# The Gemini SDK is heavy to import, so the client is built on first use only
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                genai = lazy_import("google.genai")
+                from ml.porod.Credentials import getCredentials
+                with timed("init genai.Client"):
+                    _client = genai.Client(api_key=getCredentials())
+    return _client
+
+
+# ===================== ASYNC CALLS =====================
+MODEL_NAME = "gemini-2.0-flash-lite"
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "20"))
+
+# Created on first use so it binds to the running event loop
+_semaphore = None
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def _acquire(deadline):
+    """Waits for a concurrency slot; the wait counts against ``deadline`` (loop time)."""
+    semaphore = _get_semaphore()
+    await asyncio.wait_for(semaphore.acquire(), max(0.0, deadline - asyncio.get_running_loop().time()))
+    return semaphore
+
+
+async def generate_async(prompt, timeout=None):
+    """Non-blocking Gemini call; at most LLM_MAX_CONCURRENCY run at once per process.
+
+    ``timeout`` covers waiting for a slot as well as the call itself.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (timeout or LLM_TIMEOUT_S)
+    semaphore = await _acquire(deadline)
+    try:
+        return await asyncio.wait_for(
+            get_client().aio.models.generate_content(model=MODEL_NAME, contents=prompt),
+            max(0.0, deadline - loop.time()),
+        )
+    finally:
+        semaphore.release()
+
+
+async def stream_async(prompt, timeout=None):
+    """Yields response text chunks as Gemini produces them.
+
+    Holds a concurrency slot for the whole stream; ``timeout`` bounds the wait
+    for a slot plus the full stream, not each chunk. The slot is released as
+    soon as the generator is closed (``aclose``, e.g. on client disconnect).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (timeout or LLM_TIMEOUT_S)
+    semaphore = await _acquire(deadline)
+    stream = None
+    try:
+        stream = await asyncio.wait_for(
+            get_client().aio.models.generate_content_stream(model=MODEL_NAME, contents=prompt),
+            max(0.0, deadline - loop.time()),
+        )
+        while True:
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), max(0.0, deadline - loop.time()))
+            except StopAsyncIteration:
+                break
+            if chunk.text:
+                yield chunk.text
+    finally:
+        # Release before awaiting anything, so a cancelled close cannot leak the slot
+        semaphore.release()
+        if stream is not None and hasattr(stream, "aclose"):
+            await stream.aclose()
+
+
+async def fan_out(calls, deadline):
+    """Runs ``{name: coroutine}`` concurrently under one overall deadline (seconds).
+
+    Returns ``{name: result}``; calls still running at the deadline are
+    cancelled and reported as ``{"error": "deadline exceeded"}``.
+    """
+    tasks = {name: asyncio.ensure_future(coro) for name, coro in calls.items()}
+    if not tasks:
+        return {}
+    await asyncio.wait(tasks.values(), timeout=deadline)
+
+    results = {}
+    for name, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            results[name] = {"error": "deadline exceeded"}
+        elif task.exception() is not None:
+            results[name] = {"error": str(task.exception())}
+        else:
+            results[name] = task.result()
+    return results
@@ -0,0 +1,65 @@
+import argparse
+from pathlib import Path
+
+# Per-process memory split from /proc/<pid>/smaps_rollup (Linux only).
+# "shared" pages are also mapped by another process (page cache of
+# memory-mapped artifacts, pages inherited from a preloading gunicorn master);
+# "unique" pages belong to this process alone and are what each extra worker costs.
+
+
+def smaps_rollup(pid="self"):
+    """Returns the smaps_rollup counters of ``pid`` in kB."""
+    fields = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        name, _, rest = line.partition(":")
+        parts = rest.split()
+        if parts and parts[0].isdigit():
+            fields[name.strip()] = int(parts[0])
+    return fields
+
+
+def process_memory(pid="self"):
+    try:
+        s = smaps_rollup(pid)
+    except OSError:
+        return None
+    mb = lambda kb: round(kb / 1024, 1)
+    return {
+        "rss_mb": mb(s.get("Rss", 0)),
+        "pss_mb": mb(s.get("Pss", 0)),
+        "shared_mb": mb(s.get("Shared_Clean", 0) + s.get("Shared_Dirty", 0)),
+        "unique_mb": mb(s.get("Private_Clean", 0) + s.get("Private_Dirty", 0)),
+    }
+
+
+def child_pids(pid):
+    pids = []
+    for task in Path(f"/proc/{pid}/task").iterdir():
+        children = (task / "children").read_text().split()
+        pids.extend(int(c) for c in children)
+    return sorted(pids)
+
+
+def report(pids):
+    rows = {pid: process_memory(pid) for pid in pids}
+    return {pid: row for pid, row in rows.items() if row is not None}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Unique vs shared RSS of gunicorn workers")
+    parser.add_argument("pids", nargs="*", type=int, help="process ids to report")
+    parser.add_argument("--master", type=int, help="report the master and all of its workers")
+    args = parser.parse_args()
+
+    pids = list(args.pids)
+    if args.master:
+        pids = [args.master] + child_pids(args.master)
+
+    rows = report(pids)
+    print(f"{'pid':>8} {'rss MB':>9} {'pss MB':>9} {'shared MB':>10} {'unique MB':>10}")
+    for pid, row in rows.items():
+        print(f"{pid:>8} {row['rss_mb']:>9} {row['pss_mb']:>9} {row['shared_mb']:>10} {row['unique_mb']:>10}")
+    workers = [row for pid, row in rows.items() if pid != args.master]
+    if workers:
+        print(f"workers: {len(workers)}, total unique {sum(r['unique_mb'] for r in workers):.1f} MB, "
+              f"total pss {sum(r['pss_mb'] for r in workers):.1f} MB")
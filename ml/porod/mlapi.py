@@ -1,22 +1,38 @@
-from fastapi import FastAPI, UploadFile, File, Depends, Request
+from fastapi import FastAPI, UploadFile, File, Form, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.exceptions import RequestValidationError
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
 
 import os
-import io
+import json
+import math
+import sys
+import asyncio
 import logging
-import joblib
+import threading
+import time
+import hashlib
+import tempfile
+from contextlib import aclosing, contextmanager
+from ml.porod.startup_report import lazy_import, record, report as startup_report, timed
+_import_started = time.perf_counter()
+
 import numpy as np
-import pandas as pd
-import pdfplumber
 from pathlib import Path
 
 from dotenv import load_dotenv
 
 import redis.asyncio as redis
 from fastapi_limiter import FastAPILimiter
-from fastapi_limiter.depends import RateLimiter
+
+from ml.porod.batching import MicroBatcher, QueueFullError
+from ml.porod.inference_pool import InferencePool, PoolSaturatedError
+from ml.fertilizer.predictor import NonFiniteValueError, UnknownCategoryError
+from ml.porod.prediction_cache import PredictionCache, normalise
+from ml.porod.memory_report import process_memory
 
 # ===================== ENV + LOGGING =====================
 load_dotenv()
@@ -59,6 +75,21 @@ async def security_headers(request: Request, call_next):
     response.headers["X-XSS-Protection"] = "1; mode=block"
     return response
 
+# ===================== VALIDATION ERRORS =====================
+def _json_safe(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    return value
+
+@app.exception_handler(RequestValidationError)
+async def validation_errors(request: Request, exc: RequestValidationError):
+    # The default 422 body echoes the rejected input, and NaN/Infinity would make it a 500
+    return JSONResponse(status_code=422, content={"detail": _json_safe(jsonable_encoder(exc.errors()))})
+
 # ===================== REDIS + RATE LIMITING =====================
 @app.on_event("startup")
 async def startup():
@@ -69,6 +100,8 @@ async def startup():
     try:
         redis_conn = redis.from_url(redis_url, encoding="utf-8", decode_responses=True)
         await FastAPILimiter.init(redis_conn)
+        # Shared with the prediction cache's Redis tier
+        app.state.redis = redis_conn
         logger.info("🚦 Redis connected — rate limiting enabled")
     except Exception as e:
         logger.warning(f"⚠️ Redis unavailable: {e}")
@@ -85,22 +118,182 @@ def soil_health_score(n, p, k):
     balance = max(0, 1 - (np.std([n, p, k]) / 50))
     return round(100 * (0.7 * avg + 0.3 * balance), 2)
 
+# ===================== INFERENCE POOL =====================
+# Blocking TensorFlow / scikit-learn calls run here, never on the event loop
+inference_pool = InferencePool(
+    kind=os.getenv("INFERENCE_POOL_KIND", "thread"),
+    workers=int(os.getenv("INFERENCE_POOL_WORKERS", "2")),
+    max_queue=int(os.getenv("INFERENCE_POOL_MAX_QUEUE", "64")),
+    timeout=float(os.getenv("INFERENCE_TIMEOUT_S", "10")),
+)
+
+@contextmanager
+def inference_errors():
+    """Maps pool/queue overload to 503, inference timeouts to 504 and invalid inputs to 422."""
+    try:
+        yield
+    except (UnknownCategoryError, NonFiniteValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except (PoolSaturatedError, QueueFullError):
+        raise HTTPException(status_code=503, detail="Model workers are busy, retry shortly")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Model inference timed out")
+
+# ===================== PREDICTION CACHE =====================
+# Identical (or, with PREDICTION_CACHE_ROUND set, near-identical) inputs reuse
+# an earlier prediction; identical in-flight requests share one computation
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", "600"))
+PREDICTION_CACHE_ROUND = int(os.environ["PREDICTION_CACHE_ROUND"]) if os.getenv("PREDICTION_CACHE_ROUND") else None
+PREDICTION_CACHE_REDIS = os.getenv("PREDICTION_CACHE_REDIS", "1") == "1"
+
+def _cache_redis():
+    return getattr(app.state, "redis", None) if PREDICTION_CACHE_REDIS else None
+
+crop_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_S, _cache_redis, name="crop_cache")
+fert_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_S, _cache_redis, name="fert_cache")
+
+# ===================== MODEL REGISTRY =====================
+from ml.registry import ModelRegistry
+
+# With MODEL_REGISTRY_DIR set (python -m ml.registry publish ...), models load
+# from the registry's current version instead of the fixed paths below. Every
+# MODEL_REGISTRY_POLL_S a watcher loads a newly activated (or rolled back)
+# version in the background, warms it and swaps it in; requests that already
+# hold the old model finish on it.
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR")
+MODEL_REGISTRY_POLL_S = float(os.getenv("MODEL_REGISTRY_POLL_S", "10"))
+model_registry = ModelRegistry(MODEL_REGISTRY_DIR) if MODEL_REGISTRY_DIR else None
+prediction_caches = {"crop": crop_cache, "fertilizer": fert_cache}
+app.state.model_versions = {}
+
+def resolve_artifact(name, path):
+    """``(path, version)``: ``path`` itself, or its file in the registry's current version of ``name``."""
+    if model_registry is None:
+        return Path(path), None
+    version, directory = model_registry.current(name)
+    if version is None:
+        return Path(path), None
+    model_registry.verify(name, version)
+    return directory / Path(path).name, version
+
+def _serving(name, version):
+    app.state.model_versions[name] = version
+    # Cached predictions are keyed by model version
+    prediction_caches[name].set_version(version)
+
+# ===================== BULK PREDICTION =====================
+# Rows are scored in chunks so each chunk is one vectorized model call. Chunks
+# run in the inference pool like single requests, so bulk traffic shares its
+# limits (503 when saturated, 504 on timeout) and shows up in /metrics.
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1024"))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+
+def _chunks(records):
+    for start in range(0, len(records), BULK_CHUNK_SIZE):
+        yield start, records[start:start + BULK_CHUNK_SIZE]
+
+async def bulk_response(records, score_chunk, stream, *args):
+    """Scores ``records`` chunk by chunk, as one JSON body or as NDJSON lines.
+
+    ``score_chunk(chunk, *args)`` runs in the inference pool, so in process
+    mode it must be a module-level function.
+    """
+    if len(records) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request")
+
+    async def scored(start, chunk):
+        with inference_errors():
+            results = await inference_pool.run(score_chunk, chunk, *args)
+        return [{"index": start + offset, **result} for offset, result in enumerate(results)]
+
+    chunks = _chunks(records)
+    if not stream:
+        rows = []
+        for start, chunk in chunks:
+            rows += await scored(start, chunk)
+        return {"results": rows}
+
+    # The first chunk is scored before the response starts, so overload still gets a 503
+    first = await scored(*next(chunks)) if records else []
+
+    async def lines():
+        for row in first:
+            yield json.dumps(row) + "\n"
+        for start, chunk in chunks:
+            try:
+                rows = await scored(start, chunk)
+            except HTTPException as e:
+                # Too late for a status code: the last line reports where scoring stopped
+                yield json.dumps({"index": start, "error": e.detail}) + "\n"
+                return
+            for row in rows:
+                yield json.dumps(row) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 # ===================== FERTILIZER =====================
-from ml.fertilizer.predictor import predict_fertilizer
-from ml.porod.fert import get_fertiliser_query
+from ml.fertilizer.predictor import FertilizerPredictor, encoders_from_classes
+from ml.porod.fert import get_fertiliser_query_async, stream_fertiliser_query
+
+# Pool workers may ask for a model at the same time; load it only once
+_model_load_lock = threading.Lock()
+
+# "sklearn" serves the pickled RandomForest; "compiled" serves the flat-array
+# forest written by python -m ml.fertilizer.forest_compiler (identical predictions);
+# "ensemble" serves the LSTM + GradientBoosting ensemble from python -m ml.fertilizer.main
+FERT_ENGINE = os.getenv("FERT_ENGINE", "sklearn")
+FERT_ARTIFACTS = {
+    "sklearn": ROOT_DIR / "ml" / "fertilizer" / "fertilizer_predictor.pkl",
+    "compiled": Path(os.getenv("FERT_COMPILED_PATH", str(ROOT_DIR / "ml" / "fertilizer" / "fertilizer_forest"))),
+    "ensemble": Path(os.getenv("FERT_ENSEMBLE_DIR", str(ROOT_DIR / "ml" / "fertilizer" / "ensemble"))),
+}
+
+FERT_ENCODERS_PATH = ROOT_DIR / "ml" / "fertilizer" / "label_encoders.pkl"
+
+def _read_fertilizer_model(model_path, encoder_path):
+    """``(model, encoders)`` of the FERT_ENGINE artifact at ``model_path``."""
+    if not model_path.exists():
+        raise FileNotFoundError(f"Fertilizer model not found at {model_path}")
+
+    with timed("load fertilizer model"):
+        if FERT_ENGINE == "ensemble":
+            # Imports TensorFlow for the LSTM half of the ensemble
+            ensemble = lazy_import("ml.fertilizer.ensemble")
+            model = ensemble.FertilizerEnsemble.load(model_path)
+            return model, model.encoders
+        if FERT_ENGINE == "compiled":
+            # Memory-mapped arrays; encoder classes travel in the forest's meta.json
+            from ml.fertilizer.forest_compiler import CompiledForest
+            model = CompiledForest.load(model_path)
+            if model.encoder_classes:
+                return model, encoders_from_classes(model.encoder_classes)
+            return model, lazy_import("joblib").load(str(encoder_path))
+        joblib = lazy_import("joblib")
+        return joblib.load(str(model_path)), joblib.load(str(encoder_path))
+
+def _fertilizer_bundle():
+    """Loads the served fertilizer artifacts; returns ``((model, encoders, predictor), version)``."""
+    model_path, version = resolve_artifact("fertilizer", FERT_ARTIFACTS[FERT_ENGINE])
+    encoder_path = model_path.parent / "label_encoders.pkl" if version else FERT_ENCODERS_PATH
+    model, encoders = _read_fertilizer_model(model_path, encoder_path)
+    # One object, so a hot swap replaces model, encoders and predictor together
+    return (model, encoders, FertilizerPredictor(model, encoders, district="Kolhapur")), version
 
 def load_fertilizer_model():
-    if not hasattr(app.state, "fert_model"):
-        logger.info("📦 Loading fertilizer model components...")
-        model_path = ROOT_DIR / "ml" / "fertilizer" / "fertilizer_predictor.pkl"
-        encoder_path = ROOT_DIR / "ml" / "fertilizer" / "label_encoders.pkl"
-        
-        if not model_path.exists():
-            raise FileNotFoundError(f"Fertilizer model not found at {model_path}")
-            
-        app.state.fert_model = joblib.load(str(model_path))
-        app.state.encoders = joblib.load(str(encoder_path))
-    return app.state.fert_model, app.state.encoders
+    if hasattr(app.state, "fert_bundle"):
+        return app.state.fert_bundle[:2]
+    with _model_load_lock:
+        if hasattr(app.state, "fert_bundle"):
+            return app.state.fert_bundle[:2]
+        logger.info(f"📦 Loading fertilizer model components ({FERT_ENGINE})...")
+        bundle, version = _fertilizer_bundle()
+        app.state.fert_bundle = bundle
+        _serving("fertilizer", version)
+    return bundle[:2]
+
+def load_fertilizer_predictor():
+    load_fertilizer_model()
+    return app.state.fert_bundle[2]
 
 class FertilizerInput(BaseModel):
     soil_color: str
@@ -112,32 +305,75 @@ class FertilizerInput(BaseModel):
     temperature: float
     crop: str
 
+def _fert_one(data):
+    return load_fertilizer_predictor().predict_one(
+        data.soil_color, data.nitrogen, data.phosphorus, data.potassium,
+        data.ph, data.rainfall, data.temperature, data.crop)
+
 @app.post("/api/fertiliser/manual")
 async def fertilizer_manual(data: FertilizerInput):
-    model, encoders = load_fertilizer_model()
-    fert = predict_fertilizer("Kolhapur", data.soil_color, data.nitrogen, data.phosphorus, 
-                              data.potassium, data.ph, data.rainfall, data.temperature, 
-                              data.crop, model, encoders)
+    fields = list(FertilizerInput.model_fields)
+    key = normalise([getattr(data, f) for f in fields], PREDICTION_CACHE_ROUND)
+    # Predict on the normalised values so every input sharing a key gets the same answer
+    data = FertilizerInput(**dict(zip(fields, key)))
+
+    async def compute():
+        return str(await inference_pool.run(_fert_one, data))
+
+    with inference_errors():
+        fert = await fert_cache.get_or_compute(key, compute)
     return {"recommended_fertilizer": fert, "npk": {"n": data.nitrogen, "p": data.phosphorus, "k": data.potassium}}
 
+def _fert_chunk(rows):
+    return load_fertilizer_predictor().predict_records([row.model_dump() for row in rows])
+
+@app.post("/api/fertiliser/batch")
+async def fertilizer_batch(data: List[FertilizerInput], stream: bool = False):
+    return await bulk_response(data, _fert_chunk, stream)
+
 # ===================== CROP =====================
-from ml.crop.main import CropRecommendationLSTM
-from ml.porod.CropRec import get_crop_recommendation_query
+from ml.porod.CropRec import get_crop_recommendation_query_async, stream_crop_recommendation
+
+# "keras" serves the .h5 model through TensorFlow; "numpy" serves the exported
+# weights (python -m ml.crop.export_numpy) without importing TensorFlow at all
+CROP_ENGINE = os.getenv("CROP_ENGINE", "keras")
+CROP_MODELS_DIR = ROOT_DIR / "ml" / "crop" / "saved_models"
+CROP_ARTIFACTS = {
+    "keras": CROP_MODELS_DIR / "crop_recommendation_model.h5",
+    # A directory export (python -m ml.crop.export_numpy --out DIR) is memory-mapped
+    "numpy": Path(os.getenv("CROP_NUMPY_PATH", str(CROP_MODELS_DIR / "crop_model_weights.npz"))),
+}
+
+def _read_crop_model():
+    """Loads the served crop model; returns ``(model, version)``."""
+    if CROP_ENGINE not in CROP_ARTIFACTS:
+        raise ValueError(f"Unknown CROP_ENGINE: {CROP_ENGINE}")
+    model_path, version = resolve_artifact("crop", CROP_ARTIFACTS[CROP_ENGINE])
+
+    # Verify existence before loading to give clean errors in logs
+    if not model_path.exists():
+        logger.error(f"❌ ERROR: Model file missing at {model_path}")
+        raise FileNotFoundError(f"Model file missing at {model_path}")
+
+    if CROP_ENGINE == "numpy":
+        engine = lazy_import("ml.crop.numpy_engine")
+        with timed("load crop model"):
+            return engine.NumpyCropModel.load(model_path), version
+    # Imports TensorFlow, so only pulled in when the keras engine is used
+    crop_main = lazy_import("ml.crop.main")
+    with timed("load crop model"):
+        # Serving only needs the saved artifacts, not the training CSV
+        return crop_main.CropRecommendationLSTM.from_artifacts(model_path.parent), version
 
 def load_crop_model():
-    if not hasattr(app.state, "crop_model"):
-        logger.info("🌱 Attempting to load Crop LSTM model...")
-        csv_path = ROOT_DIR / "ml" / "crop" / "crop_data.csv"
-        model_path = ROOT_DIR / "ml" / "crop" / "saved_models" / "crop_recommendation_model.h5"
-        
-        # Verify existence before loading to give clean errors in logs
-        if not model_path.exists():
-            logger.error(f"❌ ERROR: Model file missing at {model_path}")
-            raise FileNotFoundError(f"Model file missing at {model_path}")
-
-        model = CropRecommendationLSTM(str(csv_path))
-        model.load_model(str(model_path))
-        app.state.crop_model = model
+    if hasattr(app.state, "crop_model"):
+        return app.state.crop_model
+    with _model_load_lock:
+        if hasattr(app.state, "crop_model"):
+            return app.state.crop_model
+        logger.info(f"🌱 Attempting to load Crop LSTM model ({CROP_ENGINE} engine)...")
+        app.state.crop_model, version = _read_crop_model()
+        _serving("crop", version)
     return app.state.crop_model
 
 class CropInput(BaseModel):
@@ -149,24 +385,600 @@ class CropInput(BaseModel):
     ph: float
     rainfall: float
 
-@app.post("/api/croppred/manual")
-async def crop_manual(data: CropInput):
+# ===================== CROP MICRO-BATCHING =====================
+# Concurrent single-row requests are gathered and run as one forward pass
+CROP_BATCH_MAX_SIZE = int(os.getenv("CROP_BATCH_MAX_SIZE", "32"))
+CROP_BATCH_MAX_WAIT_MS = float(os.getenv("CROP_BATCH_MAX_WAIT_MS", "5"))
+CROP_BATCH_MAX_QUEUE = int(os.getenv("CROP_BATCH_MAX_QUEUE", "1024"))
+CROP_BATCH_MAX_CONCURRENT = int(os.getenv("CROP_BATCH_MAX_CONCURRENT", str(inference_pool.workers)))
+
+def _crop_batch(rows):
     model = load_crop_model()
-    arr = np.array([[data.nitrogen, data.phosphorus, data.potassium, 
-                     data.temperature, data.humidity, data.ph, data.rainfall]])
-    crop = model.predict_crop(arr)
-    return {
+    return model.predict_crops(np.array(rows, dtype=float))
+
+crop_batcher = MicroBatcher(
+    lambda rows: inference_pool.run(_crop_batch, rows),
+    max_batch_size=CROP_BATCH_MAX_SIZE,
+    max_wait_ms=CROP_BATCH_MAX_WAIT_MS,
+    max_queue=CROP_BATCH_MAX_QUEUE,
+    max_concurrent_batches=CROP_BATCH_MAX_CONCURRENT,
+    name="crop_batcher",
+)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await crop_batcher.stop()
+    inference_pool.shutdown()
+
+# ===================== SIMILAR FIELDS =====================
+# KD-tree over the scaled crop samples, built by python -m ml.crop.neighbors
+CROP_NEIGHBORS_PATH = Path(os.getenv("CROP_NEIGHBORS_PATH", str(CROP_MODELS_DIR / "similar_fields.joblib")))
+SIMILAR_FIELDS_MAX_K = int(os.getenv("SIMILAR_FIELDS_MAX_K", "50"))
+
+def load_similar_fields():
+    if hasattr(app.state, "similar_fields"):
+        return app.state.similar_fields
+    with _model_load_lock:
+        if not hasattr(app.state, "similar_fields"):
+            # Imports scikit-learn for the KD-tree; its arrays are memory-mapped
+            neighbors = lazy_import("ml.crop.neighbors")
+            with timed("load similar-fields index"):
+                app.state.similar_fields = neighbors.SimilarFieldsIndex.load(CROP_NEIGHBORS_PATH)
+    return app.state.similar_fields
+
+def _crop_row(r):
+    return [r.nitrogen, r.phosphorus, r.potassium, r.temperature, r.humidity, r.ph, r.rainfall]
+
+def _check_k(k):
+    if not 1 <= k <= SIMILAR_FIELDS_MAX_K:
+        raise HTTPException(status_code=422, detail=f"k must be between 1 and {SIMILAR_FIELDS_MAX_K}")
+    return k
+
+def _similar_one(row, k):
+    if not all(map(np.isfinite, row)):
+        raise NonFiniteValueError("non-finite numeric value")
+    return load_similar_fields().similar([row], k)[0]
+
+@app.post("/api/croppred/similar")
+async def crop_similar(data: CropInput, k: int = 5):
+    """The k known samples closest to ``data``, nearest first."""
+    k = _check_k(k)
+    with inference_errors():
+        return {"similarFields": await inference_pool.run(_similar_one, _crop_row(data), k)}
+
+def _similar_chunk(chunk, k):
+    rows = np.array([_crop_row(r) for r in chunk], dtype=float)
+    valid = np.isfinite(rows).all(axis=1)
+    results = [{"error": "non-finite numeric value"} for _ in chunk]
+    if valid.any():
+        # One tree query per chunk
+        for i, s in zip(np.flatnonzero(valid), load_similar_fields().similar(rows[valid], k)):
+            results[i] = {"similarFields": s}
+    return results
+
+@app.post("/api/croppred/similar/batch")
+async def crop_similar_batch(data: List[CropInput], k: int = 5, stream: bool = False):
+    return await bulk_response(data, _similar_chunk, stream, _check_k(k))
+
+@app.post("/api/croppred/manual")
+async def crop_manual(data: CropInput, similar: int = 0):
+    """Crop prediction; ``similar=k`` adds the k nearest known samples as supporting evidence."""
+    if similar:
+        _check_k(similar)
+    # Caught before the cache and the batcher, which would otherwise score NaN/inf into some crop
+    if not all(map(math.isfinite, _crop_row(data))):
+        raise HTTPException(status_code=422, detail="non-finite numeric value")
+    key = normalise([data.nitrogen, data.phosphorus, data.potassium,
+                     data.temperature, data.humidity, data.ph, data.rainfall], PREDICTION_CACHE_ROUND)
+
+    async def compute():
+        return str(await crop_batcher.submit(list(key)))
+
+    with inference_errors():
+        if similar:
+            crop, neighbours = await asyncio.gather(
+                crop_cache.get_or_compute(key, compute),
+                inference_pool.run(_similar_one, _crop_row(data), similar),
+            )
+        else:
+            crop = await crop_cache.get_or_compute(key, compute)
+    result = {
         "recommended_crop": crop,
         "soilHealth": soil_health_score(data.nitrogen, data.phosphorus, data.potassium),
         "moisture": data.humidity, "ph": data.ph, "temperature": data.temperature,
     }
+    if similar:
+        result["similarFields"] = neighbours
+    return result
+
+def predict_crop_rows(model, rows):
+    """Scores ``CropInput`` rows in one forward pass; non-finite rows get an error."""
+    arr = np.array([[r.nitrogen, r.phosphorus, r.potassium,
+                     r.temperature, r.humidity, r.ph, r.rainfall] for r in rows], dtype=float)
+    valid = np.isfinite(arr).all(axis=1)
+    results = [{"error": "non-finite numeric value"} for _ in rows]
+    if valid.any():
+        crops = model.predict_crops(arr[valid])
+        for i, crop in zip(np.flatnonzero(valid), crops):
+            r = rows[i]
+            results[i] = {
+                "recommended_crop": crop,
+                "soilHealth": soil_health_score(r.nitrogen, r.phosphorus, r.potassium),
+            }
+    return results
+
+def _crop_chunk(rows):
+    return predict_crop_rows(load_crop_model(), rows)
+
+@app.post("/api/croppred/batch")
+async def crop_batch(data: List[CropInput], stream: bool = False):
+    return await bulk_response(data, _crop_chunk, stream)
+
+# ===================== GEMINI ADVISORIES =====================
+from ml.porod.llm import fan_out
+from ml.porod.nutrient_stats import get_index as get_nutrient_index
+
+# Overall budget for /api/advisory/field; each Gemini call is also capped by LLM_TIMEOUT_S
+ADVISORY_DEADLINE_S = float(os.getenv("ADVISORY_DEADLINE_S", "25"))
+
+class CropRecoRequest(BaseModel):
+    crop: str
+    moisture: float
+    ph: float
+    temperature: float
+    # Optional soil readings; only used for the nutrient imbalance chart
+    nitrogen: Optional[float] = None
+    phosphorus: Optional[float] = None
+    potassium: Optional[float] = None
+
+class FertRecoRequest(BaseModel):
+    fertilizer: str
+    nitrogen: float
+    phosphorus: float
+    potassium: float
+
+class FieldAdvisoryRequest(BaseModel):
+    crop: CropRecoRequest
+    fertilizer: FertRecoRequest
 
-# (Other endpoints remain the same, just ensured they use the loaders above)
 @app.post("/api/croppred/recommendation")
-async def crop_recommendation(data: BaseModel): # Simplified for brevity, use your CropRecoRequest
-    # Logic remains same
-    pass
+async def crop_recommendation(data: CropRecoRequest):
+    return await get_crop_recommendation_query_async(data.crop, data.moisture, data.ph, data.temperature,
+                                                     data.nitrogen, data.phosphorus, data.potassium)
+
+@app.post("/api/fertiliser/recommendation")
+async def fertiliser_recommendation(data: FertRecoRequest):
+    return await get_fertiliser_query_async(data.fertilizer, data.nitrogen, data.phosphorus, data.potassium)
+
+class EventStreamResponse(StreamingResponse):
+    # Starlette abandons the body iterator when the client disconnects; closing it
+    # here frees the Gemini concurrency slot at once instead of at garbage collection
+    async def stream_response(self, send):
+        try:
+            await super().stream_response(send)
+        finally:
+            await self.body_iterator.aclose()
+
+def sse_response(events):
+    """Server-sent events: one ``section`` event per parsed section, then ``done`` (or ``error``)."""
+    async def body():
+        async with aclosing(events):
+            async for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    # X-Accel-Buffering stops nginx from holding the stream back
+    return EventStreamResponse(body(), media_type="text/event-stream",
+                               headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/api/croppred/recommendation/stream")
+async def crop_recommendation_stream(data: CropRecoRequest):
+    return sse_response(stream_crop_recommendation(data.crop, data.moisture, data.ph, data.temperature,
+                                                   data.nitrogen, data.phosphorus, data.potassium))
+
+@app.post("/api/fertiliser/recommendation/stream")
+async def fertiliser_recommendation_stream(data: FertRecoRequest):
+    return sse_response(stream_fertiliser_query(data.fertilizer, data.nitrogen, data.phosphorus, data.potassium))
+
+@app.post("/api/advisory/field")
+async def field_advisory(data: FieldAdvisoryRequest):
+    """Crop and fertilizer advisories for one field, fetched concurrently under one deadline."""
+    c, f = data.crop, data.fertilizer
+    return await fan_out({
+        "crop": get_crop_recommendation_query_async(c.crop, c.moisture, c.ph, c.temperature,
+                                                    c.nitrogen, c.phosphorus, c.potassium),
+        "fertilizer": get_fertiliser_query_async(f.fertilizer, f.nitrogen, f.phosphorus, f.potassium),
+    }, ADVISORY_DEADLINE_S)
+
+# ===================== SOIL REPORTS =====================
+from ml.porod.soil_report import extract_samples
+
+# PDF parsing is CPU-bound and pure Python, so it runs in its own process pool
+# and never competes with the event loop or the model pool for the GIL
+SOIL_REPORT_MAX_MB = float(os.getenv("SOIL_REPORT_MAX_MB", "20"))
+SOIL_REPORT_MAX_PAGES = int(os.getenv("SOIL_REPORT_MAX_PAGES", "500"))
+soil_report_pool = InferencePool(
+    kind=os.getenv("SOIL_REPORT_POOL_KIND", "process"),
+    workers=int(os.getenv("SOIL_REPORT_POOL_WORKERS", "2")),
+    max_queue=int(os.getenv("SOIL_REPORT_POOL_MAX_QUEUE", "8")),
+    timeout=float(os.getenv("SOIL_REPORT_TIMEOUT_S", "60")),
+    name="soil_report_pool",
+)
+
+CROP_FIELDS = list(CropInput.model_fields)
+FERT_FIELDS = list(FertilizerInput.model_fields)
+
+@app.on_event("shutdown")
+async def shutdown_soil_report_pool():
+    soil_report_pool.shutdown()
+
+async def _spool_upload(file, max_bytes):
+    """Copies an upload to a temp file in 1 MB chunks; the pool worker reads it from disk."""
+    spool = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    size = 0
+    try:
+        with spool:
+            while chunk := await file.read(1 << 20):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Soil reports are limited to {SOIL_REPORT_MAX_MB:g} MB")
+                spool.write(chunk)
+    except BaseException:
+        os.unlink(spool.name)
+        raise
+    return spool.name
+
+def _missing(row, fields):
+    return [f for f in fields if row.get(f) is None]
+
+def score_soil_samples(samples, defaults):
+    """Crop and fertilizer predictions for every sample that has the inputs they need.
+
+    Readings from the report win over ``defaults`` (the form fields). Each
+    model is called once for all complete samples.
+    """
+    rows = [{**defaults, **sample} for sample in samples]
+    results = [{
+        "sample_id": sample["sample_id"],
+        "page": sample["page"],
+        "readings": {k: v for k, v in sample.items() if k not in ("sample_id", "page")},
+    } for sample in samples]
+
+    for result, row in zip(results, rows):
+        if not _missing(row, ["nitrogen", "phosphorus", "potassium"]):
+            result["soilHealth"] = soil_health_score(row["nitrogen"], row["phosphorus"], row["potassium"])
+
+    crop_ready = [i for i, row in enumerate(rows) if not _missing(row, CROP_FIELDS)]
+    if crop_ready:
+        crop_rows = [CropInput(**{f: rows[i][f] for f in CROP_FIELDS}) for i in crop_ready]
+        for i, scored in zip(crop_ready, predict_crop_rows(load_crop_model(), crop_rows)):
+            scored.pop("soilHealth", None)  # already on the sample
+            results[i]["crop"] = scored
+    fert_ready = [i for i, row in enumerate(rows) if not _missing(row, FERT_FIELDS)]
+    if fert_ready:
+        records = [{f: rows[i][f] for f in FERT_FIELDS} for i in fert_ready]
+        for i, scored in zip(fert_ready, load_fertilizer_predictor().predict_records(records)):
+            results[i]["fertilizer"] = scored
+
+    for result, row in zip(results, rows):
+        result.setdefault("crop", {"missing": _missing(row, CROP_FIELDS)})
+        result.setdefault("fertilizer", {"missing": _missing(row, FERT_FIELDS)})
+    return results
+
+@app.post("/api/soil-report")
+async def soil_report_upload(
+    file: UploadFile = File(...),
+    temperature: Optional[float] = Form(None),
+    humidity: Optional[float] = Form(None),
+    rainfall: Optional[float] = Form(None),
+    soil_color: Optional[str] = Form(None),
+    crop: Optional[str] = Form(None),
+):
+    """Extracts every soil sample of a lab-report PDF and predicts crop and fertilizer for each.
+
+    Reports rarely carry weather data, so temperature, humidity, rainfall, soil
+    colour and crop can be sent as form fields and apply to every sample.
+    """
+    path = await _spool_upload(file, int(SOIL_REPORT_MAX_MB * 1024 * 1024))
+    try:
+        with inference_errors():
+            samples = await soil_report_pool.run(extract_samples, path, SOIL_REPORT_MAX_PAGES)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Could not read the PDF: {e}")
+    finally:
+        os.unlink(path)
+
+    defaults = {"temperature": temperature, "humidity": humidity, "rainfall": rainfall,
+                "soil_color": soil_color, "crop": crop}
+    defaults = {k: v for k, v in defaults.items() if v is not None}
+    with inference_errors():
+        results = await inference_pool.run(score_soil_samples, samples, defaults)
+    return {"filename": file.filename, "count": len(results), "samples": results}
+
+# ===================== LITERATURE SEARCH =====================
+from ml.porod.litsearch import LiteratureIndex
+
+# BM25 index over litsurvey/, built by python -m ml.porod.litsearch
+LITSEARCH_INDEX_DIR = Path(os.getenv("LITSEARCH_INDEX_DIR", str(ROOT_DIR / "litsurvey" / ".index")))
+LITSEARCH_MAX_K = int(os.getenv("LITSEARCH_MAX_K", "50"))
+
+def load_literature_index():
+    if hasattr(app.state, "lit_index"):
+        return app.state.lit_index
+    with _model_load_lock:
+        if not hasattr(app.state, "lit_index"):
+            with timed("load literature index"):
+                app.state.lit_index = LiteratureIndex.load(LITSEARCH_INDEX_DIR)
+    return app.state.lit_index
+
+@app.get("/api/litsurvey/search")
+async def literature_search(q: str, k: int = 10):
+    """Ranked passages of the research PDFs, with file and page number."""
+    if not q.strip():
+        raise HTTPException(status_code=422, detail="Empty query")
+    if not 1 <= k <= LITSEARCH_MAX_K:
+        raise HTTPException(status_code=422, detail=f"k must be between 1 and {LITSEARCH_MAX_K}")
+    try:
+        index = load_literature_index()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    start = time.perf_counter()
+    results = index.search(q, k)
+    return {"query": q, "took_ms": round(1000 * (time.perf_counter() - start), 3), "results": results}
+
+# ===================== FEEDBACK =====================
+from ml.feedback import FeedbackLog
+
+# Confirmed field outcomes, appended to ml/.feedback/*.jsonl. Every
+# FEEDBACK_UPDATE_INTERVAL_S (0 = never; run python -m ml.feedback from cron
+# instead) a worker launches the incremental update in a subprocess; a file
+# lock lets only one worker of the host run it at a time.
+FEEDBACK_DIR = Path(os.getenv("FEEDBACK_DIR", str(ROOT_DIR / "ml" / ".feedback")))
+FEEDBACK_UPDATE_INTERVAL_S = float(os.getenv("FEEDBACK_UPDATE_INTERVAL_S", "0"))
+FEEDBACK_MIN_RECORDS = int(os.getenv("FEEDBACK_MIN_RECORDS", "50"))
+feedback_logs = {model: FeedbackLog(FEEDBACK_DIR, model) for model in ("crop", "fertilizer")}
+
+# Feedback is trained on later, so NaN/Infinity are rejected here rather than per update
+class CropFeedback(CropInput):
+    model_config = ConfigDict(allow_inf_nan=False)
+    crop: str  # the crop actually planted
+
+class FertilizerFeedback(FertilizerInput):
+    model_config = ConfigDict(allow_inf_nan=False)
+    fertilizer: str  # the fertilizer actually applied
+    worked: bool = True
+
+@app.post("/api/feedback/crop")
+async def crop_feedback(data: List[CropFeedback]):
+    await asyncio.to_thread(feedback_logs["crop"].append, [row.model_dump() for row in data])
+    return {"recorded": len(data)}
+
+@app.post("/api/feedback/fertiliser")
+async def fertilizer_feedback(data: List[FertilizerFeedback]):
+    await asyncio.to_thread(feedback_logs["fertilizer"].append, [row.model_dump() for row in data])
+    return {"recorded": len(data)}
+
+async def _feedback_updates():
+    command = [sys.executable, "-m", "ml.feedback", "--feedback-dir", str(FEEDBACK_DIR),
+               "--min-records", str(FEEDBACK_MIN_RECORDS)]
+    if MODEL_REGISTRY_DIR:
+        # Publishes a new version, which the registry watchers then swap in
+        command += ["--registry", MODEL_REGISTRY_DIR]
+    while True:
+        await asyncio.sleep(FEEDBACK_UPDATE_INTERVAL_S)
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *command, cwd=str(ROOT_DIR), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+            output, _ = await proc.communicate()
+        except Exception as e:
+            logger.error(f"❌ Feedback update could not start: {e}")
+            continue
+        lines = output.decode(errors="replace").strip().splitlines()
+        if proc.returncode != 0:
+            logger.error(f"❌ Feedback update failed: {lines[-1] if lines else proc.returncode}")
+        else:
+            for line in lines:
+                if line.startswith("{"):
+                    logger.info(f"🔁 Feedback update: {line}")
+
+@app.on_event("startup")
+async def start_feedback_updates():
+    if FEEDBACK_UPDATE_INTERVAL_S > 0:
+        app.state.feedback_task = asyncio.create_task(_feedback_updates())
+
+@app.on_event("shutdown")
+async def stop_feedback_updates():
+    task = getattr(app.state, "feedback_task", None)
+    if task is not None:
+        task.cancel()
+
+# ===================== WARM-UP + READINESS =====================
+# Models listed here are loaded and traced before the worker reports ready.
+# A fertilizer-only worker can set WARMUP_MODELS=fertilizer.
+WARMUP_MODELS = [m.strip() for m in os.getenv("WARMUP_MODELS", "crop,fertilizer").split(",") if m.strip()]
+
+MODEL_ARTIFACTS = {
+    "crop": CROP_ARTIFACTS.get(CROP_ENGINE),
+    "fertilizer": FERT_ARTIFACTS.get(FERT_ENGINE),
+}
+
+def artifact_version(path):
+    """Short content hash of a model artifact (file or .npy directory), used as its version."""
+    path = Path(path)
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(file.name.encode())
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+def _trace_crop(model):
+    # Trace both the single-row and the full micro-batch shapes
+    for size in sorted({1, CROP_BATCH_MAX_SIZE}):
+        model.predict_crops(np.tile([[50, 50, 50, 25, 60, 6.5, 100]], (size, 1)))
+
+def _trace_fertilizer(encoders, predictor):
+    predictor.predict_records([{
+        "soil_color": encoders["Soil_color"].classes_[0], "crop": encoders["Crop"].classes_[0],
+        "nitrogen": 50, "phosphorus": 50, "potassium": 50, "ph": 6.5, "rainfall": 100, "temperature": 25,
+    }])
+
+def _warm_up(name):
+    """Loads one model and runs a dummy forward pass so graphs are built before traffic."""
+    started = time.perf_counter()
+    if name == "crop":
+        _trace_crop(load_crop_model())
+    elif name == "fertilizer":
+        _, encoders = load_fertilizer_model()
+        _trace_fertilizer(encoders, load_fertilizer_predictor())
+    else:
+        raise ValueError(f"Unknown model: {name}")
+    return {
+        "load_seconds": round(time.perf_counter() - started, 3),
+        "version": app.state.model_versions.get(name) or artifact_version(MODEL_ARTIFACTS[name]),
+    }
+
+def reload_model(name):
+    """Swaps in the registry's current version of ``name`` if it is not the one being served.
+
+    The new version is loaded and traced first, off the event loop; the swap
+    itself is one attribute assignment. Models not loaded yet are skipped,
+    since their first load reads the current version anyway.
+    """
+    if model_registry is None or name not in app.state.model_versions:
+        return None
+    current, _ = model_registry.current(name)
+    if current is None or current == app.state.model_versions[name]:
+        return None
+    started = time.perf_counter()
+    if name == "crop":
+        model, version = _read_crop_model()
+        _trace_crop(model)
+        with _model_load_lock:
+            app.state.crop_model = model
+            _serving(name, version)
+    elif name == "fertilizer":
+        bundle, version = _fertilizer_bundle()
+        _trace_fertilizer(bundle[1], bundle[2])
+        with _model_load_lock:
+            app.state.fert_bundle = bundle
+            _serving(name, version)
+    else:
+        raise ValueError(f"Unknown model: {name}")
+    return {"load_seconds": round(time.perf_counter() - started, 3), "version": version}
+
+async def watch_registry():
+    failed = {}
+    while True:
+        await asyncio.sleep(MODEL_REGISTRY_POLL_S)
+        for name in WARMUP_MODELS:
+            current, _ = model_registry.current(name)
+            if failed.get(name) == current:
+                continue  # retried once it changes again
+            try:
+                info = await asyncio.to_thread(reload_model, name)
+            except Exception as e:
+                failed[name] = current
+                logger.error(f"❌ Loading {name} {current} failed, still serving "
+                             f"{app.state.model_versions.get(name)}: {e}")
+                continue
+            if info:
+                logger.info(f"🔄 {name} model swapped to {info['version']} in {info['load_seconds']}s")
+                app.state.model_status[name] = {"state": "ready", **info}
+
+@app.on_event("startup")
+async def start_registry_watch():
+    if model_registry is None:
+        return
+    if inference_pool.kind == "process":
+        logger.warning("⚠️ Process-pool workers keep the model version they loaded until restarted")
+    app.state.registry_task = asyncio.create_task(watch_registry())
+
+@app.on_event("shutdown")
+async def stop_registry_watch():
+    task = getattr(app.state, "registry_task", None)
+    if task is not None:
+        task.cancel()
+
+@app.get("/models")
+async def model_versions():
+    """Served version of each model and, with a registry, its current version and history."""
+    models = {}
+    for name in WARMUP_MODELS:
+        models[name] = {"serving": app.state.model_versions.get(name)}
+        if model_registry is not None:
+            manifest = model_registry.manifest(name)
+            models[name].update(current=manifest["current"], history=manifest["history"],
+                                versions=sorted(manifest["versions"], key=lambda v: int(v[1:])))
+    return {"registry": MODEL_REGISTRY_DIR, "models": models}
+
+def _warm_worker_process():
+    # Process-pool initializer: every worker warms its own copy of the models
+    for name in WARMUP_MODELS:
+        try:
+            _warm_up(name)
+        except Exception as e:
+            logger.error(f"❌ Warm-up of {name} failed in worker: {e}")
+
+inference_pool.initializer = _warm_worker_process
+app.state.model_status = {name: {"state": "pending"} for name in WARMUP_MODELS}
+
+async def warm_up_models():
+    for name in WARMUP_MODELS:
+        app.state.model_status[name] = {"state": "loading"}
+        try:
+            info = await inference_pool.run(_warm_up, name, timeout=None)
+        except Exception as e:
+            logger.error(f"❌ Warm-up of {name} model failed: {e}")
+            app.state.model_status[name] = {"state": "failed", "error": str(e)}
+        else:
+            logger.info(f"🔥 {name} model warm in {info['load_seconds']}s (version {info['version']})")
+            app.state.model_status[name] = {"state": "ready", **info}
+    # Percentile profiles behind the advisory charts
+    await asyncio.to_thread(get_nutrient_index)
+    logger.info(f"⏱️ Startup report (ms): {startup_report()}")
+
+def preload_models():
+    """Loads fork-safe models in the gunicorn master (see gunicorn.conf.py).
+
+    Workers forked afterwards share the loaded pages; TensorFlow is never
+    loaded before a fork, so the keras crop engine and the fertilizer
+    ensemble still load per worker.
+    """
+    if "fertilizer" in WARMUP_MODELS and FERT_ENGINE != "ensemble":
+        load_fertilizer_predictor()
+    if "crop" in WARMUP_MODELS and CROP_ENGINE == "numpy":
+        load_crop_model()
+    get_nutrient_index()
+    logger.info("📦 Models preloaded in the master process")
+
+@app.on_event("startup")
+async def start_warm_up():
+    # Runs in the background so /health answers while models load; /ready waits for it
+    app.state.warmup_task = asyncio.create_task(warm_up_models())
+
+@app.get("/ready")
+async def ready_check():
+    status = app.state.model_status
+    ready = all(s["state"] == "ready" for s in status.values())
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "models": status})
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "root_dir": str(ROOT_DIR)}
\ No newline at end of file
+    return {"status": "healthy", "root_dir": str(ROOT_DIR)}
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "crop_batcher": crop_batcher.stats(),
+        "inference_pool": inference_pool.stats(),
+        "soil_report_pool": soil_report_pool.stats(),
+        "crop_cache": crop_cache.stats(),
+        "fert_cache": fert_cache.stats(),
+        "startup_ms": startup_report(),
+        "memory": process_memory(),
+    }
+
+record("import ml.porod.mlapi", time.perf_counter() - _import_started)
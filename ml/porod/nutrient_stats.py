@@ -0,0 +1,151 @@
+import csv
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# Chart data for the crop and fertilizer advisories (nutrient distribution,
+# nutrient imbalance, seasonal requirements), computed from percentile
+# profiles of the training CSVs instead of being written by Gemini.
+# The index is built once per process from ~6.7k rows and every lookup is a
+# few dictionary reads and NumPy interpolations (tens of microseconds).
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+CROP_DATA = ROOT_DIR / "crop" / "crop_data.csv"
+FERT_DATA = ROOT_DIR / "fertilizer" / "data.csv"
+
+# Percentile grid stored for every column of every profile
+PERCENTILES = np.arange(0, 101, 5)
+_POSITION = {int(q): i for i, q in enumerate(PERCENTILES)}
+# Values between these percentiles of a profile count as its optimum range
+OPTIMUM = (25, 75)
+
+# CSV header -> canonical column, per source file
+CROP_COLUMNS = {"N": "nitrogen", "P": "phosphorus", "K": "potassium", "ph": "ph",
+                "rainfall": "rainfall", "temperature": "temperature", "humidity": "humidity"}
+FERT_COLUMNS = {"Nitrogen": "nitrogen", "Phosphorus": "phosphorus", "Potassium": "potassium", "pH": "ph",
+                "Rainfall": "rainfall", "Temperature": "temperature"}
+
+NUTRIENT_LABELS = {"nitrogen": "Nitrogen", "phosphorus": "Phosphorus", "potassium": "Potassium",
+                   "ph": "pH", "temperature": "Temperature", "humidity": "Moisture"}
+
+# Typical air temperature band of each season (°C); together they cover the whole axis
+SEASONS = [("Spring", 25, 30), ("Summer", 30, np.inf), ("Autumn", 20, 25), ("Winter", -np.inf, 20)]
+
+ALL = "*"
+
+
+def _read_columns(path, columns, group_by):
+    """``{group: {column: [values]}}`` for one CSV, plus every row under ``ALL``."""
+    groups = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            for group in (row[group_by].strip().lower(), ALL):
+                values = groups.setdefault(group, {c: [] for c in columns.values()})
+                for header, column in columns.items():
+                    values[column].append(float(row[header]))
+    return groups
+
+
+def _profiles(groups):
+    return {
+        group: {column: np.percentile(values, PERCENTILES) for column, values in columns.items()}
+        for group, columns in groups.items()
+    }
+
+
+def build_index(crop_csv=CROP_DATA, fert_csv=FERT_DATA):
+    """Percentile profiles ``{"crop": {...}, "fertilizer": {...}}`` keyed by lower-case name.
+
+    Crops come from crop_data.csv; crops only found in the fertilizer dataset
+    (sugarcane, wheat, ...) use its rows instead. The two files measure rainfall
+    on different scales, so profiles are never mixed across sources.
+    """
+    crop_groups = _read_columns(crop_csv, CROP_COLUMNS, "label")
+    fert_by_crop = _read_columns(fert_csv, FERT_COLUMNS, "Crop")
+    fert_by_fertilizer = _read_columns(fert_csv, FERT_COLUMNS, "Fertilizer")
+
+    crops = _profiles(crop_groups)
+    for name, profile in _profiles(fert_by_crop).items():
+        crops.setdefault(name, profile)
+    return {"crop": crops, "fertilizer": _profiles(fert_by_fertilizer)}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index()
+    return _index
+
+
+def profile(kind, name):
+    """Profile of a crop or fertilizer; unknown names fall back to the whole dataset."""
+    profiles = get_index()[kind]
+    return profiles.get(str(name).strip().lower(), profiles[ALL])
+
+
+# ===================== CHART DATA =====================
+def _at(percentiles, q):
+    return float(percentiles[_POSITION[q]])
+
+
+def nutrient_distribution(prof):
+    """Median N/P/K of the profile as shares of 100."""
+    medians = {c: _at(prof[c], 50) for c in ("nitrogen", "phosphorus", "potassium")}
+    total = sum(medians.values()) or 1.0
+    return [{"name": NUTRIENT_LABELS[c], "value": int(round(100 * m / total))} for c, m in medians.items()]
+
+
+def nutrient_imbalance(prof, measurements):
+    """How far each measurement lies outside the profile's optimum range, in % of the nearest bound.
+
+    ``measurements`` maps canonical columns to values; ``None`` values and
+    columns the profile lacks are skipped. Inside the range the imbalance is 0.
+    """
+    result = []
+    for column, value in measurements.items():
+        if value is None or column not in prof:
+            continue
+        low, high = _at(prof[column], OPTIMUM[0]), _at(prof[column], OPTIMUM[1])
+        if value < low:
+            gap = (low - value) / low if low else 0.0
+        elif value > high:
+            gap = (value - high) / high if high else 0.0
+        else:
+            gap = 0.0
+        result.append({"nutrient": NUTRIENT_LABELS[column], "value": int(round(min(gap, 1.0) * 100))})
+    return result
+
+
+def seasonal_requirements(prof):
+    """Share of the profile's temperature distribution falling in each season's band."""
+    temps = prof["temperature"]
+    cdf = lambda t: float(np.interp(t, temps, PERCENTILES, left=0.0, right=100.0))
+    return [{"season": season, "requirement": int(round(cdf(hi) - cdf(lo)))} for season, lo, hi in SEASONS]
+
+
+def charts(kind, name, measurements):
+    prof = profile(kind, name)
+    return {
+        "seasonalRequirements": seasonal_requirements(prof),
+        "nutrientDistribution": nutrient_distribution(prof),
+        "nutrientImbalance": nutrient_imbalance(prof, measurements),
+    }
+
+
+def crop_charts(crop_name, moisture, ph, temperature, nitrogen=None, phosphorus=None, potassium=None):
+    return charts("crop", crop_name, {
+        "nitrogen": nitrogen, "phosphorus": phosphorus, "potassium": potassium,
+        "ph": ph, "temperature": temperature, "humidity": moisture,
+    })
+
+
+def fertiliser_charts(fertilizer_name, nitrogen, phosphorus, potassium):
+    return charts("fertilizer", fertilizer_name,
+                  {"nitrogen": nitrogen, "phosphorus": phosphorus, "potassium": potassium})
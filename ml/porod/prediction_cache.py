@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("uvicorn")
+
+
+def normalise(values, digits=None):
+    """Cache-key form of an input row: floats optionally rounded, strings kept verbatim.
+
+    Strings are not case-folded because the label encoders are case-sensitive
+    (e.g. "Red" and "Red " are distinct soil colours).
+    """
+    out = []
+    for v in values:
+        if isinstance(v, str):
+            out.append(v)
+        else:
+            v = float(v)
+            out.append(round(v, digits) if digits is not None else v)
+    return tuple(out)
+
+
+class PredictionCache:
+    """Bounded LRU + TTL cache in front of a predictor, with request coalescing.
+
+    Concurrent lookups of the same key share one computation. When
+    ``redis_getter`` returns a connection, a shared Redis tier is checked
+    after the local LRU and filled after every computation. Cached values
+    must be JSON-serialisable. ``version`` (the model version) is part of
+    every key, so a model swap never serves the old model's answers.
+    """
+
+    def __init__(self, maxsize=4096, ttl=600.0, redis_getter=None, name="cache"):
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = float(ttl)
+        self.redis_getter = redis_getter
+        self.name = name
+        self.version = None
+
+        self._entries = OrderedDict()
+        self._in_flight = {}
+
+        # ---------- METRICS ----------
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.redis_hits = 0
+        self.redis_errors = 0
+
+    # ---------- LOCAL LRU ----------
+    def _get_local(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _set_local(self, key, value):
+        if self.maxsize == 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def set_version(self, version):
+        if version != self.version:
+            self.version = version
+            # Old-version entries could never be hit again
+            self.clear()
+
+    # ---------- REDIS TIER ----------
+    def _redis(self):
+        return self.redis_getter() if self.redis_getter else None
+
+    def _redis_key(self, key):
+        return f"{self.name}:{json.dumps(key)}"
+
+    async def _get_shared(self, key):
+        conn = self._redis()
+        if conn is None:
+            return False, None
+        try:
+            raw = await conn.get(self._redis_key(key))
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"⚠️ {self.name}: Redis read failed: {e}")
+            return False, None
+        if raw is None:
+            return False, None
+        self.redis_hits += 1
+        return True, json.loads(raw)
+
+    async def _set_shared(self, key, value):
+        conn = self._redis()
+        if conn is None:
+            return
+        try:
+            await conn.set(self._redis_key(key), json.dumps(value), ex=max(1, int(self.ttl)))
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"⚠️ {self.name}: Redis write failed: {e}")
+
+    # ---------- LOOKUP ----------
+    async def _fill(self, key, compute):
+        try:
+            found, value = await self._get_shared(key)
+            if not found:
+                value = await compute()
+                await self._set_shared(key, value)
+            self._set_local(key, value)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def get_or_compute(self, key, compute):
+        """Returns the cached value for ``key`` or awaits ``compute()`` to produce it."""
+        key = (self.version, key)
+        found, value = self._get_local(key)
+        if found:
+            self.hits += 1
+            return value
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # A separate task, so one caller disconnecting doesn't cancel the others
+            task = asyncio.ensure_future(self._fill(key, compute))
+            self._in_flight[key] = task
+        return await asyncio.shield(task)
+
+    # ---------- STATS ----------
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "version": self.version,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "miss_ratio": round(self.misses / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "redis_enabled": self._redis() is not None,
+            "redis_hits": self.redis_hits,
+            "redis_errors": self.redis_errors,
+            "in_flight": len(self._in_flight),
+        }
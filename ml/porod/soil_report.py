@@ -0,0 +1,170 @@
+import re
+
+# Soil-test reports (soil health cards, lab reports) as PDFs -> one dict of
+# readings per soil sample. Runs inside a process pool: pdfplumber is only
+# imported by the worker, and pages are parsed and released one at a time,
+# so a long multi-report PDF never sits in memory as a whole.
+#
+# Two layouts are understood, and may be mixed within one file:
+#   * key/value rows:  "2  Available Nitrogen (N)  245  kg/ha  Low"
+#     with "Sample No: 17" lines (or a repeated reading) starting a new sample
+#   * tables:          "Sample  N  P  K  pH  EC  OC" followed by one row per sample
+
+FIELD_LABELS = {
+    "nitrogen": r"(?:available\s+)?nitrogen(?:\s*\(\s*N\s*\))?",
+    "phosphorus": r"(?:available\s+)?phosphorus(?:\s*\(\s*P\s*\))?",
+    "potassium": r"(?:available\s+)?potassium(?:\s*\(\s*K\s*\))?",
+    "ph": r"(?:soil\s+)?p\s*H\b",
+    "ec": r"(?:electrical\s+conductivity|E\.?C\b\.?)(?:\s*\(\s*EC\s*\))?",
+    "organic_carbon": r"(?:organic\s+carbon|O\.?C\b\.?)(?:\s*\(\s*OC\s*\))?",
+    "sulphur": r"(?:available\s+)?sulph?ur(?:\s*\(\s*S\s*\))?",
+    "zinc": r"zinc(?:\s*\(\s*Zn\s*\))?",
+    "iron": r"iron(?:\s*\(\s*Fe\s*\))?",
+    "copper": r"copper(?:\s*\(\s*Cu\s*\))?",
+    "manganese": r"manganese(?:\s*\(\s*Mn\s*\))?",
+    "boron": r"boron(?:\s*\(\s*B\s*\))?",
+}
+
+# Column headers of tabular reports
+HEADER_TOKENS = {
+    "n": "nitrogen", "nitrogen": "nitrogen",
+    "p": "phosphorus", "phosphorus": "phosphorus",
+    "k": "potassium", "potassium": "potassium",
+    "ph": "ph", "ec": "ec", "oc": "organic_carbon",
+    "s": "sulphur", "zn": "zinc", "fe": "iron", "cu": "copper", "mn": "manganese", "b": "boron",
+}
+SAMPLE_TOKENS = {"sample", "samples", "id", "no", "no.", "sr", "sr.", "s.no", "s.no.", "lab", "code"}
+
+_SERIAL = re.compile(r"^\s*\d{1,2}[.)]?\s+(?=[A-Za-z])")
+_NUMBER = r"(-?\d+(?:\.\d+)?)"
+_FIELD = re.compile(
+    r"^\s*(?:" + "|".join(f"(?P<{name}>{label})" for name, label in FIELD_LABELS.items()) + r")"
+    r"\s*(?:\([^)]*\))?\s*[:=\-]?\s*" + _NUMBER + r"(?![\d.])",
+    re.IGNORECASE,
+)
+_SAMPLE = re.compile(r"sample\s*(?:(?:no\.?|number|id|code)\s*[:#\-]?|[:#])\s*([A-Za-z0-9/_\-]+)", re.IGNORECASE)
+_TEXT_FIELDS = {
+    "soil_color": re.compile(r"soil\s+colou?r\s*[:\-]\s*([A-Za-z ]+?)\s*$", re.IGNORECASE),
+    "crop": re.compile(r"^\s*crop(?:\s+name)?\s*[:\-]\s*([A-Za-z ]+?)\s*$", re.IGNORECASE),
+}
+
+
+def _number(token):
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+class SoilReportParser:
+    """Line-oriented parser; ``feed_page`` returns the samples completed so far.
+
+    State carries across pages, so a sample or table that continues on the
+    next page is still read as one.
+    """
+
+    def __init__(self):
+        self.samples = []
+        self._current = None
+        self._columns = None  # field per numeric column while inside a table
+
+    def _start(self, sample_id, page):
+        self._flush()
+        self._current = {"sample_id": sample_id or str(len(self.samples) + 1), "page": page}
+
+    def _flush(self):
+        current, self._current = self._current, None
+        if current and any(k in current for k in FIELD_LABELS):
+            self.samples.append(current)
+
+    # ---------- TABLES ----------
+    def _table_header(self, line):
+        tokens = line.lower().replace("|", " ").split()
+        columns = [HEADER_TOKENS.get(t) for t in tokens]
+        fields = [c for c in columns if c]
+        if len(fields) < 3 or len(set(fields)) != len(fields):
+            return None
+        if not all(c or t in SAMPLE_TOKENS for c, t in zip(columns, tokens)):
+            return None
+        return fields
+
+    def _table_row(self, line, page):
+        tokens = line.replace("|", " ").split()
+        n = len(self._columns)
+        if len(tokens) not in (n, n + 1):
+            return False
+        values = [_number(t) for t in tokens[-n:]]
+        if any(v is None for v in values):
+            return False
+        self._start(tokens[0] if len(tokens) == n + 1 else None, page)
+        self._current.update(zip(self._columns, values))
+        self._flush()
+        return True
+
+    # ---------- LINES ----------
+    def feed_line(self, line, page):
+        if self._columns is not None:
+            if self._table_row(line, page):
+                return
+            self._columns = None
+
+        header = self._table_header(line)
+        if header is not None:
+            self._flush()
+            self._columns = header
+            return
+
+        sample = _SAMPLE.search(line)
+        if sample and not _FIELD.match(_SERIAL.sub("", line)):
+            self._start(sample.group(1), page)
+            return
+
+        for name, pattern in _TEXT_FIELDS.items():
+            match = pattern.search(line)
+            if match:
+                if self._current is None:
+                    self._start(None, page)
+                self._current.setdefault(name, match.group(1).strip())
+                return
+
+        match = _FIELD.match(_SERIAL.sub("", line))
+        if match is None:
+            return
+        field = next(name for name in FIELD_LABELS if match.group(name))
+        # A reading seen twice means the report moved on to the next sample
+        if self._current is None or field in self._current:
+            carried = {k: v for k, v in (self._current or {}).items() if k in _TEXT_FIELDS}
+            self._start(None, page)
+            self._current.update(carried)
+        self._current[field] = float(match.group(match.lastindex))
+
+    def feed_page(self, text, page):
+        for line in text.splitlines():
+            self.feed_line(line, page)
+        return self.samples
+
+    def close(self):
+        self._flush()
+        return self.samples
+
+
+def extract_samples(path, max_pages=None):
+    """Reads every soil sample of a PDF; runs in a pool worker (module-level, picklable)."""
+    import pdfplumber
+
+    parser = SoilReportParser()
+    with pdfplumber.open(path) as pdf:
+        for number, page in enumerate(pdf.pages, start=1):
+            if max_pages and number > max_pages:
+                break
+            parser.feed_page(page.extract_text() or "", number)
+            # Drops the page's parsed layout so memory stays flat across pages
+            page.close()
+    return parser.close()
+
+
+def extract_text_samples(text):
+    """Parses already-extracted report text; handy for tests and plain-text uploads."""
+    parser = SoilReportParser()
+    parser.feed_page(text, 1)
+    return parser.close()
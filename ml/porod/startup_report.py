@@ -0,0 +1,73 @@
+import importlib
+import re
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Import / initialisation timings for the ML API process. Heavy dependencies
+# are loaded on first use through lazy_import(), which records how long each
+# one took; the CLI below breaks down the import of the app module itself.
+
+_timings = {}
+_lock = threading.Lock()
+
+
+def record(name, seconds):
+    with _lock:
+        _timings.setdefault(name, round(1000.0 * seconds, 3))
+
+
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def lazy_import(name):
+    """Imports ``name`` on first use and records the time it took."""
+    module = sys.modules.get(name)
+    if module is None:
+        with timed(f"import {name}"):
+            module = importlib.import_module(name)
+    return module
+
+
+def report():
+    """Recorded timings in milliseconds, slowest first."""
+    with _lock:
+        return dict(sorted(_timings.items(), key=lambda item: item[1], reverse=True))
+
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s*(\d+)\s*\|\s*\d+\s*\|\s*(\S+)")
+
+
+def import_breakdown(module="ml.porod.mlapi", top=15):
+    """Runs ``python -X importtime`` on ``module`` and sums self time per top-level package."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed")
+
+    totals = {}
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        # Self time, so nested imports are attributed to their own package exactly once
+        if match:
+            package = match.group(2).split(".")[0]
+            totals[package] = totals.get(package, 0) + int(match.group(1))
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return [(package, round(us / 1000.0, 1)) for package, us in ranked[:top]]
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "ml.porod.mlapi"
+    print(f"Import time breakdown for {target} (self ms per top-level package):")
+    for package, ms in import_breakdown(target):
+        print(f"  {package:<30} {ms:>10.1f}")
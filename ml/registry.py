@@ -0,0 +1,174 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from ml.artifacts import atomic_path
+
+# Versioned model artifacts on the local filesystem:
+#
+#   <root>/<model>/manifest.json   {"current", "history", "versions": {version: {files, ...}}}
+#   <root>/<model>/v1/...           the artifact files, under their usual names
+#
+# A version directory is never modified after it is published. Publishing,
+# activating and rolling back only rewrite the manifest (atomically), so a
+# process that polls it sees either the old or the new current version, and
+# loads the files it names after checking their SHA-256 against the manifest.
+
+ML_DIR = Path(__file__).resolve().parent
+DEFAULT_REGISTRY_DIR = ML_DIR / "model_registry"
+MANIFEST = "manifest.json"
+
+# What ``publish`` copies when no paths are given; missing files are skipped
+DEFAULT_ARTIFACTS = {
+    "crop": [ML_DIR / "crop" / "saved_models" / name for name in (
+        "crop_recommendation_model.h5", "scaler.pkl", "label_encoder.pkl", "crop_model_weights.npz")],
+    "fertilizer": [ML_DIR / "fertilizer" / name for name in (
+        "fertilizer_predictor.pkl", "label_encoders.pkl", "fertilizer_forest", "ensemble")],
+}
+
+
+class RegistryError(ValueError):
+    """Unknown version, nothing to roll back to, or files that fail their checksum."""
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def checksums(directory):
+    """``{relative path: sha256}`` of every file under ``directory``."""
+    directory = Path(directory)
+    return {str(p.relative_to(directory)): _file_hash(p) for p in sorted(directory.rglob("*")) if p.is_file()}
+
+
+class ModelRegistry:
+    def __init__(self, root=DEFAULT_REGISTRY_DIR):
+        self.root = Path(root)
+
+    def _manifest_path(self, model):
+        return self.root / model / MANIFEST
+
+    def manifest(self, model):
+        path = self._manifest_path(model)
+        if not path.exists():
+            return {"current": None, "history": [], "versions": {}}
+        return json.loads(path.read_text())
+
+    def _write_manifest(self, model, manifest):
+        with atomic_path(self._manifest_path(model)) as scratch:
+            scratch.write_text(json.dumps(manifest, indent=2))
+
+    @contextmanager
+    def _locked(self, model):
+        """Serialises manifest updates of one model across processes."""
+        (self.root / model).mkdir(parents=True, exist_ok=True)
+        with open(self.root / model / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield self.manifest(model)
+
+    # ---------- QUERIES ----------
+    def current(self, model):
+        """``(version, directory)`` of the active version, or ``(None, None)`` before the first publish."""
+        version = self.manifest(model)["current"]
+        return (version, self.root / model / version) if version else (None, None)
+
+    def verify(self, model, version):
+        """Raises RegistryError unless the files of ``version`` match the manifest's checksums."""
+        expected = self.manifest(model)["versions"].get(version)
+        if expected is None:
+            raise RegistryError(f"{model} has no version {version}")
+        actual = checksums(self.root / model / version)
+        bad = sorted(name for name in expected["files"].keys() | actual.keys()
+                     if expected["files"].get(name) != actual.get(name))
+        if bad:
+            raise RegistryError(f"{model} {version}: checksum mismatch for {', '.join(bad)}")
+        return self.root / model / version
+
+    # ---------- CHANGES ----------
+    def publish(self, model, paths=None, note="", activate=True):
+        """Copies ``paths`` (files or directories) into a new version; returns its name."""
+        paths = [Path(p) for p in (paths if paths is not None else DEFAULT_ARTIFACTS[model]) if Path(p).exists()]
+        if not paths:
+            raise RegistryError(f"Nothing to publish for {model}")
+        with self._locked(model) as manifest:
+            numbers = [int(v[1:]) for v in manifest["versions"]]
+            version = f"v{max(numbers, default=0) + 1}"
+            with atomic_path(self.root / model / version) as scratch:
+                scratch.mkdir()
+                for path in paths:
+                    if path.is_dir():
+                        shutil.copytree(path, scratch / path.name)
+                    else:
+                        shutil.copy2(path, scratch / path.name)
+                files = checksums(scratch)
+            manifest["versions"][version] = {"created_at": time.time(), "note": note, "files": files}
+            if activate:
+                self._set_current(manifest, version)
+            self._write_manifest(model, manifest)
+        return version
+
+    @staticmethod
+    def _set_current(manifest, version):
+        if manifest["current"] and manifest["current"] != version:
+            manifest["history"].append(manifest["current"])
+        manifest["current"] = version
+
+    def activate(self, model, version):
+        with self._locked(model) as manifest:
+            # Verify under the lock so a concurrent publish/rollback can't change what was checked
+            self.verify(model, version)
+            self._set_current(manifest, version)
+            self._write_manifest(model, manifest)
+        return version
+
+    def rollback(self, model):
+        """Re-activates the version that was current before this one; returns it."""
+        with self._locked(model) as manifest:
+            if not manifest["history"]:
+                raise RegistryError(f"{model} has no earlier version to roll back to")
+            # Like activate: never make a version current that workers would fail to load
+            self.verify(model, manifest["history"][-1])
+            manifest["current"] = manifest["history"].pop()
+            self._write_manifest(model, manifest)
+        return manifest["current"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish, list, activate and roll back model versions")
+    parser.add_argument("--root", default=str(DEFAULT_REGISTRY_DIR))
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish = commands.add_parser("publish")
+    publish.add_argument("model", choices=sorted(DEFAULT_ARTIFACTS))
+    publish.add_argument("paths", nargs="*", help="artifact files/directories (default: the model's usual artifacts)")
+    publish.add_argument("--note", default="")
+    publish.add_argument("--no-activate", action="store_true")
+    for name in ("list", "rollback"):
+        commands.add_parser(name).add_argument("model", choices=sorted(DEFAULT_ARTIFACTS))
+    activate = commands.add_parser("activate")
+    activate.add_argument("model", choices=sorted(DEFAULT_ARTIFACTS))
+    activate.add_argument("version")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "publish":
+        version = registry.publish(args.model, args.paths or None, args.note, not args.no_activate)
+        print(f"Published {args.model} {version}")
+    elif args.command == "activate":
+        print(f"{args.model}: {registry.activate(args.model, args.version)} is current")
+    elif args.command == "rollback":
+        print(f"{args.model}: rolled back to {registry.rollback(args.model)}")
+    else:
+        manifest = registry.manifest(args.model)
+        for version, info in manifest["versions"].items():
+            marker = "*" if version == manifest["current"] else " "
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(info["created_at"]))
+            print(f"{marker} {version}  {created}  {len(info['files'])} files  {info['note']}")
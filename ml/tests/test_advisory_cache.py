@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import pytest
+
+from ml.porod import advisory_cache
+from ml.porod.advisory_cache import SQLiteAdvisoryCache, advisory_key, cached_advisory_async, normalise_params
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = SQLiteAdvisoryCache(tmp_path / "advisories.sqlite3", ttl=3600, max_entries=100)
+    monkeypatch.setattr(advisory_cache, "_cache", cache)
+    return cache
+
+
+def test_equivalent_params_share_a_key():
+    params = {"crop": "Wheat", "nitrogen": 40.04, "district": None}
+    assert normalise_params(params) == {"crop": "Wheat", "nitrogen": 40.0, "district": None}
+    assert advisory_key("v1", params) == advisory_key("v1", {"nitrogen": 40, "crop": "Wheat", "district": None})
+    # The prompt uses the name as given, so spellings must not share an entry
+    assert advisory_key("v1", params) != advisory_key("v1", {**params, "crop": "WHEAT"})
+    assert advisory_key("v1", params) != advisory_key("v1", {**params, "nitrogen": 40.1})
+    assert advisory_key("v1", params) != advisory_key("v2", params)
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    cache = SQLiteAdvisoryCache(tmp_path / "a.sqlite3", ttl=0.05)
+    cache.set("k", {"advice": "x"})
+    assert cache.get("k") == {"advice": "x"}
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+    # Expired rows are purged on the next write
+    cache.set("other", {})
+    assert cache.stats()["size"] == 1 and cache.evictions == 1
+
+
+def test_evicts_least_recently_accessed(tmp_path):
+    cache = SQLiteAdvisoryCache(tmp_path / "a.sqlite3", max_entries=2)
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    assert cache.get("a") == 1
+    time.sleep(0.01)
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["size"] == 2 and cache.evictions == 1
+
+
+def test_survives_reopening(tmp_path):
+    SQLiteAdvisoryCache(tmp_path / "a.sqlite3").set("k", {"sections": ["a"]})
+    assert SQLiteAdvisoryCache(tmp_path / "a.sqlite3").get("k") == {"sections": ["a"]}
+
+
+def test_cached_advisory_async_reuses_results(cache):
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        return {"advice": "apply urea"}
+
+    async def main():
+        first = await cached_advisory_async("v1", {"crop": "Wheat"}, produce)
+        second = await cached_advisory_async("v1", {"crop": "Wheat"}, produce)
+        return first, second
+
+    assert asyncio.run(main()) == ({"advice": "apply urea"},) * 2
+    assert len(calls) == 1 and cache.hits == 1
+
+
+def test_error_results_are_not_cached(cache):
+    results = iter([{"error": "Gemini timed out"}, {"advice": "apply urea"}])
+
+    async def produce():
+        return next(results)
+
+    async def main():
+        return [await cached_advisory_async("v1", {"crop": "Wheat"}, produce) for _ in range(3)]
+
+    assert asyncio.run(main()) == [{"error": "Gemini timed out"}, {"advice": "apply urea"}, {"advice": "apply urea"}]
+    assert cache.stats()["size"] == 1
+
+
+def test_stream_and_blocking_fertiliser_queries_share_entries(cache, monkeypatch):
+    from types import SimpleNamespace
+    from ml.porod import fert, llm
+
+    text = "Fertilizer: Urea\nDosage: 50 kg/ha\nBest Practices: split\nWarnings: none\nTrends: Jan-0, Feb-10\n"
+
+    class Models:
+        calls = 0
+
+        async def generate_content(self, model, contents):
+            Models.calls += 1
+            return SimpleNamespace(text=text)
+
+        async def generate_content_stream(self, model, contents):
+            Models.calls += 1
+
+            async def chunks():
+                yield SimpleNamespace(text=text)
+            return chunks()
+
+    monkeypatch.setattr(llm, "get_client", lambda: SimpleNamespace(aio=SimpleNamespace(models=Models())))
+    monkeypatch.setattr(llm, "_semaphore", None)
+
+    async def stream(*args):
+        return [data async for event, data in fert.stream_fertiliser_query(*args) if event == "done"][0]
+
+    async def main():
+        # The stream fills the cache; the blocking call reads it, then the other way round
+        streamed = await stream("Urea", 80, 40, 60)
+        blocking = await fert.get_fertiliser_query_async("Urea", 80, 40, 60)
+        first = await fert.get_fertiliser_query_async("DAP", 10, 20, 30)
+        replayed = await stream("DAP", 10, 20, 30)
+        return streamed, blocking, first, replayed
+
+    streamed, blocking, first, replayed = asyncio.run(main())
+    assert Models.calls == 2 and cache.hits == 2
+    assert blocking == streamed and replayed == first
+    assert blocking["npk_values"] == {"n": 80.0, "p": 40.0, "k": 60.0}
+    assert replayed["npk_values"] == {"n": 10.0, "p": 20.0, "k": 30.0}
+    assert blocking["dosage"] == "50 kg/ha"
+
+
+def test_names_are_trimmed_not_case_folded(cache, monkeypatch):
+    from types import SimpleNamespace
+    from ml.porod import fert, llm
+
+    prompts = []
+
+    class Models:
+        async def generate_content(self, model, contents):
+            prompts.append(contents)
+            return SimpleNamespace(text="Dosage: 50 kg/ha\n")
+
+    monkeypatch.setattr(llm, "get_client", lambda: SimpleNamespace(aio=SimpleNamespace(models=Models())))
+    monkeypatch.setattr(llm, "_semaphore", None)
+
+    async def main():
+        return [await fert.get_fertiliser_query_async(name, 80, 40, 60) for name in ("Urea ", "Urea", "urea")]
+
+    padded, exact, lower = asyncio.run(main())
+    assert len(prompts) == 2 and cache.hits == 1
+    assert "Fertilizer: Urea\n" in prompts[0] and "Fertilizer: urea\n" in prompts[1]
+    assert padded["fertilizer"] == exact["fertilizer"] == {"name": "Urea"}
+    assert lower["fertilizer"] == {"name": "urea"}
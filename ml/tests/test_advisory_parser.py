@@ -0,0 +1,50 @@
+from ml.porod.advisory_parser import AdvisoryParser, pairs, parse_sections
+from ml.porod.CropRec import CROP_SECTIONS
+
+# The chart sections are computed locally now, but the parser still handles them
+CHART_SECTIONS = CROP_SECTIONS + [
+    pairs("Seasonal Requirements", "seasonalRequirements", "season", "requirement"),
+    pairs("Nutrient Distribution", "nutrientDistribution", "name", "value"),
+    pairs("Nutrient Imbalance", "nutrientImbalance", "nutrient", "value"),
+]
+
+TEXT = (
+    "Here is your advisory:\n"
+    "**Crop:** Rice\n"
+    "Growth Tips: Keep the field flooded\n"
+    "Climate Suitability: Warm and humid\n"
+    "Warnings: Watch for blast\n"
+    "Trends: Jan-0, Feb-10%, Mar-15\n"
+    "Seasonal Requirements: Spring-33, Summer-33, Autumn-33, Winter-0\n"
+    "Nutrient Distribution: Nitrogen-38, Phosphorus-23, Potassium-15\n"
+    "Nutrient Imbalance: Nitrogen-50, Phosphorus-30 the imbalance should be corrected"
+)
+
+
+def test_parses_all_sections():
+    result = parse_sections(TEXT, CHART_SECTIONS)
+    assert result["bestCrops"] == "Rice"
+    assert result["growthTips"] == "Keep the field flooded"
+    assert result["trendsData"] == [{"date": "Jan", "value": 0}, {"date": "Feb", "value": 10},
+                                    {"date": "Mar", "value": 15}]
+    assert result["seasonalRequirements"][-1] == {"season": "Winter", "requirement": 0}
+    assert result["nutrientImbalance"] == [{"nutrient": "Nitrogen", "value": 50},
+                                           {"nutrient": "Phosphorus", "value": 30}]
+
+
+def test_incremental_feed_matches_whole_text():
+    parser = AdvisoryParser(CHART_SECTIONS)
+    emitted = []
+    for i in range(0, len(TEXT), 5):
+        emitted += parser.feed(TEXT[i:i + 5])
+    emitted += parser.close()
+
+    assert [key for key, _ in emitted] == [s.key for s in CHART_SECTIONS]
+    assert dict(emitted) == parse_sections(TEXT, CHART_SECTIONS)
+
+
+def test_missing_sections_use_defaults():
+    result = parse_sections("Warnings: none", CROP_SECTIONS, {"bestCrops": "Maize"})
+    assert result["bestCrops"] == "Maize"
+    assert result["growthTips"] == ""
+    assert result["trendsData"] == []
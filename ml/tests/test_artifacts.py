@@ -0,0 +1,21 @@
+import threading
+
+import numpy as np
+
+from ml.artifacts import atomic_path, load_arrays, save_arrays
+
+
+def test_load_waits_out_a_directory_swap(tmp_path):
+    target = tmp_path / "model"
+    save_arrays(target, {"w": np.arange(3)})
+    with atomic_path(target) as scratch:
+        save_arrays(scratch, {"w": np.arange(4)})
+    arrays, _ = load_arrays(target)
+    np.testing.assert_array_equal(arrays["w"], np.arange(4))
+
+    # Reproduce the gap between the two renames of a directory swap
+    aside = tmp_path / ".model.old"
+    target.rename(aside)
+    threading.Timer(0.05, aside.rename, (target,)).start()
+    arrays, _ = load_arrays(target, mmap=False)
+    np.testing.assert_array_equal(arrays["w"], np.arange(4))
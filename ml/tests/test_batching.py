@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from ml.porod.batching import MicroBatcher, QueueFullError
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_flushes_when_batch_is_full():
+    batches = []
+
+    def predict(items):
+        batches.append(list(items))
+        return [i * 2 for i in items]
+
+    async def main():
+        # A long max-wait: only the size limit can flush these quickly
+        batcher = MicroBatcher(predict, max_batch_size=4, max_wait_ms=10_000)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(8)))
+        elapsed = time.perf_counter() - started
+        await batcher.stop()
+        return results, elapsed, batcher.stats()
+
+    results, elapsed, stats = run(main())
+    assert results == [i * 2 for i in range(8)]
+    assert batches == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert elapsed < 1.0
+    assert stats["batches"] == 2 and stats["max_batch_size_seen"] == 4
+
+
+def test_flushes_partial_batch_after_max_wait():
+    async def main():
+        batcher = MicroBatcher(lambda items: items, max_batch_size=32, max_wait_ms=50)
+        started = time.perf_counter()
+        results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+        elapsed = time.perf_counter() - started
+        await batcher.stop()
+        return results, elapsed, batcher.stats()
+
+    results, elapsed, stats = run(main())
+    assert results == ["a", "b"]
+    assert 0.04 <= elapsed < 1.0
+    assert stats["batches"] == 1
+
+
+def test_async_predict_fn():
+    async def predict(items):
+        await asyncio.sleep(0)
+        return [item.upper() for item in items]
+
+    async def main():
+        batcher = MicroBatcher(predict, max_batch_size=2, max_wait_ms=1)
+        results = await asyncio.gather(*(batcher.submit(s) for s in "xyz"))
+        await batcher.stop()
+        return results
+
+    assert run(main()) == ["X", "Y", "Z"]
+
+
+@pytest.mark.parametrize("predict", [
+    lambda items: 1 / 0,
+    lambda items: items[:-1],  # one result short
+])
+def test_errors_reach_every_waiter(predict):
+    async def main():
+        batcher = MicroBatcher(predict, max_batch_size=3, max_wait_ms=1)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+        await batcher.stop()
+        return results, batcher.stats()
+
+    results, stats = run(main())
+    assert len(results) == 3 and all(isinstance(r, Exception) for r in results)
+    assert len({type(r) for r in results}) == 1
+    assert stats["errors"] == 1
+
+
+def test_rejects_when_queue_is_full():
+    async def main():
+        batcher = MicroBatcher(lambda items: items, max_batch_size=8, max_wait_ms=50, max_queue=2)
+        waiting = [asyncio.ensure_future(batcher.submit(i)) for i in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await batcher.submit(2)
+        results = await asyncio.gather(*waiting)
+        await batcher.stop()
+        return results, batcher.stats()
+
+    results, stats = run(main())
+    assert results == [0, 1]
+    assert stats["rejected"] == 1 and stats["items"] == 2
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from ml.crop.neighbors import SimilarFieldsIndex
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SimilarFieldsIndex.build()
+
+
+def test_matches_brute_force(index):
+    rng = np.random.default_rng(0)
+    queries = index.rows[rng.choice(len(index), 20)] * rng.uniform(0.9, 1.1, (20, 7))
+    distances, indices = index.query(queries, k=5)
+
+    scaled = (index.rows - index.scaler_mean) / index.scaler_scale
+    q = (queries - index.scaler_mean) / index.scaler_scale
+    brute = np.sqrt(((q[:, None, :] - scaled[None]) ** 2).sum(-1))
+    assert np.allclose(distances, np.sort(brute, axis=1)[:, :5])
+
+
+def test_known_sample_is_its_own_nearest_neighbour(index):
+    [neighbours] = index.similar(index.rows[:1], k=3)
+    assert neighbours[0]["distance"] == 0.0
+    assert neighbours[0]["crop"] == index.labels[0]
+    assert len(neighbours) == 3
+
+
+def test_saved_index_is_memory_mapped(index, tmp_path):
+    loaded = SimilarFieldsIndex.load(index.save(tmp_path / "similar.joblib"))
+    assert isinstance(loaded.rows, np.memmap)
+    assert loaded.similar(index.rows[:5], k=4) == index.similar(index.rows[:5], k=4)
+
+
+@pytest.fixture
+def mlapi(index, monkeypatch):
+    pytest.importorskip("fastapi")
+    from ml.porod import mlapi
+
+    monkeypatch.setattr(mlapi.app.state, "similar_fields", index, raising=False)
+    return mlapi
+
+
+def crop_input(mlapi, row, **changes):
+    fields = ["nitrogen", "phosphorus", "potassium", "temperature", "humidity", "ph", "rainfall"]
+    return mlapi.CropInput(**{**dict(zip(fields, map(float, row))), **changes})
+
+
+def test_batch_reports_non_finite_rows_individually(index, mlapi):
+    import asyncio
+
+    row = index.rows[0]
+    rows = [crop_input(mlapi, row), crop_input(mlapi, row, ph=float("nan")),
+            crop_input(mlapi, row, rainfall=float("inf")), crop_input(mlapi, row)]
+
+    results = asyncio.run(mlapi.crop_similar_batch(rows, k=2))["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert results[1]["error"] == results[2]["error"] == "non-finite numeric value"
+    assert results[0]["similarFields"] == results[3]["similarFields"] == index.similar(index.rows[:1], k=2)[0]
+
+
+def test_bad_k_is_rejected_before_any_work(index, mlapi, monkeypatch):
+    import asyncio
+    from fastapi import HTTPException
+
+    calls = []
+    monkeypatch.setattr(mlapi.crop_cache, "get_or_compute", lambda *args: calls.append(args))
+    data = crop_input(mlapi, index.rows[0])
+    with pytest.raises(HTTPException) as caught:
+        asyncio.run(mlapi.crop_manual(data, similar=mlapi.SIMILAR_FIELDS_MAX_K + 1))
+    assert caught.value.status_code == 422 and calls == []
+
+
+@pytest.mark.parametrize("bad", ["NaN", "Infinity", "-Infinity"])
+def test_manual_prediction_rejects_non_finite_values(bad, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    from ml.porod import mlapi
+
+    calls = []
+    monkeypatch.setattr(mlapi.crop_cache, "get_or_compute", lambda *args: calls.append(args))
+    body = ('{"nitrogen": %s, "phosphorus": 42, "potassium": 43, "temperature": 20.8, "humidity": 82, '
+            '"ph": 6.5, "rainfall": 202.9}' % bad)
+    response = TestClient(mlapi.app).post("/api/croppred/manual", content=body,
+                                          headers={"Content-Type": "application/json"})
+    assert response.status_code == 422 and calls == []
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+pytest.importorskip("sklearn")
+
+from ml.crop.main import CropRecommendationLSTM
+from ml.crop.numpy_engine import NumpyCropModel
+
+CROP_DIR = Path(__file__).resolve().parents[1] / "crop"
+TOLERANCE = 1e-5
+
+
+@pytest.fixture(scope="module")
+def models():
+    keras_model = CropRecommendationLSTM.from_artifacts(CROP_DIR / "saved_models")
+    numpy_model = NumpyCropModel.load(CROP_DIR / "saved_models" / "crop_model_weights.npz")
+    return keras_model, numpy_model
+
+
+@pytest.fixture(scope="module")
+def rows():
+    data = np.genfromtxt(CROP_DIR / "crop_data.csv", delimiter=",", skip_header=1, usecols=range(7))
+    rng = np.random.default_rng(0)
+    noise = rng.normal(scale=0.1, size=data.shape) * data.std(axis=0)
+    return np.vstack([data, data + noise])
+
+
+def test_single_step_batch_matches_keras(models, rows):
+    keras_model, numpy_model = models
+    scaled = keras_model.scaler.transform(rows).reshape(-1, 1, rows.shape[1])
+
+    expected = keras_model.model.predict_on_batch(scaled)
+    actual = numpy_model.predict_proba(scaled)
+
+    np.testing.assert_allclose(actual, expected, atol=TOLERANCE)
+    assert numpy_model.predict_crops(rows) == keras_model.predict_crops(rows)
+
+
+def test_multi_step_sequences_match_keras(models, rows):
+    keras_model, numpy_model = models
+    steps = 3
+    usable = len(rows) // steps * steps
+    scaled = keras_model.scaler.transform(rows[:usable]).reshape(-1, steps, rows.shape[1])
+
+    expected = keras_model.model.predict_on_batch(scaled)
+    actual = numpy_model.predict_proba(scaled)
+
+    np.testing.assert_allclose(actual, expected, atol=TOLERANCE)
+
+
+def test_predict_crop_matches_keras(models, rows):
+    keras_model, numpy_model = models
+    for sample in (rows[:1], rows[100:103]):
+        assert numpy_model.predict_crop(sample) == keras_model.predict_crop(sample)
+
+
+@pytest.mark.parametrize("bad", [np.nan, np.inf])
+def test_rejects_non_finite_rows(models, rows, bad):
+    from ml.fertilizer.predictor import NonFiniteValueError
+
+    _, numpy_model = models
+    sample = rows[:3].copy()
+    sample[1, 5] = bad
+    with pytest.raises(NonFiniteValueError):
+        numpy_model.predict_crops(sample)
+    with pytest.raises(NonFiniteValueError):
+        numpy_model.predict_crop(sample)
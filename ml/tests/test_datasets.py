@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+from sklearn.preprocessing import LabelEncoder
+
+from ml.datasets import SOURCES, load_dataset
+
+
+def test_fertilizer_matches_label_encoding(tmp_path):
+    dataset = load_dataset("fertilizer", cache_dir=tmp_path)
+    df = pd.read_csv(SOURCES["fertilizer"]["path"])
+
+    assert "Link" not in dataset.names and len(dataset) == len(df)
+    assert isinstance(dataset["Nitrogen"], np.memmap)
+    for column in SOURCES["fertilizer"]["categorical"]:
+        expected = LabelEncoder().fit(df[column])
+        assert np.array_equal(dataset[column], expected.transform(df[column]))
+        assert list(dataset.encoder(column).classes_) == list(expected.classes_)
+    assert np.array_equal(dataset["pH"], df["pH"])
+
+    frame = dataset.to_frame(decode=True)
+    assert frame.equals(df.drop(columns="Link"))
+
+
+def test_rebuilds_when_source_changes(tmp_path):
+    source = tmp_path / "crop_data.csv"
+    source.write_text("N,P,label\n1,2,rice\n3,4,maize\n")
+    cache = tmp_path / "cache"
+
+    first = load_dataset(source, cache_dir=cache)
+    assert first.categories == {"label": ["maize", "rice"]}
+    # Touched without changing: the cache is reused
+    os.utime(source, ns=(0, 0))
+    assert load_dataset(source, cache_dir=cache).meta["sha256"] == first.meta["sha256"]
+
+    source.write_text("N,P,label\n1,2,rice\n3,4,maize\n5,6,apple\n")
+    second = load_dataset(source, cache_dir=cache)
+    assert len(second) == 3 and list(second.decode("label")) == ["rice", "maize", "apple"]
+    # Readers of the first version keep their mapped columns
+    assert list(first["N"]) == [1, 3]
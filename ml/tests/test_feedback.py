@@ -0,0 +1,140 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+joblib = pytest.importorskip("joblib")
+pd = pytest.importorskip("pandas")
+
+from sklearn.ensemble import RandomForestClassifier
+
+from ml.feedback import FeedbackLog, update_fertilizer, update_models, warm_start_forest
+from ml.fertilizer.predictor import FEATURE_COLUMNS
+
+FERTILIZERS = ["DAP", "MOP", "Urea"]
+
+
+def fert_record(fertilizer, nitrogen=50.0, worked=True, crop="Wheat"):
+    return {"soil_color": "Black", "nitrogen": nitrogen, "phosphorus": 40.0, "potassium": 30.0, "ph": 6.5,
+            "rainfall": 800.0, "temperature": 25.0, "crop": crop, "fertilizer": fertilizer, "worked": worked}
+
+
+@pytest.fixture
+def fert_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 100, (90, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    y = np.repeat([0, 1, 2], 30)
+    joblib.dump(RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y), tmp_path / "model.pkl")
+    encoders = {
+        "District_Name": ["Kolhapur"], "Soil_color": ["Black", "Red"],
+        "Crop": ["Rice", "Wheat"], "Fertilizer": FERTILIZERS,
+    }
+    joblib.dump({k: SimpleNamespace(classes_=np.array(v, dtype=object)) for k, v in encoders.items()},
+                tmp_path / "label_encoders.pkl")
+    return tmp_path
+
+
+def test_log_reads_only_new_complete_lines(tmp_path):
+    log = FeedbackLog(tmp_path, "crop")
+    log.append([{"crop": "rice"}, {"crop": "maize"}])
+    records, offset = log.read_new()
+    assert [r["crop"] for r in records] == ["rice", "maize"]
+
+    log.save_state({"offset": offset, "records_used": 2, "updates": 1})
+    log.append([{"crop": "apple"}])
+    with open(log.path, "a") as f:
+        f.write('{"crop": "half-writ')
+    assert [r["crop"] for r in log.read_new()[0]] == ["apple"]
+
+
+def test_warm_start_keeps_old_trees_and_classes():
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(60, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    model = RandomForestClassifier(n_estimators=4, random_state=0).fit(X, np.repeat([0, 1, 2], 20))
+    old_trees = list(model.estimators_)
+
+    # The new rows only show one class
+    warm_start_forest(model, rng.normal(size=(8, len(FEATURE_COLUMNS))), np.full(8, 2), new_trees=3)
+    assert model.estimators_[:4] == old_trees and len(model.estimators_) == 7
+    assert list(model.classes_) == [0, 1, 2]
+    assert model.predict_proba(X).shape == (60, 3)
+
+    warm_start_forest(model, rng.normal(size=(8, len(FEATURE_COLUMNS))), np.full(8, 1), new_trees=3, max_trees=8)
+    assert len(model.estimators_) == 8 and model.estimators_[0] is old_trees[2]
+
+
+def test_update_fertilizer_uses_new_confirmed_records(fert_dir):
+    log = FeedbackLog(fert_dir / "feedback", "fertilizer")
+    log.append([fert_record("Urea", n) for n in range(20)] + [
+        fert_record("DAP", worked=False),   # not a label
+        fert_record("Mystery"),             # unknown fertilizer
+    ])
+    kwargs = dict(model_path=fert_dir / "model.pkl", compiled_path=None, new_trees=4)
+
+    assert update_fertilizer(fert_dir / "feedback", min_records=50, **kwargs)["updated"] is False
+    report = update_fertilizer(fert_dir / "feedback", **kwargs)
+    assert report["updated"] and report["used"] == 20 and report["skipped"] == 1 and report["trees"] == 9
+    assert len(joblib.load(fert_dir / "model.pkl").estimators_) == 9
+
+    # Nothing new since the last update
+    assert update_fertilizer(fert_dir / "feedback", **kwargs) == {"model": "fertilizer", "updated": False,
+                                                                   "new_records": 0}
+    assert json.loads(log.state_path.read_text())["records_used"] == 20
+    assert not list(fert_dir.glob(".*tmp*"))
+
+
+def test_only_one_update_at_a_time(tmp_path):
+    import fcntl
+
+    tmp_path.joinpath("update.lock").touch()
+    with open(tmp_path / "update.lock") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        assert update_models(("fertilizer",), tmp_path) is None
+
+
+def test_update_publishes_to_registry(fert_dir):
+    from ml.registry import ModelRegistry
+
+    fert_dir.joinpath("model.pkl").rename(fert_dir / "fertilizer_predictor.pkl")
+    registry = ModelRegistry(fert_dir / "registry")
+    registry.publish("fertilizer", [fert_dir / "fertilizer_predictor.pkl", fert_dir / "label_encoders.pkl"])
+    FeedbackLog(fert_dir / "feedback", "fertilizer").append([fert_record("DAP", n) for n in range(5)])
+
+    [report] = update_models(("fertilizer",), fert_dir / "feedback", registry, new_trees=2)
+    assert report["published"] == "v2" and registry.current("fertilizer")[0] == "v2"
+    registry.verify("fertilizer", "v2")
+    assert len(joblib.load(registry.current("fertilizer")[1] / "fertilizer_predictor.pkl").estimators_) == 7
+    # The previous version is untouched, so it can be rolled back to
+    assert len(joblib.load(registry.root / "fertilizer" / "v1" / "fertilizer_predictor.pkl").estimators_) == 5
+
+
+def test_non_finite_record_is_skipped_not_wedging_the_log(fert_dir):
+    log = FeedbackLog(fert_dir / "feedback", "fertilizer")
+    # Written with json.dumps, so the log holds a literal Infinity
+    log.append([fert_record("Urea", float("inf")), fert_record("DAP", float("nan"))])
+    log.append([fert_record("Urea", n) for n in range(5)])
+
+    report = update_fertilizer(fert_dir / "feedback", model_path=fert_dir / "model.pkl", compiled_path=None,
+                               new_trees=2)
+    assert report["updated"] and report["used"] == 5 and report["skipped"] == 2
+    assert update_fertilizer(fert_dir / "feedback", model_path=fert_dir / "model.pkl")["new_records"] == 0
+
+
+@pytest.mark.parametrize("path, record", [
+    ("/api/feedback/fertiliser", '{"soil_color": "Black", "nitrogen": Infinity, "phosphorus": 40, "potassium": 30, '
+                                 '"ph": 6.5, "rainfall": 800, "temperature": 25, "crop": "Wheat", "fertilizer": "DAP"}'),
+    ("/api/feedback/crop", '{"nitrogen": 90, "phosphorus": 42, "potassium": 43, "temperature": 20.8, '
+                           '"humidity": NaN, "ph": 6.5, "rainfall": 202.9, "crop": "rice"}'),
+])
+def test_api_rejects_non_finite_feedback(path, record, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    from ml.porod import mlapi
+
+    appended = []
+    for log in mlapi.feedback_logs.values():
+        monkeypatch.setattr(log, "append", appended.append)
+    response = TestClient(mlapi.app).post(path, content=f"[{record}]", headers={"Content-Type": "application/json"})
+    assert response.status_code == 422 and appended == []
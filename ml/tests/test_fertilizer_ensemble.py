@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_selection import SelectFromModel, SelectKBest, f_classif
+from sklearn.preprocessing import PolynomialFeatures, RobustScaler, StandardScaler
+
+from ml.fertilizer.ensemble import FertilizerEnsemble, engineer_features
+
+
+def base_rows(n, seed):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(0, 2, n), rng.integers(0, 5, n),                    # district, soil colour
+        rng.uniform(20, 150, n), rng.uniform(10, 90, n), rng.uniform(10, 150, n),
+        rng.uniform(5, 8.5, n), rng.uniform(300, 1800, n), rng.uniform(15, 35, n),
+        rng.integers(0, 12, n),                                          # crop
+    ])
+    return X, rng.integers(0, 4, n)
+
+
+@pytest.mark.parametrize("scaler", [RobustScaler(), StandardScaler(), StandardScaler(with_mean=False)])
+@pytest.mark.parametrize("select", ["kbest", "from_model"])
+def test_transform_matches_sklearn_pipeline(scaler, select):
+    X, y = base_rows(300, 0)
+    features = engineer_features(X)
+    scaled = scaler.fit_transform(features)
+    poly = PolynomialFeatures(degree=2, interaction_only=True, include_bias=False)
+    expanded = poly.fit_transform(scaled)
+    if select == "kbest":
+        selector = SelectKBest(f_classif, k=40).fit(expanded, y)
+    else:
+        # As in main.py
+        forest = RandomForestClassifier(n_estimators=10, random_state=0).fit(expanded, y)
+        selector = SelectFromModel(forest, threshold="median", prefit=True)
+
+    encoders = {"Fertilizer": SimpleNamespace(classes_=np.array(["DAP", "MOP", "Urea", "10-26-26"]))}
+    ensemble = FertilizerEnsemble(scaler, poly, selector, None, None, encoders)
+
+    X_new, _ = base_rows(50, 1)
+    expected = selector.transform(poly.transform(scaler.transform(engineer_features(X_new))))
+    np.testing.assert_allclose(ensemble.transform(X_new), expected, rtol=1e-12, atol=1e-9)
+
+
+def test_rejects_higher_degree_features():
+    X, y = base_rows(50, 0)
+    scaled = RobustScaler().fit_transform(engineer_features(X))
+    poly = PolynomialFeatures(degree=2, include_bias=False).fit(scaled)  # includes squares
+    selector = SelectKBest(f_classif, k="all").fit(poly.transform(scaled), y)
+    with pytest.raises(ValueError, match="interaction-only"):
+        FertilizerEnsemble(RobustScaler().fit(scaled), poly, selector, None, None,
+                           {"Fertilizer": SimpleNamespace(classes_=np.arange(4))})
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+pytest.importorskip("pandas")
+
+from sklearn.ensemble import RandomForestClassifier
+
+from ml.datasets import load_dataset
+from ml.fertilizer.predictor import FEATURE_COLUMNS, FertilizerPredictor, NonFiniteValueError
+
+
+@pytest.fixture(scope="module")
+def fitted(tmp_path_factory):
+    dataset = load_dataset("fertilizer", cache_dir=tmp_path_factory.mktemp("cache"))
+    df = dataset.to_frame()
+    X, y = df[FEATURE_COLUMNS], df["Fertilizer"].to_numpy(dtype=np.int64)
+    model = RandomForestClassifier(n_estimators=30, random_state=0).fit(X, y)
+    return model, dataset.encoders(), dataset.to_frame(decode=True), X
+
+
+def test_matches_random_forest_predict(fitted):
+    model, encoders, decoded, X = fitted
+    predictor = FertilizerPredictor(model, encoders)
+    rng = np.random.default_rng(0)
+    rows = X.sample(400, random_state=0)
+    # Off-grid values too, so rows land next to split thresholds
+    jittered = rows.copy()
+    numeric = ["Nitrogen", "Phosphorus", "Potassium", "pH", "Rainfall", "Temperature"]
+    jittered[numeric] = jittered[numeric] * rng.uniform(0.9, 1.1, (len(rows), len(numeric)))
+
+    for frame in (rows, jittered):
+        expected = encoders["Fertilizer"].classes_[model.predict(frame)]
+        np.testing.assert_array_equal(predictor.predict(frame.to_numpy()), expected)
+
+    # predict_one scores rows of the predictor's district
+    local = decoded[decoded["District_Name"] == predictor.district].sample(50, random_state=0)
+    expected = encoders["Fertilizer"].classes_[model.predict(X.loc[local.index])]
+    got = [predictor.predict_one(r.Soil_color, r.Nitrogen, r.Phosphorus, r.Potassium, r.pH, r.Rainfall,
+                                 r.Temperature, r.Crop) for r in local.itertuples()]
+    assert got == list(expected)
+
+
+@pytest.mark.parametrize("bad", [float("nan"), float("inf"), -float("inf")])
+def test_predict_one_rejects_non_finite_values(fitted, bad):
+    model, encoders, decoded, _ = fitted
+    predictor = FertilizerPredictor(model, encoders)
+    soil, crop = decoded["Soil_color"].iloc[0], decoded["Crop"].iloc[0]
+    with pytest.raises(NonFiniteValueError):
+        predictor.predict_one(soil, 50, bad, 30, 6.5, 1000, 25, crop)
+    [result] = predictor.predict_records([{"soil_color": soil, "nitrogen": 50, "phosphorus": bad, "potassium": 30,
+                                           "ph": 6.5, "rainfall": 1000, "temperature": 25, "crop": crop}])
+    assert result == {"error": "non-finite numeric value"}
+
+
+def test_api_answers_422_for_non_finite_input():
+    pytest.importorskip("fastapi")
+    from fastapi import HTTPException
+    from ml.porod.mlapi import inference_errors
+
+    with pytest.raises(HTTPException) as caught:
+        with inference_errors():
+            raise NonFiniteValueError("non-finite numeric value")
+    assert caught.value.status_code == 422
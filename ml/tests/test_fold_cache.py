@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("imblearn")
+
+from imblearn.over_sampling import SMOTE
+from sklearn.model_selection import StratifiedKFold
+
+from ml.fertilizer.fold_cache import prepare_folds
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    y = np.repeat([0, 1, 2], [200, 60, 40])
+    X = rng.normal(size=(len(y), 4)) + y[:, None]
+    return X, y
+
+
+def test_folds_match_per_trial_preparation(data):
+    X, y = data
+    folds = prepare_folds(X, y, cache_dir=None)
+
+    cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+    for (fold, split), (train_idx, val_idx) in zip(folds.folds(), cv.split(X, y)):
+        X_train, y_train, X_val, y_val, class_weight = split
+        expected_X, expected_y = SMOTE(random_state=42, k_neighbors=5).fit_resample(X[train_idx], y[train_idx])
+        assert np.array_equal(X_train[:, 0, :], expected_X) and np.array_equal(y_train, expected_y)
+        assert np.array_equal(X_val[:, 0, :], X[val_idx])
+        # Balanced after SMOTE, so every weight is 1
+        assert class_weight == pytest.approx({0: 1.0, 1: 1.0, 2: 1.0})
+
+    X_train, y_train, X_test, _, _ = folds.final_split()
+    assert X_train.shape[1:] == (1, 4) and len(X_test) == 60
+    assert np.bincount(y_train).min() == np.bincount(y_train).max()
+
+
+def test_cache_is_reused_and_memory_mapped(data, tmp_path):
+    X, y = data
+    first = prepare_folds(X, y, cache_dir=tmp_path)
+    second = prepare_folds(X, y, cache_dir=tmp_path)
+
+    assert second.directory == first.directory
+    assert isinstance(second.arrays["fold0_X_train"], np.memmap)
+    assert len(list(tmp_path.iterdir())) == 1
+    # Different inputs get their own entry
+    prepare_folds(X[:-1], y[:-1], cache_dir=tmp_path)
+    assert len(list(tmp_path.iterdir())) == 2
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from sklearn.ensemble import RandomForestClassifier
+
+from ml.fertilizer.forest_compiler import CompiledForest, accuracy_delta, compile_forest
+
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 6)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] ** 2 > 0.5).astype(int) + (X[:, 2] > 1).astype(int)
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+    return model, X, y
+
+
+def test_lossless_matches_sklearn(forest):
+    model, X, _ = forest
+    rng = np.random.default_rng(1)
+    X_new = np.vstack([X, rng.normal(size=(400, 6))])
+    compiled = compile_forest(model)
+
+    np.testing.assert_array_equal(compiled.predict_proba(X_new), model.predict_proba(X_new))
+    np.testing.assert_array_equal(compiled.predict(X_new), model.predict(X_new))
+    np.testing.assert_array_equal(compiled.predict(X_new[:1]), model.predict(X_new[:1]))
+
+
+def test_save_load_round_trip(forest, tmp_path):
+    model, X, _ = forest
+    compiled = compile_forest(model)
+    loaded = CompiledForest.load(compiled.save(tmp_path / "forest.npz"))
+    np.testing.assert_array_equal(loaded.predict(X), compiled.predict(X))
+
+
+def test_lossy_options_report_delta(forest):
+    model, X, y = forest
+    compiled = compile_forest(model, n_trees=5, quantize=True)
+    assert compiled.n_trees == 5
+    assert compiled.nbytes < compile_forest(model).nbytes
+    report = accuracy_delta(model, compiled, X, y)
+    assert 0.0 <= report["agreement"] <= 1.0
+    assert report["accuracy_delta"] == pytest.approx(report["compiled_accuracy"] - report["model_accuracy"])
+
+
+def test_directory_layout_is_memory_mapped(forest, tmp_path):
+    model, X, _ = forest
+    compiled = compile_forest(model)
+    compiled.encoder_classes = {"Crop": ["Rice", "Wheat"]}
+    loaded = CompiledForest.load(compiled.save(tmp_path / "forest"))
+
+    assert isinstance(loaded.leaf_proba, np.memmap) and not loaded.leaf_proba.flags.writeable
+    assert loaded.encoder_classes == {"Crop": ["Rice", "Wheat"]}
+    np.testing.assert_array_equal(loaded.predict_proba(X), model.predict_proba(X))
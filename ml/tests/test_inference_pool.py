@@ -0,0 +1,115 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from ml.porod.inference_pool import InferencePool, PoolSaturatedError
+
+
+def wait_for(event):
+    event.wait(5)
+    return "done"
+
+
+def test_rejects_when_workers_and_queue_are_busy():
+    release = threading.Event()
+
+    async def main():
+        pool = InferencePool("thread", workers=1, max_queue=1, timeout=5)
+        running = [asyncio.ensure_future(pool.run(wait_for, release)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(wait_for, release)
+        stats = pool.stats()
+        release.set()
+        results = await asyncio.gather(*running)
+        pool.shutdown()
+        return stats, results, pool.stats()
+
+    busy, results, done = asyncio.run(main())
+    assert busy["active"] == 1 and busy["queued"] == 1 and busy["rejected"] == 1
+    assert results == ["done", "done"]
+    assert done["completed"] == 2 and done["active"] == 0
+
+
+def test_timeout_keeps_slot_until_the_call_finishes():
+    async def main():
+        pool = InferencePool("thread", workers=1, max_queue=0, timeout=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(time.sleep, 0.3)
+        # The worker is still sleeping, so its slot is still taken
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(time.sleep, 0)
+        timed_out = pool.stats()
+
+        await asyncio.sleep(0.4)
+        result = await pool.run(abs, -3, timeout=None)
+        pool.shutdown()
+        return timed_out, result, pool.stats()
+
+    timed_out, result, stats = asyncio.run(main())
+    assert timed_out["timeouts"] == 1 and timed_out["active"] == 1
+    assert result == 3
+    assert stats["active"] == 0 and stats["queued"] == 0 and stats["completed"] == 2
+
+
+def test_errors_propagate_and_release_the_slot():
+    async def main():
+        pool = InferencePool("thread", workers=1, max_queue=0)
+        with pytest.raises(ZeroDivisionError):
+            await pool.run(divmod, 1, 0)
+        result = await pool.run(divmod, 7, 2)
+        pool.shutdown()
+        return result, pool.stats()
+
+    result, stats = asyncio.run(main())
+    assert result == (3, 1)
+    assert stats["failed"] == 1 and stats["completed"] == 1 and stats["active"] == 0
+
+
+def test_api_maps_saturation_to_503_and_timeout_to_504():
+    pytest.importorskip("fastapi")
+    from fastapi import HTTPException
+    from ml.porod.mlapi import inference_errors
+
+    for error, status in ((PoolSaturatedError(), 503), (asyncio.TimeoutError(), 504)):
+        with pytest.raises(HTTPException) as caught:
+            with inference_errors():
+                raise error
+        assert caught.value.status_code == status
+
+
+def double_rows(chunk, factor):
+    return [{"value": row * factor} for row in chunk]
+
+
+def test_bulk_chunks_run_in_the_pool(monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi import HTTPException
+    from ml.porod import mlapi
+
+    pool = InferencePool("thread", workers=1, max_queue=0, timeout=5)
+    monkeypatch.setattr(mlapi, "inference_pool", pool)
+    monkeypatch.setattr(mlapi, "BULK_CHUNK_SIZE", 2)
+    release = threading.Event()
+
+    async def main():
+        body = await mlapi.bulk_response([1, 2, 3], double_rows, False, 10)
+        streamed = await mlapi.bulk_response([1, 2, 3], double_rows, True, 10)
+        lines = [line async for line in streamed.body_iterator]
+
+        busy = asyncio.ensure_future(pool.run(wait_for, release))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as caught:
+            await mlapi.bulk_response([1], double_rows, False, 10)
+        release.set()
+        await busy
+        return body, lines, caught.value.status_code
+
+    body, lines, status = asyncio.run(main())
+    pool.shutdown()
+    assert body == {"results": [{"index": 0, "value": 10}, {"index": 1, "value": 20}, {"index": 2, "value": 30}]}
+    assert lines == [json.dumps(row) + "\n" for row in body["results"]]
+    assert status == 503 and pool.stats()["completed"] == 5
@@ -0,0 +1,54 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+
+# Modules that must only load on first use, never when the API module is imported
+HEAVY_MODULES = ["tensorflow", "keras", "pandas", "pdfplumber", "google.genai", "sklearn", "joblib"]
+
+
+def loaded_after_import(module):
+    code = (
+        "import json, sys\n"
+        f"import {module}\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, timeout=120
+    )
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", [
+    "ml.porod.mlapi",
+    "ml.porod.CropRec",
+    "ml.porod.fert",
+    "ml.porod.nutrient_stats",
+    "ml.porod.litsearch",
+    "ml.fertilizer.predictor",
+    "ml.fertilizer.forest_compiler",
+    "ml.fertilizer.ensemble",
+    "ml.fertilizer.fold_cache",
+    "ml.crop.numpy_engine",
+    "ml.crop.neighbors",
+    "ml.crop.sequences",
+    "ml.datasets",
+    "ml.feedback",
+    "ml.registry",
+])
+def test_import_does_not_load_heavy_modules(module):
+    pytest.importorskip("fastapi")
+    assert loaded_after_import(module) == []
+
+
+def test_advisory_modules_do_not_build_llm_client():
+    from ml.porod import llm
+    import ml.porod.CropRec  # noqa: F401
+    import ml.porod.fert  # noqa: F401
+
+    assert llm._client is None
@@ -0,0 +1,64 @@
+import math
+
+import pytest
+
+from ml.porod.litsearch import BM25_B, BM25_K1, LiteratureIndex, build_index, tokenize
+from ml.tests.test_soil_report import make_pdf
+
+CORPUS = {
+    "a.pdf": ["Nitrogen fixing crops improve soil nitrogen.\nLegumes such as soybean fix nitrogen.",
+              "Potassium deficiency in rice."],
+    "b.pdf": ["LSTM models recommend crops from soil data.\nRandom forest predicts fertilizer."],
+    "c.pdf": ["Rainfall and temperature drive crop yield in Maharashtra."],
+}
+
+
+def reference_bm25(passages, query):
+    docs = [tokenize(p["text"]) for p in passages]
+    avg = sum(map(len, docs)) / len(docs)
+    scores = []
+    for doc in docs:
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in d for d in docs)
+            tf = doc.count(term)
+            if tf:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avg))
+        scores.append(score)
+    return scores
+
+
+def test_scores_match_reference_bm25():
+    index = LiteratureIndex.build(CORPUS)
+    query = "soil nitrogen crops"
+    assert index.scores(query) == pytest.approx(reference_bm25(index.passages, query))
+
+    [best, *_] = index.search(query, k=2)
+    assert (best["file"], best["page"]) == ("a.pdf", 1)
+    assert index.search("unknownword") == []
+
+
+def test_round_trip(tmp_path):
+    index = LiteratureIndex.build(CORPUS)
+    loaded = LiteratureIndex.load(index.save(tmp_path))
+    assert loaded.search("fertilizer forest") == index.search("fertilizer forest")
+
+
+def test_only_new_or_changed_pdfs_are_extracted(tmp_path):
+    pytest.importorskip("pdfplumber")
+    corpus, out = tmp_path / "corpus", tmp_path / "index"
+    corpus.mkdir()
+    (corpus / "one.pdf").write_bytes(make_pdf([["Soil nitrogen survey"], ["Page two about rice"]]))
+    (corpus / "two.pdf").write_bytes(make_pdf([["Fertilizer trials"]]))
+
+    _, report = build_index(corpus, out, workers=1)
+    assert sorted(report["extracted"]) == ["one.pdf", "two.pdf"]
+    _, report = build_index(corpus, out, workers=1)
+    assert report["extracted"] == []
+
+    (corpus / "two.pdf").write_bytes(make_pdf([["Fertilizer trials on wheat"]]))
+    index, report = build_index(corpus, out, workers=1)
+    assert report["extracted"] == ["two.pdf"]
+    assert index.search("wheat")[0]["file"] == "two.pdf"
+    assert index.search("rice")[0]["page"] == 2
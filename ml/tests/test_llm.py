@@ -0,0 +1,83 @@
+import asyncio
+import time
+from contextlib import aclosing
+from types import SimpleNamespace
+
+import pytest
+
+from ml.porod import advisory_cache, llm
+from ml.porod.advisory_parser import Section, stream_advisory
+
+
+class FakeModels:
+    """Stands in for ``client.aio.models``: each call takes ``delay`` seconds."""
+
+    def __init__(self, delay=0.0, chunks=("Dosage: 1 kg\n", "Warnings: none\n")):
+        self.delay = delay
+        self.chunks = chunks
+        self.closed = 0
+
+    async def generate_content(self, model, contents):
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(text="ok")
+
+    async def generate_content_stream(self, model, contents):
+        async def stream():
+            try:
+                for text in self.chunks:
+                    await asyncio.sleep(self.delay)
+                    yield SimpleNamespace(text=text)
+            finally:
+                self.closed += 1
+        return stream()
+
+
+@pytest.fixture
+def models(monkeypatch):
+    models = FakeModels(delay=0.2)
+    monkeypatch.setattr(llm, "get_client", lambda: SimpleNamespace(aio=SimpleNamespace(models=models)))
+    monkeypatch.setattr(llm, "LLM_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(llm, "_semaphore", None)
+    return models
+
+
+def test_timeout_includes_waiting_for_a_slot(models):
+    async def main():
+        holder = asyncio.ensure_future(llm.generate_async("first", timeout=5))
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await llm.generate_async("second", timeout=0.05)
+        waited = time.perf_counter() - started
+        assert (await holder).text == "ok"
+        return waited
+
+    assert asyncio.run(main()) < 0.15
+    assert not llm._get_semaphore().locked()
+
+
+def test_stream_releases_its_slot_when_closed_early(models):
+    async def main():
+        async with aclosing(llm.stream_async("prompt", timeout=5)) as chunks:
+            assert await chunks.__anext__() == "Dosage: 1 kg\n"
+            assert llm._get_semaphore().locked()
+        assert not llm._get_semaphore().locked()
+
+    asyncio.run(main())
+    assert models.closed == 1
+
+
+def test_abandoned_advisory_stream_frees_the_slot(models, monkeypatch):
+    monkeypatch.setattr(advisory_cache, "_cache", False)
+    sections = [Section("Dosage", "dosage"), Section("Warnings", "warnings")]
+
+    async def main():
+        events = stream_advisory("v", {}, "prompt", sections)
+        assert await events.__anext__() == ("section", {"key": "dosage", "value": "1 kg"})
+        # What the SSE response does when the client disconnects
+        await events.aclose()
+        assert not llm._get_semaphore().locked()
+        # The next request gets the slot without waiting for the abandoned stream
+        return await llm.generate_async("next", timeout=0.5)
+
+    assert asyncio.run(main()).text == "ok"
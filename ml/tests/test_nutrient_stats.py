@@ -0,0 +1,32 @@
+from ml.porod import nutrient_stats
+from ml.porod.nutrient_stats import crop_charts, fertiliser_charts, profile
+
+
+def _median(kind, name, column):
+    return float(profile(kind, name)[column][nutrient_stats._POSITION[50]])
+
+
+def test_crop_charts_are_complete():
+    charts = crop_charts("Rice", moisture=80, ph=6.5, temperature=24, nitrogen=80, phosphorus=45, potassium=40)
+    assert sum(d["value"] for d in charts["nutrientDistribution"]) in (99, 100, 101)
+    assert abs(sum(s["requirement"] for s in charts["seasonalRequirements"]) - 100) <= 2
+    assert [i["nutrient"] for i in charts["nutrientImbalance"]] == [
+        "Nitrogen", "Phosphorus", "Potassium", "pH", "Temperature", "Moisture"]
+
+
+def test_imbalance_is_zero_at_the_median_and_grows_outside_the_range():
+    n, p, k = (_median("fertilizer", "Urea", c) for c in ("nitrogen", "phosphorus", "potassium"))
+    assert all(i["value"] == 0 for i in fertiliser_charts("Urea", n, p, k)["nutrientImbalance"])
+
+    low = fertiliser_charts("Urea", n / 4, p, k)["nutrientImbalance"][0]
+    high = fertiliser_charts("Urea", n * 3, p, k)["nutrientImbalance"][0]
+    assert low["value"] > 0 and high["value"] > 0
+
+
+def test_missing_readings_and_unknown_names():
+    # No N/P/K for the crop: only the measured columns are charted
+    charts = crop_charts("no-such-crop", moisture=50, ph=7, temperature=30)
+    assert [i["nutrient"] for i in charts["nutrientImbalance"]] == ["pH", "Temperature", "Moisture"]
+    # Crops only present in the fertilizer dataset have no humidity column
+    sugarcane = crop_charts("Sugarcane", moisture=50, ph=7, temperature=30)
+    assert [i["nutrient"] for i in sugarcane["nutrientImbalance"]] == ["pH", "Temperature"]
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from ml.porod.prediction_cache import PredictionCache, normalise
+
+
+class Counter:
+    def __init__(self, value="v", delay=0.0, error=None):
+        self.calls = 0
+        self.value, self.delay, self.error = value, delay, error
+
+    def __call__(self):
+        async def compute():
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            return self.value
+        return compute
+
+
+def test_concurrent_identical_keys_compute_once():
+    cache = PredictionCache(maxsize=8)
+    compute = Counter(delay=0.02)
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute("k", compute()) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["v"] * 5
+    assert compute.calls == 1
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["coalesced"] == 4 and stats["in_flight"] == 0
+
+    assert asyncio.run(cache.get_or_compute("k", compute())) == "v"
+    assert compute.calls == 1 and cache.stats()["hits"] == 1
+
+
+def test_evicts_least_recently_used_at_capacity():
+    cache = PredictionCache(maxsize=2)
+    compute = Counter()
+
+    async def main():
+        for key in ("a", "b", "a", "c"):  # "a" was used after "b", so "b" goes
+            await cache.get_or_compute(key, compute())
+        calls = compute.calls
+        await cache.get_or_compute("a", compute())
+        assert compute.calls == calls
+        await cache.get_or_compute("b", compute())
+        assert compute.calls == calls + 1
+
+    asyncio.run(main())
+    assert cache.stats()["size"] == 2 and cache.stats()["evictions"] == 2
+
+
+def test_entries_expire_after_ttl():
+    cache = PredictionCache(maxsize=8, ttl=0.05)
+    compute = Counter()
+
+    async def main():
+        await cache.get_or_compute("k", compute())
+        await cache.get_or_compute("k", compute())
+        assert compute.calls == 1
+        await asyncio.sleep(0.1)
+        await cache.get_or_compute("k", compute())
+
+    asyncio.run(main())
+    assert compute.calls == 2 and cache.stats()["expirations"] == 1
+
+
+def test_errors_are_not_cached():
+    cache = PredictionCache(maxsize=8)
+    failing = Counter(delay=0.02, error=RuntimeError("model down"))
+
+    async def main():
+        # Callers already waiting on the failed computation see its error...
+        results = await asyncio.gather(*(cache.get_or_compute("k", failing()) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        # ...but the next lookup computes again
+        return await cache.get_or_compute("k", Counter("ok")())
+
+    assert asyncio.run(main()) == "ok"
+    assert failing.calls == 1
+    assert cache.stats()["size"] == 1 and cache.stats()["in_flight"] == 0
+
+
+def test_version_change_is_a_miss():
+    cache = PredictionCache(maxsize=8)
+    cache.set_version("v1")
+    compute = Counter()
+
+    async def main():
+        await cache.get_or_compute("k", compute())
+        cache.set_version("v2")
+        await cache.get_or_compute("k", compute())
+        cache.set_version("v2")  # unchanged: entries stay
+        await cache.get_or_compute("k", compute())
+
+    asyncio.run(main())
+    assert compute.calls == 2 and cache.stats()["version"] == "v2"
+
+
+def test_redis_keys_include_the_version():
+    store = {}
+
+    class FakeRedis:
+        async def get(self, key):
+            return store.get(key)
+
+        async def set(self, key, value, ex=None):
+            store[key] = value
+
+    cache = PredictionCache(maxsize=0, redis_getter=FakeRedis, name="c")
+    compute = Counter({"crop": "rice"})
+
+    async def main():
+        cache.set_version("v1")
+        await cache.get_or_compute(("a", 1.0), compute())
+        await cache.get_or_compute(("a", 1.0), compute())
+        cache.set_version("v2")
+        await cache.get_or_compute(("a", 1.0), compute())
+
+    asyncio.run(main())
+    assert compute.calls == 2 and cache.redis_hits == 1
+    assert sorted(store) == ['c:["v1", ["a", 1.0]]', 'c:["v2", ["a", 1.0]]']
+
+
+@pytest.mark.parametrize("values, digits, expected", [
+    ((1, "Red", 2.345), None, (1.0, "Red", 2.345)),
+    ((1.004, "Red ", 2.346), 2, (1.0, "Red ", 2.35)),
+])
+def test_normalise(values, digits, expected):
+    assert normalise(values, digits) == expected
@@ -0,0 +1,142 @@
+import fcntl
+
+import numpy as np
+import pytest
+
+from ml.registry import ModelRegistry, RegistryError
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    (tmp_path / "src" / "forest").mkdir(parents=True)
+    (tmp_path / "src" / "model.pkl").write_bytes(b"one")
+    (tmp_path / "src" / "forest" / "roots.npy").write_bytes(b"roots")
+    return tmp_path / "src"
+
+
+def test_publish_rollback_and_activate(tmp_path, artifacts):
+    registry = ModelRegistry(tmp_path / "registry")
+    assert registry.current("fertilizer") == (None, None)
+
+    paths = [artifacts / "model.pkl", artifacts / "forest"]
+    assert registry.publish("fertilizer", paths, note="first") == "v1"
+    (artifacts / "model.pkl").write_bytes(b"two")
+    assert registry.publish("fertilizer", paths) == "v2"
+
+    version, directory = registry.current("fertilizer")
+    assert version == "v2" and (directory / "model.pkl").read_bytes() == b"two"
+    assert (directory / "forest" / "roots.npy").exists()
+
+    assert registry.rollback("fertilizer") == "v1"
+    assert (registry.current("fertilizer")[1] / "model.pkl").read_bytes() == b"one"
+    with pytest.raises(RegistryError):
+        registry.rollback("fertilizer")
+
+    registry.activate("fertilizer", "v2")
+    assert registry.rollback("fertilizer") == "v1"
+    assert registry.publish("fertilizer", paths, activate=False) == "v3"
+    assert registry.current("fertilizer")[0] == "v1"
+
+
+def test_verify_detects_modified_files(tmp_path, artifacts):
+    registry = ModelRegistry(tmp_path / "registry")
+    registry.publish("crop", [artifacts / "model.pkl"])
+    registry.publish("crop", [artifacts / "model.pkl"])
+    registry.verify("crop", "v2")
+
+    (tmp_path / "registry" / "crop" / "v1" / "model.pkl").write_bytes(b"tampered")
+    with pytest.raises(RegistryError, match="model.pkl"):
+        registry.verify("crop", "v1")
+    with pytest.raises(RegistryError):
+        registry.activate("crop", "v1")
+    with pytest.raises(RegistryError):
+        registry.verify("crop", "v9")
+
+
+def test_rollback_refuses_a_corrupted_version(tmp_path, artifacts):
+    registry = ModelRegistry(tmp_path / "registry")
+    registry.publish("fertilizer", [artifacts / "model.pkl", artifacts / "forest"])
+    registry.publish("fertilizer", [artifacts / "model.pkl"])
+
+    (tmp_path / "registry" / "fertilizer" / "v1" / "forest" / "roots.npy").unlink()
+    with pytest.raises(RegistryError, match="roots.npy"):
+        registry.rollback("fertilizer")
+    manifest = registry.manifest("fertilizer")
+    assert manifest["current"] == "v2" and manifest["history"] == ["v1"]
+
+
+def test_activate_verifies_under_the_lock(tmp_path, artifacts, monkeypatch):
+    registry = ModelRegistry(tmp_path / "registry")
+    registry.publish("crop", [artifacts / "model.pkl"])
+    registry.publish("crop", [artifacts / "model.pkl"])
+    verify = registry.verify
+
+    def verify_while_locked(model, version):
+        # Another writer can't take the lock while the check runs
+        with open(tmp_path / "registry" / model / ".lock", "w") as lock:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return verify(model, version)
+
+    monkeypatch.setattr(registry, "verify", verify_while_locked)
+    assert registry.activate("crop", "v1") == "v1"
+    assert registry.manifest("crop")["current"] == "v1"
+
+
+def test_mlapi_swaps_fertilizer_versions(tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    pd = pytest.importorskip("pandas")
+    joblib = pytest.importorskip("joblib")
+    from types import SimpleNamespace
+    from sklearn.ensemble import RandomForestClassifier
+    from ml.fertilizer.predictor import FEATURE_COLUMNS
+    from ml.porod import mlapi
+
+    encoders = {
+        "District_Name": ["Kolhapur"], "Soil_color": ["Black"], "Crop": ["Wheat"], "Fertilizer": ["DAP", "Urea"],
+    }
+    X = pd.DataFrame(np.zeros((2, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    registry = ModelRegistry(tmp_path / "registry")
+    for label in (0, 1):
+        work = tmp_path / f"work{label}"
+        work.mkdir()
+        joblib.dump(RandomForestClassifier(n_estimators=2).fit(X, [label, label]), work / "fertilizer_predictor.pkl")
+        joblib.dump({k: SimpleNamespace(classes_=np.array(v)) for k, v in encoders.items()},
+                    work / "label_encoders.pkl")
+        registry.publish("fertilizer", sorted(work.iterdir()))
+    registry.rollback("fertilizer")
+
+    monkeypatch.setattr(mlapi, "model_registry", registry)
+    monkeypatch.setattr(mlapi, "FERT_ENGINE", "sklearn")
+    monkeypatch.setattr(mlapi.app.state, "model_versions", {})
+    monkeypatch.setattr(mlapi.fert_cache, "version", None)
+    served = getattr(mlapi.app.state, "fert_bundle", None)
+    if served is not None:
+        del mlapi.app.state.fert_bundle
+    try:
+        check_swaps(mlapi, registry)
+    finally:
+        if served is not None:
+            mlapi.app.state.fert_bundle = served
+        elif hasattr(mlapi.app.state, "fert_bundle"):
+            del mlapi.app.state.fert_bundle
+
+
+def check_swaps(mlapi, registry):
+    def predict():
+        return mlapi.load_fertilizer_predictor().predict_one("Black", 1, 1, 1, 6.5, 100, 25, "Wheat")
+
+    assert predict() == "DAP" and mlapi.app.state.model_versions["fertilizer"] == "v1"
+    assert mlapi.fert_cache.version == "v1"
+    old = mlapi.load_fertilizer_predictor()
+
+    assert mlapi.reload_model("fertilizer") is None  # still current
+    registry.activate("fertilizer", "v2")
+    assert mlapi.reload_model("fertilizer")["version"] == "v2"
+    assert predict() == "Urea" and mlapi.fert_cache.version == "v2"
+    # A request that already held the old predictor still gets a consistent answer
+    assert old.predict_one("Black", 1, 1, 1, 6.5, 100, 25, "Wheat") == "DAP"
+
+    registry.rollback("fertilizer")
+    mlapi.reload_model("fertilizer")
+    assert predict() == "DAP"
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from ml.crop.sequences import csv_to_memmap, lstm_windows, window_batches
+
+
+def loop_windows(X, y, time_steps):
+    # The original prepare_lstm_data loop
+    X_seq, y_seq = [], []
+    for i in range(len(X) - time_steps):
+        X_seq.append(X[i:i + time_steps])
+        y_seq.append(y[i + time_steps])
+    return np.array(X_seq), np.array(y_seq)
+
+
+@pytest.mark.parametrize("time_steps", [1, 3, 5])
+def test_windows_match_loop_without_copying(time_steps):
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(50, 7)), rng.integers(0, 4, 50)
+    windows, labels = lstm_windows(X, y, time_steps)
+    expected_X, expected_y = loop_windows(X, y, time_steps)
+    assert np.array_equal(windows, expected_X) and np.array_equal(labels, expected_y)
+    assert np.shares_memory(windows, X)
+
+
+def test_too_few_rows():
+    with pytest.raises(ValueError):
+        lstm_windows(np.zeros((3, 2)), np.zeros(3), 3)
+
+
+def test_batches_cover_indices_once():
+    X, y = np.arange(40.0).reshape(20, 2), np.arange(20) % 3
+    windows, labels = lstm_windows(X, y, 2)
+    indices = np.arange(0, 18, 2)
+    seen = []
+    for X_batch, y_batch in window_batches(windows, labels, indices, 4, 3, shuffle=True, seed=1):
+        assert X_batch.dtype == np.float32 and y_batch.shape == (len(X_batch), 3)
+        # Window i starts at row i
+        starts = (X_batch[:, 0, 0] / 2).astype(int)
+        assert np.array_equal(y_batch.argmax(1), labels[starts])
+        seen.extend(starts)
+    assert sorted(seen) == list(indices)
+
+
+def test_csv_to_memmap_matches_in_memory_scaling(tmp_path):
+    pd = pytest.importorskip("pandas")
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(1000, 3)) * [1, 10, 100], columns=["N", "P", "K"])
+    df["label"] = rng.choice(["rice", "maize", "apple"], len(df))
+    df.to_csv(tmp_path / "data.csv", index=False)
+
+    X, y, scaler, encoder = csv_to_memmap(tmp_path / "data.csv", tmp_path / "seq", chunksize=128)
+    assert isinstance(X, np.memmap) and not X.flags.writeable
+    expected = StandardScaler().fit_transform(df.drop(columns="label"))
+    assert np.allclose(X, expected, atol=1e-5)
+    assert np.array_equal(y, LabelEncoder().fit_transform(df["label"]))
+    assert list(encoder.classes_) == ["apple", "maize", "rice"]
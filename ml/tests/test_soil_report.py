@@ -0,0 +1,63 @@
+import pytest
+
+from ml.porod.soil_report import extract_samples, extract_text_samples
+
+CARD = """Soil Health Card
+Sample collected on 12/03/2024
+Soil Sample Number: KOP-17
+Soil colour: Black
+1 pH 7.4 Slightly alkaline
+2 EC 0.32 dS/m
+3 Organic Carbon (OC) 0.62 %
+4 Available Nitrogen (N) 245 kg/ha Low
+5 Available Phosphorus (P) 18.5 kg/ha Medium
+6 Available Potassium (K) 310 kg/ha High
+"""
+
+
+def make_pdf(pages):
+    """Minimal PDF with one text line per entry of each page (no PDF writer needed)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        ops = "".join(f"BT /F1 10 Tf 40 {780 - 14 * i} Td ({line}) Tj ET\n" for i, line in enumerate(lines))
+        objects.append(f"<< /Length {len(ops)} >>\nstream\n{ops}endstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out, offsets = "%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+def test_key_value_card():
+    [sample] = extract_text_samples(CARD)
+    assert sample["sample_id"] == "KOP-17"
+    assert sample["soil_color"] == "Black"
+    assert (sample["nitrogen"], sample["phosphorus"], sample["potassium"], sample["ph"]) == (245, 18.5, 310, 7.4)
+    assert sample["organic_carbon"] == 0.62
+
+
+def test_multi_page_pdf_with_tables_and_cards(tmp_path):
+    pytest.importorskip("pdfplumber")
+    path = tmp_path / "report.pdf"
+    path.write_bytes(make_pdf([
+        ["Lab results", "Sample N P K pH EC", "S1 80 40 45 6.5 0.2", "S2 100 30 60 7.1 0.3"],
+        # The table continues on the next page, then a card follows
+        ["S3 55 20 30 6.9 0.1", "Remarks: none"] + CARD.splitlines(),
+        ["Sample No: KOP-18", "pH 6.2", "Available Nitrogen (N) 120 kg/ha"],
+    ]))
+
+    samples = extract_samples(str(path))
+    assert [s["sample_id"] for s in samples] == ["S1", "S2", "S3", "KOP-17", "KOP-18"]
+    assert [s["page"] for s in samples] == [1, 1, 2, 2, 3]
+    assert samples[2]["potassium"] == 30 and samples[4]["nitrogen"] == 120